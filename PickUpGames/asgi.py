@@ -13,4 +13,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'PickUpGames.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported after Django is set up since it depends on the app registry
+from pickup.realtime import messages_socket  # noqa: E402
+
+
+# route WebSocket connections to the live message stream, everything else to
+# the regular Django application
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        await messages_socket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -45,11 +45,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'pickup.middleware.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'pickup.middleware.PlayerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -86,6 +88,39 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+#
+# Geocoding results are kept in local files so they survive restarts. To share
+# them between servers, switch the backend to
+# 'django.core.cache.backends.db.DatabaseCache' with a table name as the
+# LOCATION and run 'python manage.py createcachetable'.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'geocode': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'geocode_cache'),
+        'TIMEOUT': 60 * 60 * 24 * 30,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+
+# Geocoding of new parks. The address check runs in a pool of background
+# threads; with no workers it runs inline when the park is saved.
+PICKUP_GEOCODER = 'pickup.geocoding.GoogleGeocoder'
+PICKUP_GEOCODE_WORKERS = 2
+
+# Overrides for the geocoding API client's timeouts, retries and circuit
+# breaker, see DEFAULT_OPTIONS in pickup/geocoding_client.py
+PICKUP_GEOCODE_CLIENT = {}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -133,6 +168,34 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # URL to redirect to after login
 LOGIN_REDIRECT_URL = "/"
 
+# Broker used to push new messages to connected players. The local broker only
+# reaches sockets served by the same process, which is why the Procfile runs a
+# single ASGI worker; point this at a shared backend before raising --workers.
+PICKUP_MESSAGE_BROKER = 'pickup.broker.LocalBroker'
+
+# Logged in users are loaded as players, see pickup/backends.py. ModelBackend
+# stays listed so sessions logged in before PlayerBackend was added are still
+# valid; PlayerBackend comes first, so new logins use it.
+#
+# The player can be cached between requests for a few seconds; saving the
+# player drops the cached copy, but changes made through the plain User model,
+# such as in the admin, take up to this long to apply. With the default local
+# memory cache, each worker process keeps its own copy and only the process
+# that saved the player drops it, so after a password change the other
+# processes still check sessions against the old password hash for up to
+# this long. Only set it above 0 with a cache shared by all processes, such as
+# Redis or memcached. 0 reads it on every request.
+AUTHENTICATION_BACKENDS = [
+    'pickup.backends.PlayerBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+PICKUP_PLAYER_CACHE_TIMEOUT = 0
+
+# Each request's query count, database time and slowest statement are sent in
+# a Server-Timing header and logged to pickup.middleware at INFO level, see
+# QueryStatsMiddleware in pickup/middleware.py
+PICKUP_QUERY_TIMING = True
+
 if 'HEROKU' in os.environ:
     import django_heroku
     django_heroku.settings(locals())
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from .models import Profile, Player, Parks, Schedule, FavoriteParks, \
-    EventSignup, Messages
+    EventSignup, Messages, Conversation
 
 # Register your models here.
 admin.site.register(Profile)
@@ -11,3 +11,4 @@ admin.site.register(Schedule)
 admin.site.register(FavoriteParks)
 admin.site.register(EventSignup)
 admin.site.register(Messages)
+admin.site.register(Conversation)
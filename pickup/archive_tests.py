@@ -0,0 +1,82 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+from pickup.models import Player, Parks, Schedule, EventSignup, PlayerInterval, ParkAvailability, \
+    MatchSeries, ArchivedMatch, ArchivedSignup, ParkMonthStats
+from io import StringIO
+import datetime
+
+
+# tests for moving past matches and their signups into the archive
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create_user("root", "root@root.com", "root")
+        self.other = Player.objects.create_user("other", "other@root.com", "other")
+        self.park = Parks(player=self.player, name='Parky', street='Parkstreet',
+                          city='Parkville', state='AZ', zipcode='12345')
+        self.park.save()
+        self.today = datetime.date.today()
+
+    def add_match(self, name, days, time=40):
+        match = Schedule(name=name, creator=self.player, park=self.park, time=time,
+                         date=self.today + datetime.timedelta(days=days))
+        match.save()
+        EventSignup.join(self.player, match)
+        return match
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command("archive_matches", *args, stdout=out)
+        return out.getvalue()
+
+    # test that old matches move into the archive with their signups, in
+    # batches, and recent ones stay
+    def test_archive(self):
+        old = [self.add_match("Old %d" % i, -100, time=i) for i in range(3)]
+        EventSignup.join(self.other, old[0])
+        recent = self.add_match("Recent", -10)
+        upcoming = self.add_match("Upcoming", 1)
+        MatchSeries(name="Finished", creator=self.player, park=self.park, time=40,
+                    start=self.today - datetime.timedelta(days=200),
+                    until=self.today - datetime.timedelta(days=150), weekdays=1).save()
+
+        out = self.archive("--batch-size", "2")
+        self.assertIn("Archived 3 matches and 4 signups", out)
+        self.assertIn("2 matches, 3 signups archived", out)
+
+        self.assertEqual(set(Schedule.objects.all()), {recent, upcoming})
+        self.assertEqual(EventSignup.objects.count(), 2)
+        self.assertEqual(PlayerInterval.objects.count(), 2)
+        self.assertFalse(ParkAvailability.objects.filter(date__lt=self.today - datetime.timedelta(days=90))
+                         .exists())
+        self.assertFalse(MatchSeries.objects.exists())
+
+        archived = ArchivedMatch.objects.get(id=old[0].id)
+        self.assertEqual((archived.name, archived.park, archived.signup_count), ("Old 0", self.park, 2))
+        self.assertEqual(set(archived.signups.values_list("player_id", flat=True)),
+                         {self.player.id, self.other.id})
+        self.assertEqual(ArchivedSignup.objects.count(), 4)
+
+        stats = ParkMonthStats.objects.get()
+        self.assertEqual((stats.matches, stats.signups), (3, 4))
+        self.assertEqual(stats.month, (self.today - datetime.timedelta(days=100)).replace(day=1))
+
+        # a shorter horizon archives the recent match, adding to the stats of
+        # its own month
+        self.archive("--days", "5")
+        self.assertEqual(list(Schedule.objects.all()), [upcoming])
+        self.assertEqual(sum(ParkMonthStats.objects.values_list("matches", flat=True)), 4)
+
+        with self.assertRaises(CommandError):
+            self.archive("--days", "0")
+
+    # test that park pages only list upcoming matches
+    def test_park_page_upcoming_only(self):
+        self.add_match("Last Week", -7)
+        self.add_match("Tomorrow", 1)
+        self.client.post(reverse("login"), {"username": "root", "password": "root"})
+        response = self.client.get(reverse("event_signup", kwargs={"parkid": self.park.id}))
+        self.assertContains(response, "Tomorrow")
+        self.assertNotContains(response, "Last Week")
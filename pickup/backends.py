@@ -0,0 +1,32 @@
+# File: backends.py
+#
+# Authentication backend loading the logged in user as a Player, so that
+# request.user and request.player are the same object read with one query.
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .models import Player
+from .profiles import player_key
+
+# seconds a logged in player is cached between requests, 0 to read it on
+# every request
+PLAYER_CACHE_TIMEOUT = 0
+
+
+class PlayerBackend(ModelBackend):
+
+    # the user of a session, as a Player when they are one. With
+    # PICKUP_PLAYER_CACHE_TIMEOUT set, the player is cached for that long;
+    # Player.save drops the cached copy, which only reaches other processes
+    # when the cache is shared, see the setting.
+    def get_user(self, user_id):
+        timeout = getattr(settings, "PICKUP_PLAYER_CACHE_TIMEOUT", PLAYER_CACHE_TIMEOUT)
+        player = cache.get(player_key(user_id)) if timeout else None
+        if player is None:
+            player = Player.objects.filter(pk=user_id).first()
+            if player is None:
+                return super().get_user(user_id)
+            if timeout:
+                cache.set(player_key(user_id), player, timeout)
+        return player if self.user_can_authenticate(player) else None
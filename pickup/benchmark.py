@@ -0,0 +1,48 @@
+# File: benchmark.py
+#
+# Latency statistics for the benchmark command, and the comparison of a run
+# against a baseline run. Results are plain dicts so they can be written to
+# and read back from JSON.
+import math
+
+# percentiles reported for each route
+PERCENTILES = (50, 95, 99)
+
+# the percentile compared against the baseline
+COMPARED = "p95_ms"
+
+
+# nearest-rank percentile of a sorted list
+def percentile(values, rank):
+    if not values:
+        return None
+    return values[max(0, math.ceil(rank / 100 * len(values)) - 1)]
+
+
+# summary of the latencies of one route, in seconds, as milliseconds; the
+# throughput is for requests made one after another
+def summarize(latencies):
+    values = sorted(latencies)
+    total = sum(values)
+    summary = {"requests": len(values)}
+    for rank in PERCENTILES:
+        summary["p{}_ms".format(rank)] = round(percentile(values, rank) * 1000, 3)
+    summary["mean_ms"] = round(total / len(values) * 1000, 3)
+    summary["max_ms"] = round(values[-1] * 1000, 3)
+    summary["requests_per_second"] = round(len(values) / total, 1) if total else None
+    return summary
+
+
+# the routes of a run slower than in the baseline by more than the tolerance,
+# a fraction of the baseline, as (route, baseline ms, ms) sorted by how much
+# slower they got; routes missing from either run are left out
+def regressions(results, baseline, tolerance):
+    slower = []
+    for name, route in results["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if before is None or not before.get(COMPARED):
+            continue
+        if route[COMPARED] > before[COMPARED] * (1 + tolerance):
+            slower.append((name, before[COMPARED], route[COMPARED]))
+    slower.sort(key=lambda item: item[2] / item[1], reverse=True)
+    return slower
@@ -0,0 +1,122 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, Q
+from django.test import TestCase
+from django.urls import reverse
+from pickup import urls
+from pickup.benchmark import percentile, regressions, summarize
+from pickup.geohash import encode_geohash
+from pickup.models import Player, PlayerSearchKey, Parks, ParkSearchGram, Courts, Schedule, \
+    ParkAvailability, EventSignup, PlayerInterval, Messages, Conversation
+from pickup.prefixes import player_keys
+from pickup.slots import bitmap_of
+from io import StringIO
+import json
+import os
+import tempfile
+
+
+# tests for seeding synthetic data and timing every page against it
+class BenchmarkTests(TestCase):
+
+    def seed(self, *args):
+        call_command("seed_benchmark", "--players", "30", "--parks", "60", "--signups", "80",
+                     "--messages", "120", "--batch-size", "25", *args, stdout=StringIO())
+
+    def benchmark(self, *args):
+        err = StringIO()
+        call_command("benchmark", "--requests", "2", "--warmup", "0", "--host", "testserver",
+                     *args, stdout=StringIO(), stderr=err)
+        return err.getvalue()
+
+    # test that the rows save() would keep in sync are written with the bulk
+    # inserts
+    def test_seed(self):
+        self.seed()
+        self.assertEqual(Player.objects.count(), 30)
+        self.assertEqual(Parks.objects.count(), 60)
+        self.assertEqual(Messages.objects.count(), 120)
+        self.assertTrue(self.client.login(username="bench7", password="benchmark"))
+
+        player = Player.objects.get(username="bench7")
+        self.assertEqual(set(player.search_keys.values_list("key", flat=True)),
+                         set(player_keys(player.username, player.first_name, player.last_name)))
+        self.assertEqual(PlayerSearchKey.objects.values("player").distinct().count(), 30)
+        self.assertEqual(ParkSearchGram.objects.values("park").distinct().count(), 60)
+        for court in Courts.objects.all():
+            self.assertEqual(court.geohash, encode_geohash(court.latitude, court.longitude))
+
+        for availability in ParkAvailability.objects.all():
+            slots = Schedule.objects.filter(park_id=availability.park_id, date=availability.date) \
+                .values_list("time", flat=True)
+            self.assertEqual(availability.bitmap, bitmap_of(slots))
+        self.assertEqual(ParkAvailability.objects.count(),
+                         Schedule.objects.values("park", "date").distinct().count())
+
+        counts = Schedule.objects.annotate(joined=Count("eventsignup", filter=Q(
+            eventsignup__status=EventSignup.JOINED)))
+        self.assertTrue(all(match.signup_count == match.joined for match in counts))
+        self.assertEqual(PlayerInterval.objects.count(), EventSignup.objects.count())
+        interval = PlayerInterval.objects.select_related("event").first()
+        self.assertEqual((interval.date, interval.start, interval.end),
+                         (interval.event.date, interval.event.time, interval.event.end_slot))
+
+        pairs = {(sender, receiver) for sender, receiver in
+                 Messages.objects.values_list("sender_id", "receiver_id")}
+        self.assertEqual(set(Conversation.objects.values_list("player_id", "partner_id")),
+                         pairs | {(receiver, sender) for sender, receiver in pairs})
+        conversation = Conversation.objects.first()
+        latest = Messages.objects.filter(
+            Q(sender=conversation.player, receiver=conversation.partner) |
+            Q(sender=conversation.partner, receiver=conversation.player)).latest("time_sent")
+        self.assertEqual(conversation.last_sent, latest.time_sent)
+
+        # the seeded players are seeded once
+        with self.assertRaises(CommandError):
+            self.seed()
+
+    # test that every page is timed and the results can be compared
+    def test_benchmark(self):
+        self.seed()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.json")
+            self.benchmark("--output", path)
+            with open(path) as file:
+                results = json.load(file)
+
+            self.assertEqual(set(results["routes"]), {pattern.name for pattern in urls.urlpatterns})
+            self.assertEqual(results["rows"]["players"], 30)
+            self.assertEqual(results["total"]["requests"], 2 * len(results["routes"]))
+            index = results["routes"]["index"]
+            self.assertEqual((index["requests"], index["status"]), (2, [200]))
+            self.assertLessEqual(index["p50_ms"], index["p99_ms"])
+            self.assertGreater(index["queries"], 0)
+
+            # a page that got much slower fails the run
+            results["routes"]["index"]["p95_ms"] = 1e-6
+            with open(path, "w") as file:
+                json.dump(results, file)
+            with self.assertRaises(CommandError):
+                self.benchmark("--baseline", path, "--route", "index")
+
+        # the pages are only read
+        self.assertTrue(self.client.login(username="bench0", password="benchmark"))
+        self.assertEqual(self.client.get(reverse("index")).status_code, 200)
+
+        with self.assertRaises(CommandError):
+            self.benchmark("--username", "nobody")
+        with self.assertRaises(CommandError):
+            self.benchmark("--route", "nowhere")
+
+    def test_statistics(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, rank) for rank in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertIsNone(percentile([], 50))
+        summary = summarize([0.001, 0.003, 0.002, 0.004])
+        self.assertEqual((summary["p50_ms"], summary["p99_ms"], summary["mean_ms"]), (2, 4, 2.5))
+        self.assertEqual(summary["requests_per_second"], 400)
+
+        baseline = {"routes": {"fast": {"p95_ms": 10}, "slow": {"p95_ms": 10}, "new": {"p95_ms": 0}}}
+        results = {"routes": {"fast": {"p95_ms": 11}, "slow": {"p95_ms": 20}, "new": {"p95_ms": 5},
+                              "added": {"p95_ms": 5}}}
+        self.assertEqual(regressions(results, baseline, 0.2), [("slow", 10, 20)])
@@ -0,0 +1,116 @@
+# File: broker.py
+#
+# Publish/subscribe broker used to push new messages to connected players.
+# The backend is chosen with the PICKUP_MESSAGE_BROKER setting so that a
+# broker shared between worker processes can replace the in-process one.
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+# the channel a player's live updates are published on
+def player_channel(player_id):
+    return "player.{}".format(player_id)
+
+
+# a single subscriber's queue, read from the event loop that created it
+class Subscription:
+    # messages waiting beyond this are dropped for slow consumers
+    MAX_PENDING = 100
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.MAX_PENDING)
+
+    # hand a message to this subscriber, safe to call from any thread
+    def put(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, message)
+        except RuntimeError:
+            # the subscriber's event loop has already shut down
+            self.close()
+
+    def _deliver(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+    # wait for the next message published on the channel
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+# interface every broker backend implements
+class Broker:
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+# broker that only reaches subscribers inside the current process
+class LocalBroker(Broker):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+# return the configured broker, creating it on first use
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            backend = getattr(settings, "PICKUP_MESSAGE_BROKER",
+                              "pickup.broker.LocalBroker")
+            _broker = import_string(backend)()
+    return _broker
+
+
+# push a newly saved message to both people in the conversation
+def publish_message(message):
+    payload = {"id": message.id,
+               "sender": message.sender.username,
+               "receiver": message.receiver.username,
+               "message": message.message,
+               "time_sent": message.time_sent.isoformat()}
+
+    broker = get_broker()
+    for player_id in {message.sender_id, message.receiver_id}:
+        broker.publish(player_channel(player_id), payload)
@@ -0,0 +1,102 @@
+from django.test import TestCase
+from django.urls import reverse
+from pickup.models import Player, Parks, Schedule, EventSignup
+from pickup.ical import fold_line, escape_text
+from pickup.views import calendar_token
+import datetime
+
+
+# tests for the iCalendar feeds of a player's signups and a park's matches
+class CalendarTests(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create_user("root", "root@root.com", "root")
+        self.park = Parks(player=self.player, name='Parky', street='Parkstreet',
+                          city='Parkville', state='AZ', zipcode='12345')
+        self.park.save()
+        self.day = datetime.date.today() + datetime.timedelta(days=1)
+        self.match = self.add_match("Morning, Game", 40)
+
+    def add_match(self, name, time):
+        match = Schedule(name=name, creator=self.player, park=self.park, time=time, date=self.day)
+        match.save()
+        return match
+
+    def read(self, url, **headers):
+        response = self.client.get(url, **headers)
+        body = b"".join(response.streaming_content).decode() if response.streaming else ""
+        return response, body
+
+    def test_lines(self):
+        self.assertEqual(escape_text("a,b;c\nd"), "a\\,b\\;c\\nd")
+        folded = fold_line("SUMMARY:" + "é" * 80)
+        lines = folded.split("\r\n")
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertEqual("".join(line[1:] if i else line for i, line in enumerate(lines)),
+                         "SUMMARY:" + "é" * 80)
+
+    # test the park feed and conditional requests to it
+    def test_park_feed(self):
+        url = reverse("park_calendar", kwargs={"parkid": self.park.id})
+        response, body = self.read(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        self.assertIn("BEGIN:VCALENDAR\r\n", body)
+        self.assertIn("SUMMARY:Morning\\, Game\r\n", body)
+        self.assertIn("DTSTART:" + self.day.strftime("%Y%m%d") + "T100000\r\n", body)
+        self.assertNotIn("Last-Modified", response)
+
+        # an unchanged feed is answered with 304 without reading its matches
+        etag = response["ETag"]
+        with self.assertNumQueries(2):
+            response, body = self.read(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        # adding and editing matches change the feed, deleting the new match
+        # brings the first version back
+        tags = [etag]
+        second = self.add_match("Evening Game", 70)
+        tags.append(self.read(url)[0]["ETag"])
+        second.name = "Late Game"
+        second.save()
+        response, body = self.read(url, HTTP_IF_NONE_MATCH=tags[-1])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Late Game", body)
+        tags.append(response["ETag"])
+        second.delete()
+        tags.append(self.read(url)[0]["ETag"])
+        self.assertEqual(len(set(tags[:3])), 3)
+        self.assertEqual(tags[3], etag)
+
+        self.assertEqual(self.client.get(reverse("park_calendar", kwargs={"parkid": 0})).status_code,
+                         404)
+
+    # test the player feed, read through a signed token
+    def test_player_feed(self):
+        url = reverse("player_calendar", kwargs={"token": calendar_token(self.player.id)})
+        response, body = self.read(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("BEGIN:VEVENT", body)
+        empty = response["ETag"]
+
+        EventSignup.join(self.player, self.match)
+        response, body = self.read(url, HTTP_IF_NONE_MATCH=empty)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("UID:match-%d@" % self.match.id, body)
+        self.assertIn("STATUS:CONFIRMED", body)
+        self.assertEqual(self.read(url, HTTP_IF_NONE_MATCH=response["ETag"])[0].status_code, 304)
+
+        # leaving changes the feed, even for a client that only sends the
+        # time it last read it
+        EventSignup.leave(self.player, self.match)
+        response, body = self.read(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("BEGIN:VEVENT", body)
+        response, body = self.read(url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+        self.assertEqual(response.status_code, 200)
+
+        token = calendar_token(self.player.id)[:-1] + "x"
+        self.assertEqual(self.client.get(reverse("player_calendar", kwargs={"token": token}))
+                         .status_code, 404)
@@ -4,7 +4,9 @@ import datetime
 
 # This file contains the Django Form objects.
 from django.forms import ModelForm
-from .models import Parks, Player, Schedule
+from .models import Parks, Player, Schedule, ParkAvailability, MatchSeries
+from .series import series_holds
+from .slots import SLOTS_PER_DAY, is_booked
 from django import forms
 
 # form for the registration page
@@ -54,14 +56,30 @@ class DateInput(forms.DateInput):
 class ScheduleForm(ModelForm):
     class Meta:
         model = Schedule
-        fields = ['name', 'date', 'time']
+        fields = ['name', 'date', 'time', 'duration', 'capacity']
         widgets = {
             'date': DateInput(attrs={'class': 'form-control edit-profile-field'}),
             'name': forms.TextInput(attrs={'class': 'form-control edit-profile-field'}),
             'time': forms.Select(attrs={'class': 'form-select edit-profile-field'}),
+            'duration': forms.Select(attrs={'class': 'form-select edit-profile-field'}),
+            'capacity': forms.NumberInput(attrs={'class': 'form-control edit-profile-field'}),
 
         }
 
+    # the park the match is for, used to check the time is still free
+    def __init__(self, *args, park=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.park = park
+        self.fields['capacity'].required = False
+        self.fields['duration'].required = False
+
+    # matches created without a capacity or duration get the default ones
+    def clean_capacity(self):
+        return self.cleaned_data['capacity'] or Schedule.DEFAULT_CAPACITY
+
+    def clean_duration(self):
+        return self.cleaned_data['duration'] or Schedule.DEFAULT_DURATION
+
     def clean_date(self):
         date = self.cleaned_data['date']
         if not date:
@@ -70,6 +88,120 @@ class ScheduleForm(ModelForm):
             raise forms.ValidationError("The date cannot be in the past!")
         return date
 
+    # reject a time the park already has a match at, from the park's
+    # availability bitmap for the day, or that a weekly match holds
+    def clean(self):
+        cleaned_data = super().clean()
+        date, time = cleaned_data.get('date'), cleaned_data.get('time')
+        if time is not None and time + cleaned_data.get('duration', 0) > SLOTS_PER_DAY:
+            self.add_error('duration', "The match must end by midnight!")
+        if self.park is not None and date and time is not None:
+            availability = ParkAvailability.objects.filter(park=self.park, date=date).first()
+            if availability is not None and is_booked(availability.bitmap, time):
+                self.add_error('time', "There is already a match at this time with this name.  "
+                                       "Please join the existing match or create a new match "
+                                       "with a unique name.")
+            elif series_holds(self.park, date, time):
+                self.add_error('time', "A weekly match is already held at this time. "
+                                       "Please join it or pick another time.")
+        return cleaned_data
+
+
+# form for creating a match repeated every week
+class MatchSeriesForm(ModelForm):
+    class Meta:
+        model = MatchSeries
+        fields = ['name', 'time', 'duration', 'capacity', 'start', 'until']
+        labels = {'start': "First date", 'until': "Last date"}
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control edit-profile-field'}),
+            'time': forms.Select(attrs={'class': 'form-select edit-profile-field'}),
+            'duration': forms.Select(attrs={'class': 'form-select edit-profile-field'}),
+            'capacity': forms.NumberInput(attrs={'class': 'form-control edit-profile-field'}),
+            'start': DateInput(attrs={'class': 'form-control edit-profile-field'}),
+            'until': DateInput(attrs={'class': 'form-control edit-profile-field'}),
+        }
+
+    # longest a series may run
+    MAX_DAYS = 366
+
+    days = forms.TypedMultipleChoiceField(choices=MatchSeries.weekday_names, coerce=int,
+                                          widget=forms.CheckboxSelectMultiple, label="Every")
+
+    # the park the series is for, used to check it does not overlap another
+    def __init__(self, *args, park=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.park = park
+        self.fields['capacity'].required = False
+        self.fields['duration'].required = False
+
+    def clean_capacity(self):
+        return self.cleaned_data['capacity'] or Schedule.DEFAULT_CAPACITY
+
+    def clean_duration(self):
+        return self.cleaned_data['duration'] or Schedule.DEFAULT_DURATION
+
+    def clean_start(self):
+        start = self.cleaned_data['start']
+        if start < datetime.date.today():
+            raise forms.ValidationError("The date cannot be in the past!")
+        return start
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, until = cleaned_data.get('start'), cleaned_data.get('until')
+        days, time = cleaned_data.get('days'), cleaned_data.get('time')
+        if not start or not until or not days or time is None:
+            return cleaned_data
+        if time + cleaned_data.get('duration', 0) > SLOTS_PER_DAY:
+            self.add_error('duration', "The match must end by midnight!")
+
+        if until < start:
+            raise forms.ValidationError("The last date cannot be before the first date!")
+        if (until - start).days > self.MAX_DAYS:
+            raise forms.ValidationError("A weekly match can run for at most a year.")
+
+        self.instance.weekdays = sum(1 << day for day in set(days))
+        if self.park is not None:
+            overlapping = MatchSeries.objects.filter(park=self.park, time=time,
+                                                     start__lte=until, until__gte=start)
+            if any(item.weekdays & self.instance.weekdays for item in overlapping):
+                self.add_error('time', "A weekly match is already held at this time. "
+                                       "Please join it or pick another time.")
+        return cleaned_data
+
+# form for filtering the upcoming matches feed
+class MatchFeedForm(forms.Form):
+    # set constants for the parks the feed covers
+    ALL = "all"
+    FAVORITES = "favorites"
+    NEARBY = "nearby"
+    scopes = [(ALL, "All parks"), (FAVORITES, "My parks"), (NEARBY, "Parks near a zipcode")]
+
+    time_choices = [("", "Any time")] + Schedule.times
+
+    scope = forms.ChoiceField(choices=scopes, required=False,
+                              widget=forms.Select(attrs={'class': 'form-select edit-profile-field'}))
+    zipcode = forms.CharField(required=False,
+                              widget=forms.TextInput(attrs={'class': 'form-control edit-profile-field'}))
+    start = forms.DateField(required=False, label="From",
+                            widget=DateInput(attrs={'class': 'form-control edit-profile-field'}))
+    end = forms.DateField(required=False, label="Until",
+                          widget=DateInput(attrs={'class': 'form-control edit-profile-field'}))
+    earliest = forms.TypedChoiceField(choices=time_choices, coerce=int, empty_value=None,
+                                      required=False, label="Earliest start",
+                                      widget=forms.Select(attrs={'class': 'form-select edit-profile-field'}))
+    latest = forms.TypedChoiceField(choices=time_choices, coerce=int, empty_value=None,
+                                    required=False, label="Latest start",
+                                    widget=forms.Select(attrs={'class': 'form-select edit-profile-field'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and end < start:
+            raise forms.ValidationError("The end date cannot be before the start date!")
+        return cleaned_data
+
 # form for searching something
 class SearchForm(forms.Form):
     search_text = forms.CharField(required=False)
@@ -0,0 +1,227 @@
+# File: geocoding.py
+#
+# Looks up park addresses with the Google Maps geocoding API. Results are kept
+# in the "geocode" cache so the same address only goes over the network once,
+# and new parks are checked by a pool of background workers so adding a park
+# never waits on the API.
+import hashlib
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .geocoding_client import get_client
+from .models import Parks, Courts
+
+logger = logging.getLogger(__name__)
+
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
+
+# build the address string used for a park's fields
+def format_address(street, city, state, zipcode):
+    return "{}, {}, {} {}".format(street, city, state, zipcode)
+
+
+# normalize an address so that trivially different spellings share a cache
+# entry: case, extra whitespace and a trailing country are ignored
+def normalize_address(address):
+    address = re.sub(r"\s+", " ", address.strip().lower())
+    address = re.sub(r"\s*,\s*", ", ", address)
+    if address.endswith(", usa"):
+        address = address[:-len(", usa")]
+    return address
+
+
+def get_cache_key(address):
+    digest = hashlib.sha1(normalize_address(address).encode("utf-8"))
+    return "geocode:" + digest.hexdigest()
+
+
+# split a formatted address from the API into its street, city and
+# "state zip" parts, dropping a leading place name if there is one
+def split_formatted_address(formatted_address):
+    parts = formatted_address.split(", ")
+    if len(parts) > 4:
+        parts = parts[1:]
+    return parts
+
+
+# ask the API for an address, returning a dict with the formatted address and
+# coordinates, {} if there is no match, or None if the lookup failed or the
+# API is currently unhealthy
+def fetch_geocode(address, api_key):
+    results = get_client().get_json(GEOCODE_URL, params={"address": address, "key": api_key})
+    if results is None:
+        return None
+
+    if results.get("status") == "ZERO_RESULTS":
+        return {}
+    if results.get("status") != "OK" or not results.get("results"):
+        return None
+
+    match = results["results"][0]
+    location = match.get("geometry", {}).get("location", {})
+    return {"formatted_address": match["formatted_address"],
+            "latitude": location.get("lat"),
+            "longitude": location.get("lng")}
+
+
+# geocode an address, using the cache when possible; see fetch_geocode for the
+# return value
+def geocode(address, api_key):
+    cache = caches["geocode"]
+    key = get_cache_key(address)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    result = fetch_geocode(address, api_key)
+    if result is None:
+        # failed lookups are not cached so they are retried next time
+        return None
+
+    entries = {key: result}
+
+    # the API's version of the address may become the park's address, so
+    # cache it as well to make looking it up again free
+    if result:
+        parts = split_formatted_address(result["formatted_address"])
+        entries[get_cache_key(", ".join(parts))] = result
+    cache.set_many(entries)
+    return result
+
+
+# geocoder backed by the google maps API, using the apiKey environment variable
+class GoogleGeocoder:
+    def __init__(self):
+        self.api_key = os.environ.get('apiKey')
+
+    # lookups are only possible with an API key
+    @property
+    def available(self):
+        return self.api_key is not None
+
+    def geocode(self, address):
+        return geocode(address, self.api_key)
+
+
+# geocoder answering from a fixed table of addresses, for tests and local
+# development without an API key
+class StubGeocoder:
+    # normalized address -> result, see fetch_geocode
+    results = {}
+    available = True
+
+    def geocode(self, address):
+        return self.results.get(normalize_address(address), {})
+
+
+# return an instance of the geocoder chosen by the PICKUP_GEOCODER setting
+def get_geocoder():
+    backend = getattr(settings, "PICKUP_GEOCODER", "pickup.geocoding.GoogleGeocoder")
+    return import_string(backend)()
+
+
+# compare a geocoding result with the address it was looked up for, returning
+# the park's geocode status and suggested address, or None if the lookup failed
+def check_address(address, result):
+    if result is None:
+        return None
+
+    parts = []
+    if result:
+        parts = split_formatted_address(result["formatted_address"])
+    if len(parts) < 3:
+        return Parks.FAILED, ""
+
+    suggested_address = ", ".join(parts)
+    if normalize_address(suggested_address) == normalize_address(address):
+        return Parks.VERIFIED, ""
+    return Parks.MISMATCH, normalize_suggestion(suggested_address)
+
+
+# check a park's address, saving its coordinates and flagging it if google
+# maps does not agree with the address that was entered
+def resolve_park(park, geocoder):
+    address = format_address(park.street, park.city, park.state, park.zipcode)
+    result = geocoder.geocode(address + ", USA")
+    checked = check_address(address, result)
+    if checked is None:
+        # the lookup failed or the API is unhealthy: keep the address as it
+        # was entered and leave the park pending to try again later
+        return park
+
+    park.geocode_status, suggested_address = checked
+    if park.geocode_status == Parks.FAILED:
+        park.save(update_fields=["geocode_status"])
+        return park
+
+    if result.get("latitude") is not None and result.get("longitude") is not None:
+        Courts.objects.update_or_create(
+            park=park, name=park.name,
+            defaults={"latitude": result["latitude"],
+                      "longitude": result["longitude"]})
+
+    park.suggested_address = suggested_address
+    park.save(update_fields=["geocode_status", "suggested_address"])
+    return park
+
+
+# drop the country from an address suggested by the API
+def normalize_suggestion(address):
+    if address.endswith(", USA"):
+        address = address[:-len(", USA")]
+    return address
+
+
+# split a suggested address into the street, city, state and zipcode fields
+def split_suggestion(address):
+    parts = split_formatted_address(address)
+    return {"street": parts[0], "city": parts[1],
+            "state": parts[2][0:2], "zipcode": parts[2][3:9]}
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "PICKUP_GEOCODE_WORKERS", 2),
+                thread_name_prefix="geocode")
+    return _executor
+
+
+# background job resolving a single park
+def run_geocode_job(park_id):
+    try:
+        park = Parks.objects.filter(id=park_id).first()
+        if park is not None and park.geocode_status == Parks.PENDING:
+            resolve_park(park, get_geocoder())
+    except Exception:
+        logger.exception("Geocoding park %s failed", park_id)
+    finally:
+        # worker threads open their own connection, do not leave it open
+        connection.close()
+
+
+# check a park's address in the background; with no workers configured the
+# check runs right away in the calling thread
+def queue_geocode(park_id):
+    if not get_geocoder().available:
+        return
+    if getattr(settings, "PICKUP_GEOCODE_WORKERS", 2) == 0:
+        park = Parks.objects.get(id=park_id)
+        resolve_park(park, get_geocoder())
+        return
+    get_executor().submit(run_geocode_job, park_id)
@@ -0,0 +1,179 @@
+# File: geocoding_client.py
+#
+# Shared HTTP client for the geocoding API. Connections are pooled and kept
+# alive, every request is bounded by connect/read timeouts and a small number
+# of retries with backoff, and a circuit breaker stops calling the API for a
+# while after repeated failures so slow upstream responses cannot pile up.
+import logging
+import threading
+import time
+from collections import deque
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# defaults for the PICKUP_GEOCODE_CLIENT setting
+DEFAULT_OPTIONS = {
+    "connect_timeout": 3.05,
+    "read_timeout": 5,
+    "retries": 2,
+    "backoff_factor": 0.3,
+    "pool_size": 10,
+    "failure_threshold": 5,
+    "reset_timeout": 30,
+}
+
+
+# circuit breaker: after failure_threshold failures in a row the circuit opens
+# and calls are refused until reset_timeout seconds have passed, then a single
+# trial call is let through to decide whether to close it again
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    # whether a call may go ahead right now
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and \
+                    self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or \
+                    self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Geocoding circuit opened after %d failures",
+                                   self.failures)
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+
+# running latency statistics for calls to the API
+class LatencyMetrics:
+    # number of recent samples kept for percentiles
+    WINDOW = 1000
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.samples = deque(maxlen=self.WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.samples.append(seconds)
+
+    # a call refused by the open circuit
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self.samples)
+            snapshot = {"calls": self.calls,
+                        "failures": self.failures,
+                        "rejected": self.rejected,
+                        "max_seconds": self.max_seconds,
+                        "mean_seconds": self.total_seconds / self.calls if self.calls else 0.0}
+        for percentile in (50, 95, 99):
+            index = min(len(samples) - 1, len(samples) * percentile // 100)
+            snapshot["p{}_seconds".format(percentile)] = samples[index] if samples else 0.0
+        return snapshot
+
+
+class GeocodingClient:
+    def __init__(self, connect_timeout, read_timeout, retries, backoff_factor,
+                 pool_size, failure_threshold, reset_timeout):
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.metrics = LatencyMetrics()
+
+        # retry connection errors and server errors, waiting longer each time
+        retry = Retry(total=retries, connect=retries, read=retries,
+                      status=retries, backoff_factor=backoff_factor,
+                      status_forcelist=(500, 502, 503, 504),
+                      allowed_methods=frozenset(["GET"]),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # GET a JSON document, returning None if the request fails or the circuit
+    # is open
+    def get_json(self, url, params=None):
+        if not self.breaker.allow():
+            self.metrics.record_rejected()
+            return None
+
+        start = time.monotonic()
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as error:
+            self.metrics.record(time.monotonic() - start, False)
+            self.breaker.record_failure()
+            logger.warning("Geocoding request failed: %s", error)
+            return None
+
+        self.metrics.record(time.monotonic() - start, True)
+        self.breaker.record_success()
+        return data
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+# return the shared client, configured from the PICKUP_GEOCODE_CLIENT setting
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            options = dict(DEFAULT_OPTIONS)
+            options.update(getattr(settings, "PICKUP_GEOCODE_CLIENT", {}))
+            _client = GeocodingClient(**options)
+    return _client
+
+
+# drop the shared client so the next call builds a new one
+def reset_client():
+    global _client
+    with _client_lock:
+        _client = None
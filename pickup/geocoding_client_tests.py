@@ -0,0 +1,149 @@
+from django.test import SimpleTestCase
+from pickup.geocoding_client import GeocodingClient, CircuitBreaker
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+
+# local HTTP server standing in for the geocoding API; each request takes the
+# next (status, body, delay) from its script, repeating the last one
+class FakeGeocodingServer:
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = []
+        self.connections = set()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests.append(self.path)
+                server.connections.add(self.client_address)
+                status, body, delay = server.script[0]
+                if len(server.script) > 1:
+                    server.script.pop(0)
+                time.sleep(delay)
+
+                data = json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client gave up waiting
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = "http://127.0.0.1:{}/geocode/json".format(self.httpd.server_port)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+OK = (200, {"status": "OK", "results": []}, 0)
+UNAVAILABLE = (503, {"status": "UNKNOWN_ERROR"}, 0)
+
+
+# tests for the pooled geocoding client against a local server
+class GeocodingClientTests(SimpleTestCase):
+
+    def make_client(self, **options):
+        settings = {"connect_timeout": 1, "read_timeout": 0.5, "retries": 2,
+                    "backoff_factor": 0, "pool_size": 2,
+                    "failure_threshold": 2, "reset_timeout": 60}
+        settings.update(options)
+        return GeocodingClient(**settings)
+
+    def serve(self, *script):
+        server = FakeGeocodingServer(script)
+        self.addCleanup(server.close)
+        return server
+
+    # test that requests reuse a pooled keep-alive connection
+    def test_connection_reused(self):
+        server = self.serve(OK)
+        client = self.make_client()
+        for i in range(3):
+            self.assertEqual(client.get_json(server.url, {"address": i}), OK[1])
+
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(len(server.connections), 1)
+
+    # test that server errors are retried
+    def test_retry_server_error(self):
+        server = self.serve(UNAVAILABLE, OK)
+        client = self.make_client()
+        self.assertEqual(client.get_json(server.url), OK[1])
+        self.assertEqual(len(server.requests), 2)
+
+    # test that a slow server is cut off by the read timeout
+    def test_read_timeout(self):
+        server = self.serve((200, {"status": "OK"}, 1))
+        client = self.make_client(retries=0, read_timeout=0.1)
+
+        start = time.monotonic()
+        self.assertIsNone(client.get_json(server.url))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(client.metrics.snapshot()["failures"], 1)
+
+    # test that the circuit opens after repeated failures and stops calls
+    def test_circuit_opens(self):
+        server = self.serve(UNAVAILABLE)
+        client = self.make_client(retries=0)
+
+        self.assertIsNone(client.get_json(server.url))
+        self.assertIsNone(client.get_json(server.url))
+        self.assertIsNone(client.get_json(server.url))
+
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(client.metrics.snapshot()["rejected"], 1)
+
+    # test that latency is recorded for each call
+    def test_metrics(self):
+        server = self.serve(OK)
+        client = self.make_client()
+        client.get_json(server.url)
+        client.get_json(server.url)
+
+        metrics = client.metrics.snapshot()
+        self.assertEqual(metrics["calls"], 2)
+        self.assertEqual(metrics["failures"], 0)
+        self.assertGreater(metrics["p50_seconds"], 0)
+        self.assertGreaterEqual(metrics["max_seconds"], metrics["p99_seconds"])
+
+
+# tests for the circuit breaker's state changes
+class CircuitBreakerTests(SimpleTestCase):
+
+    def test_half_open_after_timeout(self):
+        now = [0]
+        breaker = CircuitBreaker(1, 30, clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        # one trial call is let through after the timeout
+        now[0] = 30
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        # a failed trial opens the circuit again, a successful one closes it
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        now[0] = 60
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
@@ -0,0 +1,134 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.core.cache import caches
+from pickup.models import Player, Parks
+from pickup.geocoding import normalize_address, geocode, StubGeocoder
+from django.core.management import call_command
+from io import StringIO
+from unittest.mock import patch, Mock
+import os
+
+# keep geocoding results in memory while testing
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'geocode': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'geocode-tests'},
+}
+
+HUDSON_YARDS = {
+    "status": "OK",
+    "results": [{"formatted_address": "20 Hudson Yards, New York, NY 10001, USA",
+                 "geometry": {"location": {"lat": 40.7536, "lng": -74.0010}}}],
+}
+
+
+# build a fake geocoding client answering every request with data
+def fake_client(data):
+    client = Mock()
+    client.get_json.return_value = data
+    return client
+
+
+# tests for the cached geocoding lookups
+@override_settings(CACHES=TEST_CACHES)
+class GeocodeCacheTests(TestCase):
+
+    def setUp(self):
+        caches['geocode'].clear()
+
+    def test_normalize_address(self):
+        self.assertEqual(normalize_address("  20 Hudson Yards ,New  York, NY 10001, USA"),
+                         "20 hudson yards, new york, ny 10001")
+
+    # test that repeating a lookup does not go over the network again
+    @patch("pickup.geocoding.get_client", return_value=fake_client(HUDSON_YARDS))
+    def test_repeat_lookup_cached(self, get):
+        first = geocode("20 Hudson Yards, New York, NY 10001, USA", "key")
+        second = geocode("20 hudson yards, new york, NY 10001", "key")
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(first["latitude"], 40.7536)
+
+    # test that the address suggested by the API is cached for the confirmation
+    @patch("pickup.geocoding.get_client", return_value=fake_client(HUDSON_YARDS))
+    def test_suggested_address_cached(self, get):
+        geocode("20 Huson Yards, New York, NY 10001, USA", "key")
+        geocode("20 Hudson Yards, New York, NY 10001, USA", "key")
+        self.assertEqual(get.call_count, 1)
+
+    # test that failed lookups are retried instead of cached
+    @patch("pickup.geocoding.get_client",
+           return_value=fake_client({"status": "OVER_QUERY_LIMIT", "results": []}))
+    def test_failure_not_cached(self, get):
+        self.assertIsNone(geocode("20 Hudson Yards, New York, NY 10001", "key"))
+        self.assertIsNone(geocode("20 Hudson Yards, New York, NY 10001", "key"))
+        self.assertEqual(get.call_count, 2)
+
+    # test that a new park is checked with the google geocoder through the cache
+    @patch.dict(os.environ, {"apiKey": "key"})
+    @patch("pickup.geocoding.get_client", return_value=fake_client(HUDSON_YARDS))
+    @override_settings(PICKUP_GEOCODE_WORKERS=0)
+    def test_add_park_geocoded(self, get):
+        Player.objects.create_user("root", "root@root.com", "root")
+        self.client.post(reverse("login"), {"username": "root", "password": "root"})
+        geocode("20 Hudson Yards, New York, NY 10001", "key")
+
+        fields = {'name': 'Good Park', 'street': '20 Hudson Yards', 'city': 'New York',
+                  'state': 'NY', 'zipcode': '10001'}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('Add Park'), fields)
+        self.assertContains(response, "Park has been added!")
+        self.assertEqual(Parks.objects.get().geocode_status, Parks.VERIFIED)
+        self.assertEqual(get.call_count, 1)
+
+
+# tests for the background address check of new parks
+@override_settings(CACHES=TEST_CACHES, PICKUP_GEOCODER="pickup.geocoding.StubGeocoder")
+class GeocodePipelineTests(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create_user("root", "root@root.com", "root")
+        self.client.post(reverse("login"), {"username": "root", "password": "root"})
+
+    # test that adding a park does not wait for the address check
+    @override_settings(PICKUP_GEOCODE_WORKERS=2)
+    def test_add_park_pending(self):
+        fields = {'name': 'Good Park', 'street': '20 Hudson Yards', 'city': 'New York',
+                  'state': 'NY', 'zipcode': '10001'}
+        with patch("pickup.views.queue_geocode") as queue:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('Add Park'), fields)
+
+        park = Parks.objects.get()
+        self.assertContains(response, "Park has been added!")
+        self.assertEqual(park.geocode_status, Parks.PENDING)
+        queue.assert_called_once_with(park.id)
+
+    # test that a duplicate park is rejected without being queued
+    def test_add_park_duplicate(self):
+        fields = {'name': 'Good Park', 'street': '20 Hudson Yards', 'city': 'New York',
+                  'state': 'NY', 'zipcode': '10001'}
+        self.client.post(reverse('Add Park'), fields)
+        with patch("pickup.views.queue_geocode") as queue:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('Add Park'), fields)
+        self.assertContains(response, "already exists")
+        self.assertEqual(Parks.objects.count(), 1)
+        queue.assert_not_called()
+
+    # test that the command resolves parks left pending
+    def test_geocode_parks_command(self):
+        park = Parks(player=self.player, name='Good Park', street='20 Hudson Yards',
+                     city='New York', state='NY', zipcode='10001')
+        park.save()
+
+        results = {"20 hudson yards, new york, ny 10001": {
+            "formatted_address": "20 Hudson Yards, New York, NY 10001, USA",
+            "latitude": 40.7536, "longitude": -74.0010}}
+        output = StringIO()
+        with patch.dict(StubGeocoder.results, results):
+            call_command("geocode_parks", stdout=output)
+
+        self.assertIn("Verified: 1", output.getvalue())
+        self.assertEqual(Parks.objects.get().geocode_status, Parks.VERIFIED)
@@ -0,0 +1,89 @@
+# File: geohash.py
+#
+# Geohash encoding and great circle distances, used to index court
+# coordinates so that nearby courts sort next to each other.
+import math
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# precision stored in the index
+GEOHASH_PRECISION = 12
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 110.57
+KM_PER_DEGREE_LNG = 111.32
+
+
+# encode a coordinate as a geohash of the given length
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        # bits alternate between longitude and latitude, starting with longitude
+        if even:
+            value, bounds = longitude, lng_range
+        else:
+            value, bounds = latitude, lat_range
+        middle = (bounds[0] + bounds[1]) / 2
+        if value >= middle:
+            bits = (bits << 1) | 1
+            bounds[0] = middle
+        else:
+            bits = bits << 1
+            bounds[1] = middle
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(geohash)
+
+
+# size of a geohash cell of the given length in degrees, (lat, lng)
+def cell_size(precision):
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+# the cell containing a point and its eight neighbours
+def neighbourhood(latitude, longitude, precision):
+    lat_size, lng_size = cell_size(precision)
+    cells = set()
+    for lat_step in (-1, 0, 1):
+        lat = min(90.0, max(-90.0, latitude + lat_step * lat_size))
+        for lng_step in (-1, 0, 1):
+            lng = (longitude + lng_step * lng_size + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(lat, lng, precision))
+    return cells
+
+
+# distance in km that the 3x3 block of cells around a point is guaranteed to
+# cover in every direction
+def covered_radius(latitude, precision):
+    lat_size, lng_size = cell_size(precision)
+    widest_lat = min(90.0, abs(latitude) + 2 * lat_size)
+    width = lng_size * KM_PER_DEGREE_LNG * math.cos(math.radians(widest_lat))
+    return min(lat_size * KM_PER_DEGREE_LAT, width)
+
+
+# great circle distance in km from one point to each of a list of points
+def haversine_distances(latitude, longitude, points):
+    lat1 = math.radians(latitude)
+    lng1 = math.radians(longitude)
+    cos_lat1 = math.cos(lat1)
+    distances = []
+    for lat, lng in points:
+        lat2 = math.radians(lat)
+        half_dlat = (lat2 - lat1) / 2
+        half_dlng = (math.radians(lng) - lng1) / 2
+        a = math.sin(half_dlat) ** 2 + cos_lat1 * math.cos(lat2) * math.sin(half_dlng) ** 2
+        distances.append(2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a))))
+    return distances
@@ -0,0 +1,85 @@
+# File: ical.py
+#
+# iCalendar (RFC 5545) feeds of matches, written one line at a time so a
+# feed can be streamed while its matches are still being read. Times are
+# floating local times, the same way matches are stored.
+import datetime
+import hashlib
+
+from .slots import SLOT_LABELS, SLOT_MINUTES
+
+# longest line allowed by the format, in octets
+LINE_OCTETS = 75
+
+PRODID = "-//Pickup Games//Matches//EN"
+
+# domain part of event ids, kept the same whatever host a feed is read from
+UID_DOMAIN = "pickupgames"
+
+
+# escape a text value
+def escape_text(text):
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+# split a content line into lines of at most 75 octets, never inside a
+# multi-byte character; continuation lines start with a space
+def fold_line(line):
+    data = line.encode("utf-8")
+    lines, start, limit = [], 0, LINE_OCTETS
+    while len(data) - start > limit:
+        end = start + limit
+        # back up to the start of a character
+        while data[end] & 0xC0 == 0x80:
+            end -= 1
+        lines.append(data[start:end].decode("utf-8"))
+        start, limit = end, LINE_OCTETS - 1
+    lines.append(data[start:].decode("utf-8"))
+    return "\r\n ".join(lines) + "\r\n"
+
+
+def format_datetime(value):
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+# start of a match as a datetime
+def match_start(match):
+    return datetime.datetime.combine(match.date, datetime.time()) + \
+        datetime.timedelta(minutes=SLOT_MINUTES * match.time)
+
+
+# the content lines of one match; the park must be loaded with it. The stamp
+# is a UTC time, which local times are in with TIME_ZONE = 'UTC'.
+def event_lines(match, stamp, status="CONFIRMED"):
+    park = match.park
+    start = match_start(match)
+    yield "BEGIN:VEVENT"
+    yield "UID:match-{}@{}".format(match.id, UID_DOMAIN)
+    yield "DTSTAMP:" + format_datetime(stamp) + "Z"
+    yield "DTSTART:" + format_datetime(start)
+    yield "DTEND:" + format_datetime(start + datetime.timedelta(minutes=SLOT_MINUTES * match.duration))
+    yield "SUMMARY:" + escape_text(match.name)
+    yield "LOCATION:" + escape_text("{}, {}, {}, {} {}".format(
+        park.name, park.street, park.city, park.state, park.zipcode))
+    yield "DESCRIPTION:" + escape_text("{} at {}, {}".format(
+        match.name, park.name, SLOT_LABELS[match.time]))
+    yield "STATUS:" + status
+    yield "END:VEVENT"
+
+
+# iterate over the folded lines of a calendar of (match, status) pairs
+def calendar_lines(events, name, stamp):
+    header = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:" + PRODID,
+              "CALSCALE:GREGORIAN", "X-WR-CALNAME:" + escape_text(name)]
+    for line in header:
+        yield fold_line(line)
+    for match, status in events:
+        for line in event_lines(match, stamp, status):
+            yield fold_line(line)
+    yield fold_line("END:VCALENDAR")
+
+
+# strong entity tag for a feed, from whatever summarizes its current state
+def feed_etag(*parts):
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
@@ -0,0 +1,161 @@
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from pickup.models import Player, Parks, Courts
+from pickup.geocoding import StubGeocoder
+from pickup.geohash import encode_geohash
+from pickup.geocoding_tests import TEST_CACHES
+from pickup.tiles import tile_keys
+from django.core.cache import cache
+from io import StringIO
+from unittest.mock import patch
+import json
+import os
+import tempfile
+
+CSV_HEADER = "Name,Street,City,State,Zipcode,Latitude,Longitude\n"
+
+
+# tests for importing park datasets with the import_parks command
+@override_settings(CACHES=TEST_CACHES, PICKUP_GEOCODER="pickup.geocoding.StubGeocoder")
+class ImportParksTests(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create_user("root", "root@root.com", "root")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        output, errors = StringIO(), StringIO()
+        call_command("import_parks", path, "--owner", "root", *args,
+                     stdout=output, stderr=errors)
+        return output.getvalue(), errors.getvalue()
+
+    # test that rows are normalized and located parks get courts
+    def test_import_csv(self):
+        path = self.write("parks.csv", CSV_HEADER +
+                          "Patterson Park,2601 E Baltimore St,Baltimore,maryland,21224,39.2905,-76.58\n"
+                          "Druid Hill Park, 900 Druid Park Lake Dr ,Baltimore,MD,21217,,\n"
+                          "Bad Zip Park,1 Main St,Baltimore,MD,2121,,\n")
+        output, errors = self.run_import(path, "--skip-geocode")
+
+        self.assertIn("Created: 2", output)
+        self.assertIn("Invalid: 1", output)
+        self.assertIn("Row 3", errors)
+        self.assertIn("rows/s", output)
+
+        patterson = Parks.objects.get(name="Patterson Park")
+        self.assertEqual(patterson.state, "MD")
+        self.assertEqual(patterson.geocode_status, Parks.VERIFIED)
+        self.assertEqual(Courts.objects.get(park=patterson).geohash,
+                         encode_geohash(39.2905, -76.58))
+
+        druid = Parks.objects.get(name="Druid Hill Park")
+        self.assertEqual(druid.street, "900 Druid Park Lake Dr")
+        self.assertEqual(druid.geocode_status, Parks.PENDING)
+        self.assertFalse(Courts.objects.filter(park=druid).exists())
+
+    # test that GeoJSON features are read across buffer boundaries
+    def test_import_geojson(self):
+        features = [{"type": "Feature",
+                     "geometry": {"type": "Point", "coordinates": [-76.6 + i / 1000, 39.3]},
+                     "properties": {"name": "Park %d" % i, "street": "%d Main St" % i,
+                                    "city": "Baltimore", "state": "MD", "zipcode": "21201"}}
+                    for i in range(50)]
+        path = self.write("parks.geojson", json.dumps(
+            {"type": "FeatureCollection", "features": features}, indent=2))
+
+        with patch("pickup.management.commands.import_parks.READ_SIZE", 100):
+            output, errors = self.run_import(path, "--batch-size", "20")
+
+        self.assertIn("Created: 50", output)
+        self.assertEqual(Courts.objects.count(), 50)
+        self.assertAlmostEqual(Courts.objects.get(name="Park 10").longitude, -76.59)
+
+    # test that duplicates are skipped by default and updated on request
+    def test_duplicates(self):
+        Parks(player=self.player, name="Patterson Park", street="2601 E Baltimore St",
+              city="Baltimore", state="MD", zipcode="21224").save()
+        path = self.write("parks.csv", CSV_HEADER +
+                          "Patterson Park,2601 E Baltimore St,Baltimore,MD,21224,39.2905,-76.58\n"
+                          "Patterson Park,2601 E Baltimore St,Baltimore,MD,21224,39.2905,-76.58\n")
+
+        output, errors = self.run_import(path)
+        self.assertIn("Duplicates: 2", output)
+        self.assertEqual(Parks.objects.get().geocode_status, Parks.PENDING)
+
+        output, errors = self.run_import(path, "--on-duplicate", "update")
+        self.assertIn("Updated: 1", output)
+        self.assertEqual(Parks.objects.get().geocode_status, Parks.VERIFIED)
+        self.assertEqual(Courts.objects.count(), 1)
+
+    # test that updating a park drops the cached tiles of its old court
+    def test_update_invalidates_tiles(self):
+        park = Parks(player=self.player, name="Patterson Park", street="2601 E Baltimore St",
+                     city="Baltimore", state="MD", zipcode="21224")
+        park.save()
+        Courts(name="Patterson Park", latitude=39.30, longitude=-76.50, park=park).save()
+        old = tile_keys(39.30, -76.50)
+        cache.set_many(dict.fromkeys(old, "stale"))
+
+        path = self.write("parks.csv", CSV_HEADER +
+                          "Patterson Park,2601 E Baltimore St,Baltimore,MD,21224,39.2905,-76.58\n")
+        with self.captureOnCommitCallbacks(execute=True):
+            output, errors = self.run_import(path, "--on-duplicate", "update")
+        self.assertIn("Updated: 1", output)
+        self.assertEqual(cache.get_many(old), {})
+        self.assertEqual(Courts.objects.get().longitude, -76.58)
+
+    # test that addresses are geocoded unless skipped
+    def test_geocoded(self):
+        path = self.write("parks.csv", CSV_HEADER +
+                          "Good Park,20 Hudson Yards,New York,NY,10001,,\n"
+                          "Lost Park,1 Nowhere Rd,New York,NY,10001,,\n")
+        results = {"20 hudson yards, new york, ny 10001": {
+            "formatted_address": "20 Hudson Yards, New York, NY 10001, USA",
+            "latitude": 40.7536, "longitude": -74.0010}}
+        with patch.dict(StubGeocoder.results, results):
+            self.run_import(path, "--workers", "2")
+
+        good = Parks.objects.get(name="Good Park")
+        self.assertEqual(good.geocode_status, Parks.VERIFIED)
+        self.assertEqual(Courts.objects.get(park=good).latitude, 40.7536)
+        self.assertEqual(Parks.objects.get(name="Lost Park").geocode_status, Parks.FAILED)
+
+    # test that an interrupted import continues after its last finished batch
+    def test_resume(self):
+        rows = "".join("Park {0},{0} Main St,Baltimore,MD,21201,39.3,-76.6\n".format(i)
+                       for i in range(10))
+        path = self.write("parks.csv", CSV_HEADER + rows)
+
+        # fail while writing the third batch
+        create = Parks.objects.bulk_create
+        calls = []
+
+        def interrupted(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            return create(*args, **kwargs)
+
+        with patch.object(Parks.objects, "bulk_create", side_effect=interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_import(path, "--batch-size", "3")
+        self.assertEqual(Parks.objects.count(), 6)
+
+        output, errors = self.run_import(path, "--batch-size", "3", "--resume")
+        self.assertIn("Resuming after row 6", output)
+        self.assertIn("Created: 4", output)
+        self.assertEqual(Parks.objects.count(), 10)
+        self.assertFalse(os.path.exists(path + ".import-progress"))
+
+    def test_unknown_owner(self):
+        path = self.write("parks.csv", CSV_HEADER)
+        with self.assertRaises(CommandError):
+            call_command("import_parks", path, "--owner", "nobody", stdout=StringIO())
@@ -0,0 +1,52 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pickup.models import ArchivedMatch, MatchSeries, ParkAvailability, Schedule
+
+# matches older than this many days are archived unless --days is given
+ARCHIVE_AFTER_DAYS = 90
+
+
+# command for moving long past matches and their signups out of the live
+# tables, meant to be run daily, e.g. from cron. Each batch is archived in its
+# own transaction, so the command can be stopped and run again at any time.
+class Command(BaseCommand):
+    help = "Move matches older than a number of days, and their signups, into the archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int,
+                            default=getattr(settings, "PICKUP_ARCHIVE_AFTER_DAYS", ARCHIVE_AFTER_DAYS),
+                            help="Archive matches more than this many days old")
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Number of matches archived in each transaction")
+
+    def handle(self, *args, **options):
+        if options["days"] < 1:
+            raise CommandError("--days must be at least 1, only past matches are archived")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        cutoff = datetime.date.today() - datetime.timedelta(days=options["days"])
+        start = time.monotonic()
+        matches = signups = 0
+        while True:
+            batch = list(Schedule.objects.filter(date__lt=cutoff).order_by("date", "id")
+                         .values_list("id", flat=True)[:options["batch_size"]])
+            if not batch:
+                break
+            moved = ArchivedMatch.archive(batch)
+            matches += moved[0]
+            signups += moved[1]
+            self.stdout.write("{} matches, {} signups archived".format(matches, signups))
+
+        # the bitmaps of the archived days and the series that ended before
+        # them are no longer needed
+        days = ParkAvailability.objects.filter(date__lt=cutoff).delete()[0]
+        series = MatchSeries.objects.filter(until__lt=cutoff).delete()[1].get("pickup.MatchSeries", 0)
+
+        self.stdout.write("Archived {} matches and {} signups before {} in {:.1f}s".format(
+            matches, signups, cutoff, time.monotonic() - start))
+        self.stdout.write("Pruned {} availability rows and {} finished series".format(days, series))
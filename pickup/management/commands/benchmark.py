@@ -0,0 +1,200 @@
+import datetime
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from pickup import urls
+from pickup.benchmark import COMPARED, regressions, summarize
+from pickup.models import Player, Parks, Schedule, EventSignup, Conversation, MatchSeries, Messages
+from pickup.views import calendar_token
+
+# tables whose sizes are recorded with each run
+COUNTED = {"players": Player, "parks": Parks, "matches": Schedule, "signups": EventSignup,
+           "messages": Messages}
+
+# cursor before every message, for the history page
+HISTORY_CURSOR = "2100-01-01T00:00:00_0"
+
+# pages skipped when the database has nothing for them
+OPTIONAL = {"join_occurrence"}
+
+
+# the URL arguments and query of the GET request made to each page in
+# pickup/urls.py, picked from the data of the logged in player
+def route_requests(player):
+    today = datetime.date.today()
+    partner = Conversation.objects.filter(player=player).order_by("-last_sent") \
+        .values_list("partner__username", flat=True).first()
+    if partner is None:
+        partner = Player.objects.exclude(id=player.id).values_list("username", flat=True).first()
+    match = (Schedule.objects.filter(eventsignup__player=player, date__gte=today).first()
+             or Schedule.objects.filter(date__gte=today).order_by("date", "time").first())
+    if partner is None or match is None:
+        raise CommandError("The database has no other players or no upcoming matches, "
+                           "fill it with seed_benchmark first")
+    park = match.park
+    parks = list(Parks.objects.filter(zipcode=park.zipcode).values_list("id", flat=True)[:10])
+    mismatch = Parks.objects.filter(player=player, geocode_status=Parks.MISMATCH).first() or park
+    series = MatchSeries.objects.filter(until__gte=today).first()
+    occurrence = series and next(iter(series.dates(today, series.until)), None)
+
+    requests = {
+        "index": {},
+        "register": {},
+        "login": {},
+        "logout": {},
+        "view_profile": {},
+        "view_player": {"kwargs": {"username": partner}},
+        "search_players": {"data": {"search_text": partner[:3]}},
+        "complete_player": {"data": {"q": player.first_name[:2] or partner[:2]}},
+        "change_password": {},
+        "Add Park": {},
+        "edit_profile": {},
+        "parks": {"data": {"search_text": park.city}},
+        "nearby_parks": {"data": {"zipcode": park.zipcode}},
+        "parks_map": {},
+        "park_markers": {"data": {"south": 38.8, "west": -77.1, "north": 39.8, "east": -76.1,
+                                  "zoom": 10}},
+        "park_free_slots": {"data": {"parks": ",".join(map(str, parks)), "days": 7}},
+        "upcoming_matches": {"data": {"scope": "all"}},
+        "my_week": {},
+        "event_signup": {"kwargs": {"parkid": park.id}},
+        "create_series": {"kwargs": {"parkid": park.id}},
+        "park_calendar": {"kwargs": {"parkid": park.id}},
+        "player_calendar": {"kwargs": {"token": calendar_token(player.id)}},
+        "accept_park_address": {"kwargs": {"parkid": mismatch.id}},
+        "favorite_park": {"kwargs": {"add": 1, "parkid": park.id}},
+        "join_event": {"kwargs": {"parkid": park.id, "add": 1, "eventid": match.id}},
+        "messages": {},
+        "messages_conversation": {"kwargs": {"username": partner}},
+        "messages_history": {"kwargs": {"username": partner}, "data": {"before": HISTORY_CURSOR}},
+        "new_message": {"data": {"search_text": partner[:3]}},
+    }
+    if occurrence is not None:
+        requests["join_occurrence"] = {"kwargs": {"seriesid": series.id,
+                                                  "date": occurrence.isoformat()}}
+    return requests
+
+
+# command for timing every page against the current database, usually one
+# filled by seed_benchmark. Each page is requested with GET through the test
+# client, as a logged in player, so the forms behind POST pages are timed but
+# nothing is changed. The numbers cover the views, middleware and templates,
+# not a web server; requests are made one at a time.
+class Command(BaseCommand):
+    help = "Time every page and write p50/p95/p99 latencies and throughput as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50,
+                            help="Number of timed requests to each page")
+        parser.add_argument("--warmup", type=int, default=3,
+                            help="Number of untimed requests to each page first")
+        parser.add_argument("--username", default="bench0", help="Player the pages are opened as")
+        parser.add_argument("--route", action="append", default=None,
+                            help="Name of a page to time, may be repeated; by default all")
+        parser.add_argument("--host", default="localhost",
+                            help="Host the requests are made to, must be in ALLOWED_HOSTS")
+        parser.add_argument("--output", default=None,
+                            help="File the results are written to, by default standard output")
+        parser.add_argument("--baseline", default=None,
+                            help="Results of an earlier run to compare against")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="Fraction a page's {} may grow over the baseline".format(COMPARED))
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["warmup"] < 0:
+            raise CommandError("--requests must be at least 1 and --warmup at least 0")
+        player = Player.objects.filter(username=options["username"]).first()
+        if player is None:
+            raise CommandError("No player named {}, fill the database with seed_benchmark "
+                               "or pass --username".format(options["username"]))
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+        if settings.DEBUG:
+            self.stderr.write("DEBUG is on, the timings include recording every query")
+
+        requests = route_requests(player)
+        names = [pattern.name for pattern in urls.urlpatterns]
+        missing = set(names) - set(requests) - OPTIONAL
+        if missing:
+            raise CommandError("No benchmark request for {}".format(", ".join(sorted(missing))))
+        if options["route"]:
+            unknown = set(options["route"]) - set(names)
+            if unknown:
+                raise CommandError("Unknown pages: {}".format(", ".join(sorted(unknown))))
+            names = [name for name in names if name in options["route"]]
+        for name in OPTIONAL - set(requests):
+            self.stderr.write("Skipping {}, the database has nothing for it".format(name))
+        names = [name for name in names if name in requests]
+
+        client = Client(HTTP_HOST=options["host"])
+        client.force_login(player)
+        results = {
+            "started": datetime.datetime.now().isoformat(timespec="seconds"),
+            "database": connection.vendor,
+            "debug": settings.DEBUG,
+            "rows": {name: model.objects.count() for name, model in COUNTED.items()},
+            "routes": {},
+        }
+        latencies = []
+        for name in names:
+            results["routes"][name] = self.time_route(client, player, name, requests[name],
+                                                      options, latencies)
+        results["total"] = summarize(latencies)
+
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        else:
+            self.stdout.write(output)
+        for name, route in results["routes"].items():
+            self.stderr.write("{:<24} p50 {:>8.2f} ms  p95 {:>8.2f} ms  p99 {:>8.2f} ms  "
+                              "{:>3} queries".format(name, route["p50_ms"], route["p95_ms"],
+                                                     route["p99_ms"], route["queries"]))
+
+        if baseline is not None:
+            slower = regressions(results, baseline, options["tolerance"])
+            for name, before, after in slower:
+                self.stderr.write("{} {} went from {:.2f} ms to {:.2f} ms".format(
+                    name, COMPARED, before, after))
+            if slower:
+                raise CommandError("{} pages are slower than the baseline".format(len(slower)))
+            self.stderr.write("No page is slower than the baseline")
+
+    # time the requests to one page, logging back in before each request to
+    # logout
+    def time_route(self, client, player, name, request, options, timed):
+        url = reverse(name, kwargs=request.get("kwargs"))
+        latencies, statuses, queries = [], set(), 0
+        for number in range(options["warmup"] + options["requests"]):
+            if name == "logout":
+                client.force_login(player)
+            began = time.perf_counter()
+            response = client.get(url, request.get("data"))
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - began
+            if number >= options["warmup"]:
+                latencies.append(elapsed)
+                statuses.add(response.status_code)
+                stats = getattr(response.wsgi_request, "query_stats", None)
+                if stats is not None:
+                    queries = max(queries, stats.count)
+        if any(status >= 400 for status in statuses):
+            raise CommandError("{} answered {}".format(name, sorted(statuses)))
+        if name == "logout":
+            client.force_login(player)
+
+        timed.extend(latencies)
+        summary = summarize(latencies)
+        summary["status"] = sorted(statuses)
+        summary["queries"] = queries
+        return summary
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pickup.geocoding import get_geocoder, resolve_park
+from pickup.models import Parks
+
+
+# command for checking the addresses of parks still waiting to be geocoded,
+# e.g. after a restart dropped the background workers' queue
+class Command(BaseCommand):
+    help = "Geocode every park whose address has not been checked yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None,
+                            help="Maximum number of parks to geocode")
+
+    def handle(self, *args, **options):
+        geocoder = get_geocoder()
+        if not geocoder.available:
+            raise CommandError("No geocoder is available, is apiKey set?")
+
+        parks = Parks.objects.filter(geocode_status=Parks.PENDING).order_by("id")
+        if options["limit"] is not None:
+            parks = parks[:options["limit"]]
+
+        counts = {status: 0 for status, label in Parks.geocode_statuses}
+        for park in parks.iterator():
+            park = resolve_park(park, geocoder)
+            counts[park.geocode_status] += 1
+
+        for status, label in Parks.geocode_statuses:
+            self.stdout.write("{}: {}".format(label, counts[status]))
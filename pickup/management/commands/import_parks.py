@@ -0,0 +1,322 @@
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from localflavor.us.forms import USStateField, USZipCodeField
+
+from pickup.geocoding import check_address, format_address, get_geocoder
+from pickup.geohash import encode_geohash
+from pickup.models import Parks, Courts, ParkSearchGram
+from pickup.tiles import tile_keys
+
+# fields making up the pickup_parks_unique constraint
+PARK_KEY = ("name", "street", "city", "state", "zipcode")
+
+# start of the features array of a GeoJSON feature collection
+FEATURES = re.compile(r'"features"\s*:\s*\[')
+
+READ_SIZE = 64 * 1024
+
+
+# read the rows of a CSV file one at a time as dicts with lowercase headers
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        reader = csv.DictReader(file)
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+        for row in reader:
+            yield row
+
+
+# read the features of a GeoJSON feature collection one at a time, without
+# loading the whole file, as dicts of their properties and point coordinates
+def read_geojson(path):
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8-sig") as file:
+        buffer = ""
+        while True:
+            match = FEATURES.search(buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                raise CommandError("{} is not a GeoJSON feature collection".format(path))
+            # keep enough of the end to match a key split between reads
+            buffer = buffer[-32:] + chunk
+
+        while True:
+            buffer = buffer.lstrip(", \t\r\n")
+            if buffer.startswith("]"):
+                return
+            try:
+                feature, end = decoder.raw_decode(buffer)
+            except ValueError:
+                # the feature continues in the next part of the file
+                chunk = file.read(READ_SIZE)
+                if not chunk:
+                    raise CommandError("{} ends in the middle of a feature".format(path))
+                buffer += chunk
+                continue
+            buffer = buffer[end:]
+            yield feature_row(feature)
+
+
+def feature_row(feature):
+    row = {key.lower(): value for key, value in (feature.get("properties") or {}).items()}
+    geometry = feature.get("geometry") or {}
+    if geometry.get("type") == "Point" and len(geometry.get("coordinates") or []) >= 2:
+        row["longitude"], row["latitude"] = geometry["coordinates"][:2]
+    return row
+
+
+# clean one input row into the fields of a park, raising ValidationError if
+# it can not be imported
+def normalize_row(row):
+    record = {}
+    for field in ("name", "street", "city"):
+        value = " ".join(str(row.get(field) or "").split())
+        if not value:
+            raise ValidationError("missing {}".format(field))
+        if len(value) > Parks._meta.get_field(field).max_length:
+            raise ValidationError("{} is too long".format(field))
+        record[field] = value
+    record["state"] = USStateField().clean(str(row.get("state") or "").strip())
+    record["zipcode"] = USZipCodeField().clean(str(row.get("zipcode") or "").strip())
+
+    record["location"] = None
+    latitude, longitude = row.get("latitude"), row.get("longitude")
+    if latitude not in (None, "") and longitude not in (None, ""):
+        try:
+            latitude, longitude = float(latitude), float(longitude)
+        except ValueError:
+            raise ValidationError("invalid coordinates")
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValidationError("invalid coordinates")
+        record["location"] = (latitude, longitude)
+
+    # parks located by the dataset are trusted, the rest are checked later
+    record["status"] = Parks.VERIFIED if record["location"] else Parks.PENDING
+    record["suggested_address"] = ""
+    return record
+
+
+def record_key(record):
+    return tuple(record[field] for field in PARK_KEY)
+
+
+# look up a record's address, filling in its location and geocode status
+def geocode_record(geocoder, record):
+    address = format_address(record["street"], record["city"],
+                             record["state"], record["zipcode"])
+    result = geocoder.geocode(address + ", USA")
+    checked = check_address(address, result)
+    if checked is None:
+        return record
+    record["status"], record["suggested_address"] = checked
+    if (record["status"] != Parks.FAILED and result.get("latitude") is not None
+            and result.get("longitude") is not None):
+        record["location"] = (result["latitude"], result["longitude"])
+    return record
+
+
+# ids of the parks already stored for the given keys
+def existing_parks(keys):
+    names = {key[0] for key in keys}
+    rows = Parks.objects.filter(name__in=names).values_list("id", *PARK_KEY)
+    return {tuple(row[1:]): row[0] for row in rows if tuple(row[1:]) in keys}
+
+
+# command for loading a city's park dataset from a CSV or GeoJSON file; rows
+# are read and written in batches so memory use does not grow with the file
+class Command(BaseCommand):
+    help = ("Import parks from a CSV or GeoJSON file with name, street, city, state "
+            "and zipcode columns or properties, and optional latitude and longitude")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or GeoJSON file to import")
+        parser.add_argument("--owner", required=True,
+                            help="Username recorded as having added the parks")
+        parser.add_argument("--format", choices=["csv", "geojson"], default=None,
+                            help="Input format, by default taken from the file extension")
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Number of rows written per transaction")
+        parser.add_argument("--workers", type=int, default=8,
+                            help="Number of addresses geocoded at the same time")
+        parser.add_argument("--skip-geocode", action="store_true",
+                            help="Leave parks without coordinates pending, to be "
+                                 "checked later with geocode_parks")
+        parser.add_argument("--on-duplicate", choices=["skip", "update"], default="skip",
+                            help="Whether parks already stored are left alone or have "
+                                 "their location and address check replaced")
+        parser.add_argument("--checkpoint", default=None,
+                            help="File recording progress, by default next to the input")
+        parser.add_argument("--resume", action="store_true",
+                            help="Continue after the last batch a previous run finished")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError("{} does not exist".format(path))
+        if options["batch_size"] < 1 or options["workers"] < 1:
+            raise CommandError("--batch-size and --workers must be positive")
+
+        self.owner = User.objects.filter(username=options["owner"]).first()
+        if self.owner is None:
+            raise CommandError("No user named {}".format(options["owner"]))
+
+        self.geocoder = None
+        if not options["skip_geocode"]:
+            self.geocoder = get_geocoder()
+            if not self.geocoder.available:
+                raise CommandError("No geocoder is available, is apiKey set? "
+                                   "Use --skip-geocode to import without it")
+        self.on_duplicate = options["on_duplicate"]
+
+        file_format = options["format"]
+        if file_format is None:
+            file_format = "geojson" if path.lower().endswith((".json", ".geojson")) else "csv"
+        rows = read_geojson(path) if file_format == "geojson" else read_csv(path)
+
+        checkpoint = options["checkpoint"] or path + ".import-progress"
+        skip = self.read_checkpoint(checkpoint, path) if options["resume"] else 0
+        if skip:
+            self.stdout.write("Resuming after row {}".format(skip))
+
+        self.counts = {"created": 0, "updated": 0, "duplicate": 0, "invalid": 0}
+        done = skip
+        start = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=options["workers"],
+                                      thread_name_prefix="import-geocode")
+        try:
+            batch = []
+            for number, row in enumerate(rows, 1):
+                if number <= skip:
+                    continue
+                batch.append((number, row))
+                if len(batch) == options["batch_size"]:
+                    done = self.import_batch(batch, executor)
+                    self.write_checkpoint(checkpoint, path, done)
+                    self.report(done - skip, start)
+                    batch = []
+            if batch:
+                done = self.import_batch(batch, executor)
+                self.report(done - skip, start)
+        finally:
+            executor.shutdown()
+
+        # the whole file is in, a later run starts from the beginning again
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        elapsed = time.monotonic() - start
+        self.stdout.write("Created: {created}\nUpdated: {updated}\nDuplicates: {duplicate}\n"
+                          "Invalid: {invalid}".format(**self.counts))
+        self.stdout.write("Imported {} rows in {:.1f}s".format(done - skip, elapsed))
+
+    # normalize, geocode and store one batch of numbered rows, returning the
+    # number of the last row
+    def import_batch(self, batch, executor):
+        records = {}
+        for number, row in batch:
+            try:
+                record = normalize_row(row)
+            except ValidationError as error:
+                self.counts["invalid"] += 1
+                self.stderr.write("Row {}: {}".format(number, "; ".join(error.messages)))
+                continue
+            key = record_key(record)
+            if key in records:
+                self.counts["duplicate"] += 1
+            else:
+                records[key] = record
+
+        existing = existing_parks(set(records))
+        if self.on_duplicate == "skip":
+            self.counts["duplicate"] += len(existing)
+            for key in existing:
+                del records[key]
+
+        # geocode before writing so no transaction is held open on the API
+        if self.geocoder is not None:
+            unlocated = [record for record in records.values() if record["location"] is None]
+            list(executor.map(partial(geocode_record, self.geocoder), unlocated))
+
+        new = [key for key in records if key not in existing]
+        # only a located row has anything to replace on a stored park
+        updated = [key for key in records if key in existing and records[key]["location"]]
+        self.counts["created"] += len(new)
+        self.counts["updated"] += len(updated)
+        if self.on_duplicate == "update":
+            self.counts["duplicate"] += len(existing) - len(updated)
+
+        with transaction.atomic():
+            # parks added since the lookup above are skipped by the constraint
+            Parks.objects.bulk_create(
+                [Parks(player=self.owner, geocode_status=records[key]["status"],
+                       suggested_address=records[key]["suggested_address"],
+                       **dict(zip(PARK_KEY, key))) for key in new],
+                ignore_conflicts=True)
+
+            stale = set()
+            if updated:
+                parks = Parks.objects.in_bulk([existing[key] for key in updated])
+                for key in updated:
+                    parks[existing[key]].geocode_status = records[key]["status"]
+                    parks[existing[key]].suggested_address = records[key]["suggested_address"]
+                Parks.objects.bulk_update(parks.values(), ["geocode_status", "suggested_address"])
+                # the replaced courts' tiles are dropped once the batch
+                # commits, so no reader caches their old markers meanwhile
+                replaced = Courts.objects.filter(park_id__in=parks, name=F("park__name"))
+                for latitude, longitude in replaced.values_list("latitude", "longitude"):
+                    stale.update(tile_keys(latitude, longitude))
+                replaced.delete()
+
+            # bulk inserts skip Parks.save() and Courts.save(), so index the
+            # new parks and set the courts' geohash here
+            ids = existing_parks(set(new + updated))
+            ParkSearchGram.index_parks([Parks(id=ids[key], **dict(zip(PARK_KEY, key)))
+                                        for key in new if key in ids])
+            courts = [Courts(park_id=park_id, name=key[0],
+                             latitude=records[key]["location"][0],
+                             longitude=records[key]["location"][1],
+                             geohash=encode_geohash(*records[key]["location"]))
+                      for key, park_id in ids.items() if records[key]["location"]]
+            Courts.objects.bulk_create(courts)
+
+            for court in courts:
+                stale.update(tile_keys(court.latitude, court.longitude))
+            transaction.on_commit(lambda: cache.delete_many(stale))
+
+        return batch[-1][0]
+
+    def report(self, rows, start):
+        elapsed = time.monotonic() - start
+        self.stdout.write("{} rows, {:.0f} rows/s".format(rows, rows / elapsed if elapsed else 0))
+
+    # number of rows a previous run of the same file finished
+    def read_checkpoint(self, checkpoint, path):
+        if not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as file:
+            progress = json.load(file)
+        if progress.get("path") != os.path.abspath(path):
+            raise CommandError("{} records progress for another file".format(checkpoint))
+        return progress["rows"]
+
+    # record progress once a batch is committed, replacing the file atomically
+    # so an interruption never leaves it half written
+    def write_checkpoint(self, checkpoint, path, rows):
+        temporary = checkpoint + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump({"path": os.path.abspath(path), "rows": rows}, file)
+        os.replace(temporary, checkpoint)
@@ -0,0 +1,319 @@
+import datetime
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from pickup.geohash import encode_geohash
+from pickup.models import Player, PlayerSearchKey, Messages, Conversation, Courts, Parks, \
+    ParkSearchGram, Schedule, ParkAvailability, MatchSeries, EventSignup, PlayerInterval, \
+    FavoriteParks
+from pickup.slots import bitmap_of, bitmap_to_bytes
+from pickup.tiles import tile_keys
+
+FIRST_NAMES = ["James", "Jordan", "Maria", "Michael", "Jamie", "Taylor", "Chris", "Alex",
+               "Sam", "Morgan", "Casey", "Riley", "Avery", "Jessica", "Daniel", "Sarah"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+              "Rodriguez", "Martinez", "Lee", "Walker", "Hall", "Allen", "Young", "King"]
+CITIES = ["Baltimore", "Towson", "Columbia", "Catonsville", "Dundalk", "Essex",
+          "Glen Burnie", "Ellicott City", "Pikesville", "Parkville"]
+PARK_WORDS = ["Riverside", "Lakeview", "Oak", "Maple", "Patterson", "Druid", "Cedar",
+              "Highland", "Meadow", "Harbor", "Hillside", "Union", "Liberty", "Station"]
+
+# area the parks are spread over, around Baltimore
+CENTER = (39.29, -76.61)
+SPREAD = 0.5
+
+# slots matches start at, from 8 AM to 9 PM on the hour
+MATCH_TIMES = range(32, 88, 4)
+
+# share of parks whose address check found a different address; they belong
+# to the first player, so benchmark can open accept_park_address as them
+MISMATCH_EVERY = 50
+
+
+# command for filling a database with synthetic players, parks, matches and
+# messages to benchmark against. Rows are written with bulk inserts, which
+# skip the models' save(), so the rows save() keeps in sync (the player and
+# park search indexes, court geohashes, park availability, signup counts,
+# players' intervals and the conversation index) are written here as well.
+class Command(BaseCommand):
+    help = "Fill the database with synthetic data for the benchmark command"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--players", type=int, default=1000)
+        parser.add_argument("--parks", type=int, default=200)
+        parser.add_argument("--matches", type=int, default=None,
+                            help="Number of upcoming matches, by default a fifth of the signups")
+        parser.add_argument("--signups", type=int, default=5000)
+        parser.add_argument("--messages", type=int, default=10000)
+        parser.add_argument("--favorites", type=int, default=2,
+                            help="Number of favorite parks of each player")
+        parser.add_argument("--days", type=int, default=28,
+                            help="Number of days ahead the matches are spread over")
+        parser.add_argument("--prefix", default="bench",
+                            help="Start of the seeded usernames and park names")
+        parser.add_argument("--password", default="benchmark",
+                            help="Password of every seeded player")
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Number of rows written per insert")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the random data")
+
+    def handle(self, *args, **options):
+        if min(options["players"], options["parks"], options["days"]) < 1:
+            raise CommandError("--players, --parks and --days must be at least 1")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        self.prefix = options["prefix"]
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError("Players starting with {} already exist, use another "
+                               "--prefix or a fresh database".format(self.prefix))
+
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.today = datetime.date.today()
+        matches = options["matches"]
+        if matches is None:
+            matches = max(1, options["signups"] // 5)
+
+        start = time.monotonic()
+        self.seed_players(options["players"], options["password"])
+        self.seed_parks(options["parks"])
+        self.seed_favorites(options["favorites"])
+        self.seed_matches(matches, options["days"])
+        self.seed_signups(options["signups"])
+        self.seed_messages(options["messages"])
+        self.stdout.write("Seeded in {:.1f}s".format(time.monotonic() - start))
+
+    def batches(self, items):
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def report(self, name, count, start):
+        self.stdout.write("{}: {} in {:.1f}s".format(name, count, time.monotonic() - start))
+
+    # players are stored across the User and Player tables, which bulk_create
+    # can not do for an inherited model, so the Player rows are inserted
+    # directly once the users have their ids. Every player gets the same
+    # password hash, hashing once for all of them.
+    def seed_players(self, count, password):
+        start = time.monotonic()
+        password = make_password(password)
+        fields = Player._meta.local_concrete_fields
+        insert = "INSERT INTO {} ({}) VALUES ({})".format(
+            connection.ops.quote_name(Player._meta.db_table),
+            ", ".join(connection.ops.quote_name(field.column) for field in fields),
+            ", ".join(["%s"] * len(fields)))
+
+        self.player_ids = []
+        for numbers in self.batches(range(count)):
+            players = []
+            for number in numbers:
+                players.append(Player(
+                    username="{}{}".format(self.prefix, number), password=password,
+                    email="{}{}@example.com".format(self.prefix, number),
+                    first_name=self.random.choice(FIRST_NAMES),
+                    last_name=self.random.choice(LAST_NAMES),
+                    date_of_birth=self.today - datetime.timedelta(days=self.random.randint(
+                        16 * 365, 60 * 365)),
+                    gender=self.random.choice([Player.MALE, Player.FEMALE, Player.OTHER]),
+                    height=self.random.randint(60, 80), weight=self.random.randint(110, 260),
+                    is_public=self.random.random() < 0.7))
+            with transaction.atomic():
+                User.objects.bulk_create([User(username=player.username, password=player.password,
+                                               email=player.email, first_name=player.first_name,
+                                               last_name=player.last_name)
+                                          for player in players])
+                ids = dict(User.objects.filter(username__in=[player.username for player in players])
+                           .values_list("username", "id"))
+                for player in players:
+                    player.id = player.user_ptr_id = ids[player.username]
+                with connection.cursor() as cursor:
+                    cursor.executemany(insert, [
+                        [field.get_db_prep_save(getattr(player, field.attname), connection)
+                         for field in fields]
+                        for player in players])
+                PlayerSearchKey.index_players(players)
+            self.player_ids.extend(player.id for player in players)
+        self.report("Players", count, start)
+
+    # parks with one court each, spread around CENTER in a few cities and
+    # zipcodes so the searches find several of them
+    def seed_parks(self, count):
+        start = time.monotonic()
+        owners = self.player_ids
+        self.park_ids = []
+        stale = set()
+        for numbers in self.batches(range(count)):
+            parks, locations = [], {}
+            for number in numbers:
+                mismatch = number % MISMATCH_EVERY == 0
+                park = Parks(player_id=owners[0] if mismatch else self.random.choice(owners),
+                             name="{} {} Park {}".format(self.random.choice(PARK_WORDS),
+                                                         self.prefix.title(), number),
+                             street="{} {} St".format(self.random.randint(1, 9999),
+                                                      self.random.choice(PARK_WORDS)),
+                             city=self.random.choice(CITIES), state="MD",
+                             zipcode="21{:03d}".format(self.random.randint(200, 299)),
+                             geocode_status=Parks.MISMATCH if mismatch else Parks.VERIFIED)
+                if mismatch:
+                    park.suggested_address = "{}, {}, MD {}, USA".format(
+                        park.street, park.city, park.zipcode)
+                parks.append(park)
+                locations[park.name] = (CENTER[0] + self.random.uniform(-SPREAD, SPREAD),
+                                        CENTER[1] + self.random.uniform(-SPREAD, SPREAD))
+            with transaction.atomic():
+                Parks.objects.bulk_create(parks)
+                ids = dict(Parks.objects.filter(name__in=locations).values_list("name", "id"))
+                for park in parks:
+                    park.id = ids[park.name]
+                ParkSearchGram.index_parks(parks)
+                Courts.objects.bulk_create([
+                    Courts(park_id=park.id, name=park.name, latitude=locations[park.name][0],
+                           longitude=locations[park.name][1],
+                           geohash=encode_geohash(*locations[park.name]))
+                    for park in parks])
+            for latitude, longitude in locations.values():
+                stale.update(tile_keys(latitude, longitude))
+            self.park_ids.extend(park.id for park in parks)
+        cache.delete_many(stale)
+        self.report("Parks", count, start)
+
+    def seed_favorites(self, count):
+        start = time.monotonic()
+        count = min(count, len(self.park_ids))
+        rows = [FavoriteParks(player_id=player_id, park_id=park_id)
+                for player_id in self.player_ids
+                for park_id in self.random.sample(self.park_ids, count)]
+        for batch in self.batches(rows):
+            FavoriteParks.objects.bulk_create(batch)
+        self.report("Favorite parks", len(rows), start)
+
+    # upcoming matches at free slots of random parks and days, with the parks'
+    # availability bitmaps, and a weekly series at some of the parks
+    def seed_matches(self, count, days):
+        start = time.monotonic()
+        count = min(count, len(self.park_ids) * days * len(MATCH_TIMES))
+        taken = set()
+        while len(taken) < count:
+            taken.add((self.random.choice(self.park_ids),
+                       self.today + datetime.timedelta(days=self.random.randrange(days)),
+                       self.random.choice(MATCH_TIMES)))
+        slots = sorted(taken)
+
+        self.matches = []
+        for batch in self.batches(slots):
+            matches = [Schedule(name="Pickup {}".format(len(self.matches) + number),
+                                creator_id=self.random.choice(self.player_ids), park_id=park_id,
+                                date=date, time=slot,
+                                duration=self.random.choice([4, 4, 6, 8]))
+                       for number, (park_id, date, slot) in enumerate(batch)]
+            Schedule.objects.bulk_create(matches)
+            self.matches.extend(matches)
+
+        booked = {}
+        for park_id, date, slot in slots:
+            booked.setdefault((park_id, date), []).append(slot)
+        rows = [ParkAvailability(park_id=park_id, date=date, booked=bitmap_to_bytes(bitmap_of(times)))
+                for (park_id, date), times in booked.items()]
+        for batch in self.batches(rows):
+            ParkAvailability.objects.bulk_create(batch)
+
+        # series go in slots of their own, after the last match of the day
+        series = [MatchSeries(name="Weekly {}".format(number), creator_id=self.player_ids[0],
+                              park_id=park_id, time=MATCH_TIMES[-1] + 4, start=self.today,
+                              until=self.today + datetime.timedelta(days=days - 1),
+                              weekdays=1 << (number % 7))
+                  for number, park_id in enumerate(self.park_ids[::MISMATCH_EVERY])]
+        MatchSeries.objects.bulk_create(series)
+        self.report("Matches", len(slots), start)
+
+    # signups spread over the matches, each player joining at most one match
+    # a day so no two of their matches overlap; players past a match's
+    # capacity are waitlisted. The counts, statuses and intervals are set the
+    # way EventSignup.join leaves them.
+    def seed_signups(self, count):
+        start = time.monotonic()
+        # bulk_create does not return ids on every database, read them back
+        ids = dict(((park_id, date, slot), match_id) for match_id, park_id, date, slot in
+                   Schedule.objects.filter(park_id__gte=self.park_ids[0], date__gte=self.today)
+                   .values_list("id", "park_id", "date", "time"))
+        for match in self.matches:
+            match.id = ids[(match.park_id, match.date, match.time)]
+
+        busy = set()
+        per_match, extra = divmod(count, len(self.matches)) if self.matches else (0, 0)
+        signups, counts = [], {}
+        for number, match in enumerate(self.matches):
+            wanted = per_match + (number < extra)
+            players = []
+            for attempt in range(wanted * 3):
+                if len(players) == wanted:
+                    break
+                player_id = self.random.choice(self.player_ids)
+                if (player_id, match.date) not in busy:
+                    busy.add((player_id, match.date))
+                    players.append(player_id)
+            for position, player_id in enumerate(players):
+                signups.append(EventSignup(player_id=player_id, event_id=match.id,
+                                           status=EventSignup.JOINED if position < match.capacity
+                                           else EventSignup.WAITLISTED))
+            counts[match.id] = min(len(players), match.capacity)
+
+        matches = {match.id: match for match in self.matches}
+        for batch in self.batches(signups):
+            pairs = {(signup.player_id, signup.event_id) for signup in batch}
+            with transaction.atomic():
+                EventSignup.objects.bulk_create(batch)
+                rows = EventSignup.objects.filter(event_id__in={event_id for player_id, event_id in pairs}) \
+                    .values_list("id", "player_id", "event_id")
+                PlayerInterval.objects.bulk_create([
+                    PlayerInterval(signup_id=signup_id, player_id=player_id, event_id=event_id,
+                                   date=matches[event_id].date, start=matches[event_id].time,
+                                   end=matches[event_id].end_slot)
+                    for signup_id, player_id, event_id in rows if (player_id, event_id) in pairs])
+
+        for match in self.matches:
+            match.signup_count = counts.get(match.id, 0)
+        for batch in self.batches(self.matches):
+            Schedule.objects.bulk_update(batch, ["signup_count"])
+        self.report("Signups", len(signups), start)
+
+    # messages between each player and a few regular partners over the past
+    # days, with the conversation index rows Messages.save would write
+    def seed_messages(self, count):
+        start = time.monotonic()
+        now = datetime.datetime.now()
+        players = self.player_ids
+        latest = {}
+        for numbers in self.batches(range(count)):
+            messages = []
+            for number in numbers:
+                position = self.random.randrange(len(players))
+                partner = players[(position + self.random.randint(1, 5)) % len(players)]
+                sender, receiver = players[position], partner
+                if self.random.random() < 0.5:
+                    sender, receiver = receiver, sender
+                if sender == receiver:
+                    continue
+                message = Messages(sender_id=sender, receiver_id=receiver,
+                                   message="Game at {}? ({})".format(
+                                       self.random.choice(PARK_WORDS), number),
+                                   time_sent=now - datetime.timedelta(
+                                       seconds=self.random.randrange(90 * 24 * 60 * 60)))
+                messages.append(message)
+                for pair in ((sender, receiver), (receiver, sender)):
+                    if pair not in latest or latest[pair].time_sent <= message.time_sent:
+                        latest[pair] = message
+            Messages.objects.bulk_create(messages)
+
+        rows = [Conversation(player_id=player_id, partner_id=partner_id, last_sent=message.time_sent,
+                             last_message=message.message[:Conversation.PREVIEW_LENGTH])
+                for (player_id, partner_id), message in latest.items()]
+        for batch in self.batches(rows):
+            Conversation.objects.bulk_create(batch)
+        self.report("Messages", count, start)
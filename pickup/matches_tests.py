@@ -0,0 +1,79 @@
+from django.test import TestCase
+from django.urls import reverse
+from pickup.models import Player, Parks, Schedule, FavoriteParks, Courts
+from unittest.mock import patch
+import datetime
+
+
+# tests for the feed of upcoming matches across parks
+class UpcomingMatchesTests(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create_user("root", "root@root.com", "root")
+        self.client.post(reverse("login"), {"username": "root", "password": "root"})
+        self.today = datetime.date.today()
+        self.home = self.add_park("Home Court", 39.2858, -76.6131, '21202')
+        self.away = self.add_park("Away Court", 40.7829, -73.9654, '10024')
+        FavoriteParks(player=self.player, park=self.home).save()
+
+    def add_park(self, name, latitude, longitude, zipcode):
+        park = Parks(player=self.player, name=name, street='Street', city='City',
+                     state='MD', zipcode=zipcode)
+        park.save()
+        Courts(name=name, latitude=latitude, longitude=longitude, park=park).save()
+        return park
+
+    def add_match(self, name, park, days, time):
+        match = Schedule(name=name, creator=self.player, park=park, time=time,
+                         date=self.today + datetime.timedelta(days=days))
+        match.save()
+        return match
+
+    def feed(self, **params):
+        response = self.client.get(reverse("upcoming_matches"), params)
+        self.assertEqual(response.status_code, 200)
+        return [match.name for match in response.context.get("matches", [])]
+
+    # test that only upcoming matches are listed, in date and time order
+    def test_upcoming_in_order(self):
+        self.add_match("Past", self.home, -1, 40)
+        self.add_match("Later", self.away, 2, 10)
+        self.add_match("Evening", self.home, 1, 70)
+        self.add_match("Morning", self.away, 1, 36)
+        self.assertEqual(self.feed(), ["Morning", "Evening", "Later"])
+
+    # test filtering by date range, time of day and parks
+    def test_filters(self):
+        self.add_match("Tomorrow Morning", self.home, 1, 36)
+        self.add_match("Tomorrow Evening", self.away, 1, 70)
+        self.add_match("Next Week", self.home, 7, 36)
+
+        end = (self.today + datetime.timedelta(days=3)).isoformat()
+        self.assertEqual(self.feed(end=end), ["Tomorrow Morning", "Tomorrow Evening"])
+        self.assertEqual(self.feed(earliest=60), ["Tomorrow Evening"])
+        self.assertEqual(self.feed(latest=40), ["Tomorrow Morning", "Next Week"])
+        self.assertEqual(self.feed(scope="favorites"), ["Tomorrow Morning", "Next Week"])
+        with patch("pickup.views.NEARBY_PARKS", 1):
+            self.assertEqual(self.feed(scope="nearby", zipcode="10024"), ["Tomorrow Evening"])
+
+        response = self.client.get(reverse("upcoming_matches"), {"scope": "nearby"})
+        self.assertContains(response, "Enter a zipcode")
+
+    # test paging through the feed without skipping or repeating matches
+    @patch("pickup.views.MATCHES_PAGE_SIZE", 2)
+    def test_pages(self):
+        # matches at the same date and time are ordered by id
+        for i in range(5):
+            park = self.add_park("Court %d" % i, 39.3, -76.6, '21202')
+            self.add_match("Match %d" % i, park, 1, 40)
+
+        response = self.client.get(reverse("upcoming_matches"), {"scope": "all"})
+        names = [match.name for match in response.context["matches"]]
+        while "next_query" in response.context:
+            response = self.client.get(reverse("upcoming_matches") + "?" +
+                                       response.context["next_query"])
+            names += [match.name for match in response.context["matches"]]
+        self.assertEqual(names, ["Match %d" % i for i in range(5)])
+
+        response = self.client.get(reverse("upcoming_matches"), {"after": "x"})
+        self.assertEqual(response.status_code, 400)
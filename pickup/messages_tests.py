@@ -1,7 +1,11 @@
 from django.test import TestCase
 from pickup.models import Player
-from pickup.models import Messages
+from pickup.models import Messages, Conversation
 from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import datetime
+from unittest.mock import patch
 
 
 class MessageModelTests(TestCase):
@@ -17,6 +21,74 @@ class MessageModelTests(TestCase):
         self.assertEqual(Messages.objects.get(sender=player1), Messages.objects.get(receiver=player2))
 
 
+# tests for the denormalized conversation index kept by Messages.save
+class ConversationIndexTests(TestCase):
+
+    # test that a message creates a conversation row for both participants
+    def test_message_creates_conversations(self):
+        player1 = Player.objects.create_user("prof", "prof@umbc.edu", "cats")
+        player2 = Player.objects.create_user("student", "student@umbc.edu", "project")
+        Messages.objects.create(sender=player1, receiver=player2, message="Office hours moved")
+
+        sent = Conversation.objects.get(player=player1)
+        received = Conversation.objects.get(player=player2)
+        self.assertEqual(sent.partner_id, player2.id)
+        self.assertEqual(received.partner_id, player1.id)
+        self.assertEqual(sent.last_message, "Office hours moved")
+        self.assertEqual(received.last_message, "Office hours moved")
+
+    # test that replies update the existing rows instead of adding new ones
+    def test_reply_updates_conversation(self):
+        player1 = Player.objects.create_user("prof", "prof@umbc.edu", "cats")
+        player2 = Player.objects.create_user("student", "student@umbc.edu", "project")
+        Messages.objects.create(sender=player1, receiver=player2, message="First")
+        Messages.objects.create(sender=player2, receiver=player1, message="Second")
+
+        self.assertEqual(Conversation.objects.count(), 2)
+        self.assertEqual(Conversation.objects.get(player=player1).last_message, "Second")
+
+    # test that an older message does not overwrite a newer preview
+    def test_older_message_keeps_latest(self):
+        player1 = Player.objects.create_user("prof", "prof@umbc.edu", "cats")
+        player2 = Player.objects.create_user("student", "student@umbc.edu", "project")
+        Messages.objects.create(sender=player1, receiver=player2, message="Latest")
+        Messages.objects.create(sender=player1, receiver=player2, message="Old",
+                                time_sent=datetime.datetime(2021, 1, 1))
+
+        self.assertEqual(Conversation.objects.get(player=player2).last_message, "Latest")
+
+    # test that a reply moves the rows forward with conditional updates only,
+    # never writing back a row read earlier
+    def test_reply_updates_conditionally(self):
+        player1 = Player.objects.create_user("prof", "prof@umbc.edu", "cats")
+        player2 = Player.objects.create_user("student", "student@umbc.edu", "project")
+        Messages.objects.create(sender=player1, receiver=player2, message="First")
+
+        with CaptureQueriesContext(connection) as queries:
+            Conversation.record_message(Messages(sender=player2, receiver=player1, message="Second",
+                                                 time_sent=datetime.datetime(2100, 1, 1)))
+        self.assertEqual(len(queries), 2)
+        for query in queries.captured_queries:
+            self.assertTrue(query["sql"].startswith("UPDATE"))
+            self.assertIn('"last_sent" <=', query["sql"])
+        self.assertEqual(set(Conversation.objects.values_list("last_message", flat=True)), {"Second"})
+
+    # test that the inbox is ordered by most recent message
+    def test_inbox_ordered_by_recency(self):
+        player = Player.objects.create_user("test", "test@test.test", "test")
+        older = Player.objects.create_user("Earlier", "older@test.test", "older")
+        newer = Player.objects.create_user("Later", "newer@test.test", "newer")
+        Messages.objects.create(sender=player, receiver=older, message="hi",
+                                time_sent=datetime.datetime(2021, 1, 1))
+        Messages.objects.create(sender=newer, receiver=player, message="hey",
+                                time_sent=datetime.datetime(2021, 1, 2))
+
+        self.client.post(reverse("login"), {"username": "test", "password": "test"})
+        response = self.client.get(reverse("messages"))
+        content = response.content.decode()
+        self.assertLess(content.index("Later"), content.index("Earlier"))
+
+
 class MessageViewTest(TestCase):
 
     # Test that the messages page can be reached when signed in
@@ -102,3 +174,66 @@ class NewConversationsView(TestCase):
         self.assertRedirects(response, reverse("login") + "?next=" +
                              reverse("new_message"))
 
+    # Tests that the inbox is loaded with a constant number of queries
+    def test_inbox_query_count(self):
+        player = Player.objects.create_user("test", "test@test.test", "test")
+        for i in range(5):
+            partner = Player.objects.create_user("partner%d" % i, "p@test.test", "test")
+            Messages.objects.create(sender=player, receiver=partner, message="Hello")
+
+        self.client.post(reverse("login"), {"username": "test", "password": "test"})
+
+        # session, the user as a player, and the conversation list
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("messages"))
+        self.assertContains(response, "partner4")
+
+
+# tests for paging through the history of a conversation
+class MessageHistoryTests(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create_user("test", "test@test.test", "test")
+        self.player2 = Player.objects.create_user("test2", "test2@test.test", "test2")
+        self.client.post(reverse("login"), {"username": "test", "password": "test"})
+
+        # every message shares a timestamp so paging must fall back to the id,
+        # and the players take turns so both directions are merged
+        sent = datetime.datetime(2021, 11, 1, 12, 0)
+        for i in range(7):
+            sender, receiver = (self.player, self.player2) if i % 2 else (self.player2, self.player)
+            Messages.objects.create(sender=sender, receiver=receiver,
+                                    message="Message %d" % i, time_sent=sent)
+
+    # test that pages walk backwards through history without gaps or repeats
+    def test_history_pages(self):
+        url = reverse("messages_history", kwargs={'username': 'test2'})
+        seen = []
+        with patch("pickup.views.MESSAGE_PAGE_SIZE", 3):
+            page = self.client.get(url).json()
+            while True:
+                self.assertLessEqual(len(page["messages"]), 3)
+                seen = [m["message"] for m in page["messages"]] + seen
+                if page["older"] is None:
+                    break
+                page = self.client.get(url, {"before": page["older"]}).json()
+
+        self.assertEqual(seen, ["Message %d" % i for i in range(7)])
+
+    # test that the conversation page shows the latest messages first
+    def test_conversation_shows_latest(self):
+        response = self.client.get(reverse("messages_conversation", kwargs={'username': 'test2'}))
+        self.assertContains(response, "Message 6")
+        self.assertNotContains(response, "Load older messages")
+
+        with patch("pickup.views.MESSAGE_PAGE_SIZE", 3):
+            response = self.client.get(reverse("messages_conversation", kwargs={'username': 'test2'}))
+        self.assertContains(response, "Message 6")
+        self.assertNotContains(response, "Message 3")
+        self.assertContains(response, "Load older messages")
+
+    # test that a malformed cursor is rejected
+    def test_bad_cursor(self):
+        response = self.client.get(reverse("messages_history", kwargs={'username': 'test2'}),
+                                   {"before": "yesterday"})
+        self.assertEqual(response.status_code, 400)
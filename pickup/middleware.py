@@ -0,0 +1,102 @@
+# File: middleware.py
+#
+# Middleware of the pickup app.
+import contextlib
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from .models import Player
+
+logger = logging.getLogger(__name__)
+
+# longest part of the slowest statement written to the log
+SLOWEST_SQL_CHARS = 500
+
+
+# the Player of the logged in user; None if nobody is logged in or the user
+# is not a player, so request.player is false then. PlayerBackend already
+# loads request.user as a Player, so only users logged in through another
+# backend are read again, by primary key.
+def get_player(request):
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    if isinstance(user, Player):
+        return user
+    return Player.objects.filter(pk=user.pk).first()
+
+
+# gives each request a lazy request.player, resolved the first time a view
+# uses it and at most once per request; must come after
+# AuthenticationMiddleware
+class PlayerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.player = SimpleLazyObject(lambda: get_player(request))
+        return self.get_response(request)
+
+
+# the queries run while serving one request
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = ""
+
+    # connection.execute_wrapper hook timing each statement
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if elapsed >= self.slowest:
+                self.slowest, self.slowest_sql = elapsed, sql
+
+    # the Server-Timing header value, in milliseconds
+    def server_timing(self):
+        return 'db;dur={:.2f};desc="{} queries", db-slowest;dur={:.2f}'.format(
+            self.duration * 1000, self.count, self.slowest * 1000)
+
+
+# counts and times the queries of each request on every database, keeps them
+# as request.query_stats, and reports them in a Server-Timing header and a
+# log record with the numbers as extra fields. Queries run while a streamed
+# response is sent come after the header and are not counted. Goes first so
+# the session and user queries are included; PICKUP_QUERY_TIMING = False
+# turns it off.
+class QueryStatsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "PICKUP_QUERY_TIMING", True):
+            return self.get_response(request)
+
+        request.query_stats = stats = QueryStats()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+
+        response["Server-Timing"] = stats.server_timing()
+        match = request.resolver_match
+        logger.info("%s %s: %d queries in %.2f ms", request.method, request.path,
+                    stats.count, stats.duration * 1000, extra={
+                        "url_name": match.url_name if match else None,
+                        "status": response.status_code,
+                        "queries": stats.count,
+                        "db_ms": round(stats.duration * 1000, 2),
+                        "slowest_ms": round(stats.slowest * 1000, 2),
+                        "slowest_sql": stats.slowest_sql[:SLOWEST_SQL_CHARS],
+                    })
+        return response
@@ -0,0 +1,67 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from pickup.models import Player, Messages
+
+
+# tests for the request.player set up by PlayerMiddleware and loaded by
+# PlayerBackend
+class PlayerMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.player = Player.objects.create_user("root", "root@root.com", "root")
+        self.other = Player.objects.create_user("other", "other@root.com", "other")
+        Messages.objects.create(sender=self.player, receiver=self.other, message="Hi")
+        self.client.post(reverse("login"), {"username": "root", "password": "root"})
+
+    # test that the logged in player is read once, with the user
+    def test_one_lookup(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("messages"))
+        request = response.wsgi_request
+        self.assertEqual(request.player, self.player)
+        self.assertContains(response, "other")
+
+        self.client.logout()
+        response = self.client.get(reverse("index"))
+        self.assertFalse(response.wsgi_request.player)
+
+    # test that users who are not players still log in, without a player
+    def test_plain_user(self):
+        User.objects.create_user("admin", "admin@root.com", "admin")
+        self.client.post(reverse("login"), {"username": "admin", "password": "admin"})
+        response = self.client.get(reverse("search_players"))
+        self.assertEqual(response.wsgi_request.user.username, "admin")
+        self.assertFalse(response.wsgi_request.player)
+
+    # test that sessions logged in through ModelBackend, from before
+    # PlayerBackend, still have their player
+    def test_model_backend_session(self):
+        self.client.logout()
+        self.client.force_login(self.player, "django.contrib.auth.backends.ModelBackend")
+        response = self.client.get(reverse("messages"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.player, self.player)
+
+    # test caching the player between requests, dropped when it is saved
+    @override_settings(PICKUP_PLAYER_CACHE_TIMEOUT=30)
+    def test_cached_player(self):
+        url = reverse("messages_conversation", kwargs={"username": "other"})
+        self.client.get(url)
+        # the session, the partner, the messages each way and the
+        # conversations
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertContains(response, "Hi")
+
+        self.player.first_name = "Changed"
+        self.player.save()
+        response = self.client.get(reverse("edit_profile"))
+        self.assertContains(response, "Changed")
+
+        # a new password keeps the player logged in
+        self.client.post(reverse("change_password"), {
+            "old_password": "root", "new_password": "other", "confirm_password": "other"})
+        self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# build the conversation index from the messages that already exist
+def backfill_conversations(apps, schema_editor):
+    Messages = apps.get_model('pickup', 'Messages')
+    Conversation = apps.get_model('pickup', 'Conversation')
+
+    latest = {}
+    rows = Messages.objects.order_by('time_sent', 'id').values_list(
+        'sender_id', 'receiver_id', 'time_sent', 'message')
+    for sender_id, receiver_id, time_sent, message in rows.iterator():
+        latest[(sender_id, receiver_id)] = (time_sent, message[:100])
+        latest[(receiver_id, sender_id)] = (time_sent, message[:100])
+
+    Conversation.objects.bulk_create(
+        [Conversation(player_id=player_id, partner_id=partner_id,
+                      last_sent=time_sent, last_message=preview)
+         for (player_id, partner_id), (time_sent, preview) in latest.items()],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0013_merge_20211127_1533'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_sent', models.DateTimeField()),
+                ('last_message', models.CharField(blank=True, max_length=100)),
+                ('partner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pickup.player')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to='pickup.player')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['player', '-last_sent'], name='pickup_conv_player_recent'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('player', 'partner'), name='pickup_conversation_unique'),
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
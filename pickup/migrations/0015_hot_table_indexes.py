@@ -0,0 +1,25 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0014_conversation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventsignup',
+            index=models.Index(fields=['event', 'player'], name='pickup_signup_event_player'),
+        ),
+        migrations.AddIndex(
+            model_name='messages',
+            index=models.Index(fields=['sender', 'receiver', 'time_sent'], name='pickup_msg_pair_time'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['park', 'date', 'time'], name='pickup_sched_park_date'),
+        ),
+    ]
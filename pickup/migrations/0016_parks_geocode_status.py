@@ -0,0 +1,23 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0015_hot_table_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parks',
+            name='geocode_status',
+            field=models.IntegerField(choices=[(0, 'Pending'), (1, 'Verified'), (2, 'Mismatch'), (3, 'Failed')], default=0),
+        ),
+        migrations.AddField(
+            model_name='parks',
+            name='suggested_address',
+            field=models.CharField(blank=True, max_length=400),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:21
+
+from django.db import migrations, models
+
+from pickup.geohash import encode_geohash
+
+
+# index the courts that already have coordinates
+def backfill_geohash(apps, schema_editor):
+    Courts = apps.get_model('pickup', 'Courts')
+    courts = list(Courts.objects.all())
+    for court in courts:
+        court.geohash = encode_geohash(court.latitude, court.longitude)
+    Courts.objects.bulk_update(courts, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0016_parks_geocode_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courts',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='parks',
+            index=models.Index(fields=['zipcode'], name='pickup_parks_zipcode'),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
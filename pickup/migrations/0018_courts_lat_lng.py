@@ -0,0 +1,17 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0017_courts_geohash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='courts',
+            index=models.Index(fields=['latitude', 'longitude'], name='pickup_courts_lat_lng'),
+        ),
+    ]
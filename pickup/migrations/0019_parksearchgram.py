@@ -0,0 +1,43 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from pickup.trigrams import text_grams
+
+
+# index the parks that already exist
+def backfill_search_index(apps, schema_editor):
+    Parks = apps.get_model('pickup', 'Parks')
+    ParkSearchGram = apps.get_model('pickup', 'ParkSearchGram')
+    rows = []
+    for park in Parks.objects.all():
+        for field, text, short in [(0, park.name, True), (1, park.city, False),
+                                   (2, park.zipcode, False)]:
+            rows.extend(ParkSearchGram(park_id=park.id, field=field, gram=gram)
+                        for gram in text_grams(text, short))
+    ParkSearchGram.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0018_courts_lat_lng'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParkSearchGram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.IntegerField(choices=[(0, 'Name'), (1, 'City'), (2, 'Zipcode')])),
+                ('gram', models.CharField(max_length=3)),
+                ('park', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pickup.parks')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='parksearchgram',
+            index=models.Index(fields=['gram', 'park'], name='pickup_parkgram_gram'),
+        ),
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
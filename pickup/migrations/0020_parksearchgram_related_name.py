@@ -0,0 +1,19 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0019_parksearchgram'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='parksearchgram',
+            name='park',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_grams', to='pickup.parks'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from pickup.slots import bitmap_of, bitmap_to_bytes
+
+
+# build the bitmaps of the days that already have matches
+def backfill_availability(apps, schema_editor):
+    Schedule = apps.get_model('pickup', 'Schedule')
+    ParkAvailability = apps.get_model('pickup', 'ParkAvailability')
+    days = {}
+    for park_id, date, time in Schedule.objects.exclude(date=None) \
+            .values_list('park_id', 'date', 'time'):
+        days.setdefault((park_id, date), []).append(time)
+    ParkAvailability.objects.bulk_create(
+        [ParkAvailability(park_id=park_id, date=date, booked=bitmap_to_bytes(bitmap_of(slots)))
+         for (park_id, date), slots in days.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0020_parksearchgram_related_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParkAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('booked', models.BinaryField(max_length=12)),
+                ('park', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pickup.parks')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='parkavailability',
+            constraint=models.UniqueConstraint(fields=('park', 'date'), name='pickup_parkavailability_unique'),
+        ),
+        migrations.RunPython(backfill_availability, migrations.RunPython.noop),
+    ]
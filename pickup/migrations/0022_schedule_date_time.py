@@ -0,0 +1,17 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0021_parkavailability'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['date', 'time'], name='pickup_sched_date_time'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:40
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# count the players already signed up for each match
+def backfill_signup_count(apps, schema_editor):
+    Schedule = apps.get_model('pickup', 'Schedule')
+    matches = list(Schedule.objects.annotate(signups=Count('eventsignup')))
+    for match in matches:
+        match.signup_count = match.signups
+    Schedule.objects.bulk_update(matches, ['signup_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0022_schedule_date_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventsignup',
+            name='status',
+            field=models.IntegerField(choices=[(0, 'Joined'), (1, 'Waitlisted')], default=0),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='capacity',
+            field=models.PositiveIntegerField(default=10, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='signup_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='eventsignup',
+            index=models.Index(fields=['event', 'status'], name='pickup_signup_event_status'),
+        ),
+        migrations.RunPython(backfill_signup_count, migrations.RunPython.noop),
+    ]
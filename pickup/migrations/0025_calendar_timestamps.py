@@ -0,0 +1,26 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:58
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0024_matchseries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventsignup',
+            name='joined',
+            field=models.DateTimeField(auto_now_add=True, default=datetime.datetime.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, default=datetime.datetime.now),
+            preserve_default=False,
+        ),
+    ]
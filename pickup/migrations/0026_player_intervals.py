@@ -0,0 +1,59 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from pickup.slots import SLOTS_PER_DAY
+
+
+# add the interval of every existing signup, with the default duration;
+# matches without a date have none
+def backfill_intervals(apps, schema_editor):
+    EventSignup = apps.get_model('pickup', 'EventSignup')
+    PlayerInterval = apps.get_model('pickup', 'PlayerInterval')
+    PlayerInterval.objects.bulk_create(
+        (PlayerInterval(signup_id=signup.id, player_id=signup.player_id, event_id=signup.event_id,
+                        date=signup.event.date, start=signup.event.time,
+                        end=min(signup.event.time + signup.event.duration, SLOTS_PER_DAY))
+         for signup in EventSignup.objects.exclude(event__date=None).select_related('event')
+         .iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('pickup', '0025_calendar_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchseries',
+            name='duration',
+            field=models.PositiveSmallIntegerField(choices=[(2, '30 minutes'), (4, '1 hour'), (6, '1 hour 30 minutes'), (8, '2 hours'), (12, '3 hours')], default=4),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='duration',
+            field=models.PositiveSmallIntegerField(choices=[(2, '30 minutes'), (4, '1 hour'), (6, '1 hour 30 minutes'), (8, '2 hours'), (12, '3 hours')], default=4),
+        ),
+        migrations.CreateModel(
+            name='PlayerInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start', models.PositiveSmallIntegerField()),
+                ('end', models.PositiveSmallIntegerField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pickup.schedule')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('signup', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='interval', to='pickup.eventsignup')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='playerinterval',
+            index=models.Index(fields=['player', 'date', 'start'], name='pickup_interval_player_day'),
+        ),
+        migrations.RunPython(backfill_intervals, migrations.RunPython.noop),
+    ]
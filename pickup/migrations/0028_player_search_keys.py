@@ -0,0 +1,41 @@
+# Generated by Django 3.2.8 on 2026-10-17 23:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from pickup.prefixes import player_keys
+
+
+# index the usernames and names of existing players
+def backfill_search_keys(apps, schema_editor):
+    Player = apps.get_model('pickup', 'Player')
+    PlayerSearchKey = apps.get_model('pickup', 'PlayerSearchKey')
+    rows = []
+    for player in Player.objects.all():
+        rows.extend(PlayerSearchKey(player_id=player.pk, key=key, is_public=player.is_public)
+                    for key in player_keys(player.username, player.first_name, player.last_name))
+    PlayerSearchKey.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0027_match_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerSearchKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=150)),
+                ('is_public', models.BooleanField()),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_keys', to='pickup.player')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='playersearchkey',
+            index=models.Index(fields=['key', 'is_public'], name='pickup_playerkey_key'),
+        ),
+        migrations.RunPython(backfill_search_keys, migrations.RunPython.noop),
+    ]
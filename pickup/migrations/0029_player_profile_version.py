@@ -0,0 +1,18 @@
+# Generated by Django 3.2.8 on 2026-10-18 00:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0028_player_search_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='profile_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
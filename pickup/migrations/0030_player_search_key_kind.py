@@ -0,0 +1,38 @@
+# Generated by Django 3.2.8 on 2026-10-18 01:09
+
+from django.db import migrations, models
+
+from pickup.prefixes import normalize_key
+
+
+# mark the key made from each existing player's username
+def backfill_kinds(apps, schema_editor):
+    Player = apps.get_model('pickup', 'Player')
+    PlayerSearchKey = apps.get_model('pickup', 'PlayerSearchKey')
+    for player_id, username in Player.objects.values_list('pk', 'username').iterator():
+        PlayerSearchKey.objects.filter(player_id=player_id, key=normalize_key(username)) \
+            .update(kind=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0029_player_profile_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='playersearchkey',
+            name='pickup_playerkey_key',
+        ),
+        migrations.AddField(
+            model_name='playersearchkey',
+            name='kind',
+            field=models.IntegerField(choices=[(0, 'Username'), (1, 'Name')], default=1),
+        ),
+        migrations.AddIndex(
+            model_name='playersearchkey',
+            index=models.Index(fields=['key', 'is_public', 'kind'], name='pickup_playerkey_key'),
+        ),
+        migrations.RunPython(backfill_kinds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.8 on 2026-10-18 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pickup', '0030_player_search_key_kind'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='messages',
+            name='pickup_msg_pair_time',
+        ),
+        migrations.AddIndex(
+            model_name='messages',
+            index=models.Index(fields=['sender', 'receiver', 'time_sent', 'id'], name='pickup_msg_pair_time'),
+        ),
+    ]
@@ -1,11 +1,23 @@
 import datetime
 from dateutil.relativedelta import relativedelta
 
-from django.db import models
+from django.core.validators import MinValueValidator
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from localflavor.us.models import USStateField, USZipCodeField
 from localflavor.us.us_states import STATE_CHOICES
 from django.contrib.auth.models import User
 
+from .broker import publish_message
+from .geohash import encode_geohash, GEOHASH_PRECISION
+from .tiles import invalidate_tiles
+from .prefixes import normalize_key, player_keys
+from .profiles import forget_player
+from .trigrams import text_grams
+from .slots import SLOT_LABELS, SLOTS_PER_DAY, bitmap_of, bitmap_to_bytes, bitmap_from_bytes
+
 
 # model for a player, containing their user/login data as well as information
 # in their profile
@@ -23,6 +35,12 @@ class Player(User):
     weight = models.IntegerField(null=True, blank=True) # in pounds
     is_public = models.BooleanField(default=False)
 
+    # version of the cached profile details, see profiles.py
+    profile_version = models.PositiveIntegerField(default=0, editable=False)
+
+    # fields stored in the autocomplete index
+    SEARCH_FIELDS = {"username", "first_name", "last_name", "is_public"}
+
     # return the user's age based on their birthday, None if no birthday was
     # provided
     def get_age(self):
@@ -30,13 +48,125 @@ class Player(User):
             return None
         return relativedelta(datetime.date.today(), self.date_of_birth).years
 
+    # keep the autocomplete index in sync, unless only other fields were
+    # saved, and make the cached profile and logged in player out of date.
+    # The profile version is bumped in the database, so concurrent saves each
+    # get their own; the cached player is dropped again once the save
+    # commits, in case the old row was cached meanwhile
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        existing = not self._state.adding
+        with transaction.atomic():
+            if existing:
+                self.profile_version = F("profile_version") + 1
+                if update_fields is not None:
+                    kwargs["update_fields"] = list(update_fields) + ["profile_version"]
+            super().save(*args, **kwargs)
+            if existing:
+                self.refresh_from_db(fields=["profile_version"])
+            if update_fields is None or self.SEARCH_FIELDS & set(update_fields):
+                PlayerSearchKey.index_players([self])
+            forget_player(self.id)
+            transaction.on_commit(lambda: forget_player(self.id))
+
+
+# autocomplete index over player usernames and names: one normalized key (see
+# prefixes.py) for each way of finding each player, with whether the player
+# is public and whether the key is their username, so the filters are applied
+# while reading the index. Private players are only found by username, which
+# keeps their names hidden. Kept in sync by Player.save(), so bulk inserts
+# must call index_players; deleting a player cascades here.
+class PlayerSearchKey(models.Model):
+    class Meta:
+        # Completions read the keys starting with a prefix in order
+        indexes = [
+            models.Index(fields=['key', 'is_public', 'kind'], name="pickup_playerkey_key")]
+
+    player = models.ForeignKey(Player, related_name="search_keys", on_delete=models.CASCADE)
+    key = models.CharField(max_length=150)
+    is_public = models.BooleanField()
+
+    # set constants for what a key was made from
+    USERNAME = 0
+    NAME = 1
+    kinds = [(USERNAME, "Username"), (NAME, "Name")]
+    kind = models.IntegerField(default=NAME, choices=kinds)
+
+    objects = models.Manager()
+
+    # replace the index rows of the given players
+    @classmethod
+    def index_players(cls, players):
+        rows = [cls(player_id=player.id, key=key, is_public=player.is_public,
+                    kind=cls.USERNAME if key == normalize_key(player.username) else cls.NAME)
+                for player in players
+                for key in player_keys(player.username, player.first_name, player.last_name)]
+        cls.objects.filter(player_id__in=[player.id for player in players]).delete()
+        cls.objects.bulk_create(rows)
+
 
 class Messages(models.Model):
+    class Meta:
+        # Conversation history is read one direction at a time and paged by
+        # (time_sent, id)
+        indexes = [
+            models.Index(fields=['sender', 'receiver', 'time_sent', 'id'], name="pickup_msg_pair_time")]
+
     sender = models.ForeignKey(Player, related_name="sender", on_delete=models.RESTRICT)
     receiver = models.ForeignKey(Player, related_name="receiver", on_delete=models.RESTRICT)
     message = models.CharField(max_length=1000)
     time_sent = models.DateTimeField(default=datetime.datetime.now, blank=True)
 
+    # keep the conversation index up to date whenever a new message is sent
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                Conversation.record_message(self)
+                transaction.on_commit(lambda: publish_message(self))
+
+
+# denormalized inbox: one row per participant of each conversation, holding the
+# time and a preview of the last message so the inbox is a single query
+class Conversation(models.Model):
+    class Meta:
+        # Each player has a single conversation with each partner
+        constraints = [
+            models.UniqueConstraint(fields=['player', 'partner'], name="%(app_label)s_%(class)s_unique")]
+        indexes = [
+            models.Index(fields=['player', '-last_sent'], name="pickup_conv_player_recent")]
+
+    PREVIEW_LENGTH = 100
+
+    player = models.ForeignKey(Player, related_name="conversations", on_delete=models.CASCADE)
+    partner = models.ForeignKey(Player, related_name="+", on_delete=models.CASCADE)
+    last_sent = models.DateTimeField()
+    last_message = models.CharField(max_length=PREVIEW_LENGTH, blank=True)
+
+    objects = models.Manager()
+
+    # update both participants' rows for a newly sent message. A row is only
+    # moved forward by a conditional UPDATE, so concurrent messages can never
+    # leave an older preview in place. A row missing at first is created; if
+    # it exists by then, the UPDATE is run again.
+    @classmethod
+    def record_message(cls, message):
+        preview = message.message[:cls.PREVIEW_LENGTH]
+        pairs = {(message.sender_id, message.receiver_id),
+                 (message.receiver_id, message.sender_id)}
+        for player_id, partner_id in pairs:
+            older = cls.objects.filter(player_id=player_id, partner_id=partner_id,
+                                       last_sent__lte=message.time_sent)
+            if older.update(last_sent=message.time_sent, last_message=preview):
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(player_id=player_id, partner_id=partner_id,
+                                       last_sent=message.time_sent, last_message=preview)
+            except IntegrityError:
+                older.update(last_sent=message.time_sent, last_message=preview)
+
 
 class Profile(models.Model):
     name = models.CharField(max_length=200)
@@ -54,16 +184,45 @@ class Profile(models.Model):
 
 # Create your models here.
 class Courts(models.Model):
+    class Meta:
+        # Map tiles look up the courts inside a bounding box
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name="pickup_courts_lat_lng")]
+
     name = models.CharField(max_length=200)
     # Will be obtained with the google maps api
     latitude = models.FloatField()
     longitude = models.FloatField()
     park = models.ForeignKey('pickup.Parks', on_delete=models.CASCADE)
+    # geohash of the coordinates, indexed so nearby courts can be found with
+    # range scans; kept in sync by save(), so bulk inserts must set it
+    geohash = models.CharField(max_length=GEOHASH_PRECISION, db_index=True, blank=True)
 
     # Overload the query print
     def __str__(self):
         return self.name
 
+    # drop the cached tiles of the new location and, for a court that moved,
+    # of the old one
+    def save(self, *args, **kwargs):
+        self.geohash = encode_geohash(self.latitude, self.longitude)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = set(kwargs["update_fields"]) | {"geohash"}
+        previous = None
+        if not self._state.adding and self.pk is not None:
+            previous = Courts.objects.filter(pk=self.pk).values_list("latitude", "longitude").first()
+        super().save(*args, **kwargs)
+        invalidate_tiles(self.latitude, self.longitude)
+        if previous is not None and previous != (self.latitude, self.longitude):
+            invalidate_tiles(*previous)
+
+
+# drop the cached tiles of deleted courts, including courts deleted through a
+# queryset or along with their park
+@receiver(post_delete, sender=Courts)
+def forget_court_tiles(sender, instance, **kwargs):
+    invalidate_tiles(instance.latitude, instance.longitude)
+
 # Create your models here.
 class Parks(models.Model):
     class Meta:
@@ -72,6 +231,9 @@ class Parks(models.Model):
             models.UniqueConstraint(fields=['name', 'street', 'city', 'state', 'zipcode'], name="%(app_label)s_%("
                                                                                                 "class)s_unique")
         ]
+        # Parks near a zipcode are found through the parks in it
+        indexes = [
+            models.Index(fields=['zipcode'], name="pickup_parks_zipcode")]
 
     player = models.ForeignKey(User, default="", on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
@@ -81,49 +243,387 @@ class Parks(models.Model):
     state = USStateField(choices=STATE_CHOICES)
     zipcode = USZipCodeField()
 
+    # set constants for the address check done in the background after a park
+    # is added
+    PENDING = 0
+    VERIFIED = 1
+    MISMATCH = 2
+    FAILED = 3
+    geocode_statuses = [(PENDING, "Pending"), (VERIFIED, "Verified"),
+                        (MISMATCH, "Mismatch"), (FAILED, "Failed")]
+    geocode_status = models.IntegerField(default=PENDING, choices=geocode_statuses)
+    # address found by google maps when it differs from the one entered
+    suggested_address = models.CharField(max_length=400, blank=True)
+
     objects = models.Manager()
 
+    # fields covered by the search index
+    SEARCH_FIELDS = {"name", "city", "zipcode"}
+
     # Overload the query print
     def __str__(self):
         return self.name
 
+    # keep the search index in sync, unless only other fields were saved
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or self.SEARCH_FIELDS & set(update_fields):
+                ParkSearchGram.index_parks([self])
+
+
+# search index over park names, cities and zipcodes: one row for each gram
+# (see trigrams.py) of each field of each park. Kept in sync by Parks.save(),
+# so bulk inserts must call index_parks; deleting a park cascades here.
+class ParkSearchGram(models.Model):
+    class Meta:
+        # Searches look up the parks holding each gram
+        indexes = [
+            models.Index(fields=['gram', 'park'], name="pickup_parkgram_gram")]
+
+    # set constants for the indexed fields
+    NAME = 0
+    CITY = 1
+    ZIPCODE = 2
+    fields = [(NAME, "Name"), (CITY, "City"), (ZIPCODE, "Zipcode")]
+
+    park = models.ForeignKey(Parks, related_name="search_grams", on_delete=models.CASCADE)
+    field = models.IntegerField(choices=fields)
+    gram = models.CharField(max_length=3)
+
+    objects = models.Manager()
+
+    # replace the index rows of the given parks
+    @classmethod
+    def index_parks(cls, parks):
+        rows = []
+        for park in parks:
+            for field, text, short in [(cls.NAME, park.name, True),
+                                       (cls.CITY, park.city, False),
+                                       (cls.ZIPCODE, park.zipcode, False)]:
+                rows.extend(cls(park_id=park.id, field=field, gram=gram)
+                            for gram in text_grams(text, short))
+        cls.objects.filter(park_id__in=[park.id for park in parks]).delete()
+        cls.objects.bulk_create(rows)
+
+
 class Schedule(models.Model):
     class Meta:
         # Prevent the same park from being entered twice
         constraints = [
             models.UniqueConstraint(fields=['park', 'time', 'date'], name="%(app_label)s_%(class)s_unique")]
+        # A park's matches are listed in date order, and the upcoming matches
+        # feed pages through all parks' matches in (date, time) order
+        indexes = [
+            models.Index(fields=['park', 'date', 'time'], name="pickup_sched_park_date"),
+            models.Index(fields=['date', 'time'], name="pickup_sched_date_time")]
 
-    times = []
-    for i in range(0, 24 * 4):
-        time = datetime.datetime(1900, 1, 1, 0, 0) + datetime.timedelta(minutes=15 * i)
-        datetext = time.strftime("%I:%M %p")
-        times.append((i, datetext))
+    times = list(enumerate(SLOT_LABELS))
 
     name = models.CharField(max_length=400, default="")
     creator = models.ForeignKey(User, default="", on_delete=models.CASCADE)
     park = models.ForeignKey(Parks, default="", on_delete=models.CASCADE)
     date = models.DateField(null=True, blank=True)
     time = models.IntegerField(choices=times)
+    # players that can join before others are put on the waitlist, and the
+    # number that have joined; the count is kept by EventSignup.join and leave
+    DEFAULT_CAPACITY = 10
+    capacity = models.PositiveIntegerField(default=DEFAULT_CAPACITY, validators=[MinValueValidator(1)])
+    signup_count = models.PositiveIntegerField(default=0)
+    # length of the match in time slots
+    durations = [(2, "30 minutes"), (4, "1 hour"), (6, "1 hour 30 minutes"), (8, "2 hours"),
+                 (12, "3 hours")]
+    DEFAULT_DURATION = 4
+    MAX_DURATION = 12
+    duration = models.PositiveSmallIntegerField(default=DEFAULT_DURATION, choices=durations)
+    # the recurring series this match is an occurrence of, if any
+    series = models.ForeignKey('pickup.MatchSeries', null=True, blank=True, related_name="matches",
+                               on_delete=models.SET_NULL)
+    # when the match was last saved, for calendar feeds to tell if it changed
+    updated = models.DateTimeField(auto_now=True)
 
     objects = models.Manager()
 
     def get_time_str(self):
-        time = datetime.datetime(1900, 1, 1, 0, 0) + \
-               datetime.timedelta(minutes=15 * self.time)
-        return time.strftime("%I:%M %p")
+        return SLOT_LABELS[self.time]
+
+    @property
+    def spots_left(self):
+        return max(0, self.capacity - self.signup_count)
+
+    # the slot the match ends at; matches end by midnight
+    @property
+    def end_slot(self):
+        return min(self.time + self.duration, SLOTS_PER_DAY)
+
+    # keep the park's availability in sync, including the day a moved match
+    # was taken off, and the players' intervals for the match. Saving an
+    # existing match never writes signup_count, which may have changed since
+    # it was read, and fills any spots a larger capacity opened up. A match
+    # without a date has no intervals.
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding and self.pk is not None:
+                previous = Schedule.objects.filter(pk=self.pk).values_list("park_id", "date").first()
+                if previous is not None and kwargs.get("update_fields") is None:
+                    kwargs["update_fields"] = [field.name for field in self._meta.concrete_fields
+                                               if not field.primary_key and field.name != "signup_count"]
+            super().save(*args, **kwargs)
+            ParkAvailability.refresh(self.park_id, self.date)
+            if previous is not None:
+                if previous != (self.park_id, self.date):
+                    ParkAvailability.refresh(*previous)
+                if self.date is None:
+                    PlayerInterval.objects.filter(event_id=self.id).delete()
+                else:
+                    PlayerInterval.objects.filter(event_id=self.id) \
+                        .update(date=self.date, start=self.time, end=self.end_slot)
+                    if previous[1] is None:
+                        PlayerInterval.objects.bulk_create(
+                            PlayerInterval(signup_id=signup_id, player_id=player_id, event_id=self.id,
+                                           date=self.date, start=self.time, end=self.end_slot)
+                            for signup_id, player_id in EventSignup.objects.filter(event_id=self.id)
+                            .values_list("id", "player_id"))
+                EventSignup.promote_waitlist(self)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            ParkAvailability.refresh(self.park_id, self.date)
+        return result
+
+
+# the time slots of a day that already have a match at a park, as a bitmap
+# (see slots.py), so free times can be found without reading the matches.
+# Kept in sync by Schedule.save() and delete(), so bulk changes to matches
+# must call refresh for the days they touch.
+class ParkAvailability(models.Model):
+    class Meta:
+        # Each park has a single bitmap for each day
+        constraints = [
+            models.UniqueConstraint(fields=['park', 'date'], name="%(app_label)s_%(class)s_unique")]
+
+    park = models.ForeignKey(Parks, related_name="+", on_delete=models.CASCADE)
+    date = models.DateField()
+    booked = models.BinaryField(max_length=12)
+
+    objects = models.Manager()
+
+    @property
+    def bitmap(self):
+        return bitmap_from_bytes(self.booked)
+
+    # rebuild the bitmap of a park's day from its matches
+    @classmethod
+    def refresh(cls, park_id, date):
+        if date is None:
+            return
+        slots = Schedule.objects.filter(park_id=park_id, date=date).values_list("time", flat=True)
+        cls.objects.update_or_create(park_id=park_id, date=date,
+                                     defaults={"booked": bitmap_to_bytes(bitmap_of(slots))})
+
+    # bitmaps of booked slots for several parks over a range of days, as
+    # {park id: {date: bitmap}}, with 0 for days without matches
+    @classmethod
+    def booked_slots(cls, park_ids, start, days):
+        dates = [start + datetime.timedelta(days=i) for i in range(days)]
+        booked = {park_id: dict.fromkeys(dates, 0) for park_id in park_ids}
+        rows = cls.objects.filter(park_id__in=park_ids, date__gte=dates[0], date__lte=dates[-1]) \
+            .values_list("park_id", "date", "booked")
+        for park_id, date, data in rows:
+            booked[park_id][date] = bitmap_from_bytes(data)
+        return booked
+
+# a match repeated every week on some weekdays between two dates. Its
+# occurrences are not stored: they are generated for the dates a page shows
+# (see series.py) and only become Schedule rows once a player joins one.
+class MatchSeries(models.Model):
+    class Meta:
+        # Series still running in a date range are looked up by their end
+        indexes = [
+            models.Index(fields=['until', 'park'], name="pickup_series_until")]
+
+    # set constants for the weekdays, numbered like date.weekday()
+    weekday_names = [(0, "Monday"), (1, "Tuesday"), (2, "Wednesday"), (3, "Thursday"),
+                     (4, "Friday"), (5, "Saturday"), (6, "Sunday")]
+
+    name = models.CharField(max_length=400)
+    creator = models.ForeignKey(User, on_delete=models.CASCADE)
+    park = models.ForeignKey(Parks, related_name="series", on_delete=models.CASCADE)
+    time = models.IntegerField(choices=Schedule.times)
+    capacity = models.PositiveIntegerField(default=Schedule.DEFAULT_CAPACITY,
+                                           validators=[MinValueValidator(1)])
+    duration = models.PositiveSmallIntegerField(default=Schedule.DEFAULT_DURATION,
+                                                choices=Schedule.durations)
+    start = models.DateField()
+    until = models.DateField()
+    # bit i is set when the series occurs on weekday i
+    weekdays = models.PositiveSmallIntegerField()
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return self.name
+
+    def occurs_on(self, date):
+        return self.start <= date <= self.until and bool(self.weekdays & (1 << date.weekday()))
+
+    # the dates the series occurs on between two dates, inclusive
+    def dates(self, start, end):
+        day, end = max(start, self.start), min(end, self.until)
+        while day <= end:
+            if self.weekdays & (1 << day.weekday()):
+                yield day
+            day += datetime.timedelta(days=1)
+
+    # an unsaved match standing for the occurrence on a date
+    def occurrence(self, date):
+        return Schedule(name=self.name, creator_id=self.creator_id, park=self.park, time=self.time,
+                        date=date, capacity=self.capacity, duration=self.duration, series=self)
+
+    # the match of the occurrence on a date, saved the first time it is asked
+    # for; None if the series does not occur then or another match already
+    # has the park at that time
+    def materialize(self, date):
+        if not self.occurs_on(date):
+            return None
+        match = Schedule.objects.filter(series=self, date=date).first()
+        if match is not None:
+            return match
+        try:
+            with transaction.atomic():
+                match = self.occurrence(date)
+                match.save()
+                return match
+        except IntegrityError:
+            # the slot is taken, possibly by another player materializing the
+            # same occurrence at the same time
+            return Schedule.objects.filter(series=self, date=date).first()
+
+
+# raised by EventSignup.join when the player already joined a match at the
+# same time; other is the PlayerInterval of that match
+class OverlapError(Exception):
+    def __init__(self, other):
+        super().__init__(other)
+        self.other = other
+
 
 class EventSignup(models.Model):
     class Meta:
         # Prevent the same event from being joined twice
         constraints = [
             models.UniqueConstraint(fields=['player', 'event'], name="%(app_label)s_%(class)s_unique")]
+        # The roster of a match is looked up by event, the unique constraint
+        # already covers lookups by player
+        indexes = [
+            models.Index(fields=['event', 'player'], name="pickup_signup_event_player"),
+            models.Index(fields=['event', 'status'], name="pickup_signup_event_status")]
 
 
     player = models.ForeignKey(User, default="", on_delete=models.CASCADE)
     event = models.ForeignKey(Schedule, default="", on_delete=models.CASCADE)
 
+    # set constants for whether a player has a spot in the match or is
+    # waiting for one, in order of signing up
+    JOINED = 0
+    WAITLISTED = 1
+    statuses = [(JOINED, "Joined"), (WAITLISTED, "Waitlisted")]
+    status = models.IntegerField(default=JOINED, choices=statuses)
+    joined = models.DateTimeField(auto_now_add=True)
+
+    objects = models.Manager()
+
+    # sign a player up for a match, taking a spot if one is left and joining
+    # the waitlist otherwise; returns the signup, raises IntegrityError if the
+    # player already signed up. The spot is claimed with a single conditional
+    # UPDATE, so concurrent joins can never overfill a match. With
+    # check_overlap, raises OverlapError if the player joined another match at
+    # the same time; the player's row is locked first, so two joins of the
+    # same player can not both pass the check. A match without a date has no
+    # interval.
+    @classmethod
+    def join(cls, player, event, check_overlap=False):
+        with transaction.atomic():
+            if check_overlap:
+                list(User.objects.select_for_update().filter(pk=player.pk).values_list("pk"))
+                other = PlayerInterval.overlapping(player, event).first()
+                if other is not None:
+                    raise OverlapError(other)
+            claimed = Schedule.objects.filter(id=event.id, signup_count__lt=F("capacity")) \
+                .update(signup_count=F("signup_count") + 1)
+            signup = cls.objects.create(player=player, event_id=event.id,
+                                        status=cls.JOINED if claimed else cls.WAITLISTED)
+            if event.date is not None:
+                PlayerInterval.objects.create(signup=signup, player=player, event_id=event.id,
+                                              date=event.date, start=event.time, end=event.end_slot)
+            return signup
+
+    # take a player off a match, giving their spot to the first player on the
+    # waitlist; returns False if the player had not signed up. The player's
+    # interval for the match goes with the signup. The signup is locked while
+    # it is read, so whether a spot is freed is decided from its status after
+    # any promotion running at the same time.
+    @classmethod
+    def leave(cls, player, event):
+        with transaction.atomic():
+            signup = cls.objects.select_for_update().filter(player=player, event_id=event.id).first()
+            if signup is None:
+                return False
+            signup.delete()
+            if signup.status == cls.JOINED:
+                Schedule.objects.filter(id=event.id, signup_count__gt=0) \
+                    .update(signup_count=F("signup_count") - 1)
+                cls.promote_waitlist(event)
+            return True
+
+    # move players from the waitlist into any spots that are free. A player
+    # is only promoted while still waitlisted; if they left or were promoted
+    # meanwhile, the spot claimed for them is given back.
+    @classmethod
+    def promote_waitlist(cls, event):
+        for signup in cls.objects.filter(event_id=event.id, status=cls.WAITLISTED).order_by("id"):
+            claimed = Schedule.objects.filter(id=event.id, signup_count__lt=F("capacity")) \
+                .update(signup_count=F("signup_count") + 1)
+            if not claimed:
+                return
+            if not cls.objects.filter(id=signup.id, status=cls.WAITLISTED).update(status=cls.JOINED):
+                Schedule.objects.filter(id=event.id, signup_count__gt=0) \
+                    .update(signup_count=F("signup_count") - 1)
+
+
+# the time each signup takes out of a player's day, as (date, start slot,
+# end slot) rows sorted by player in the index, so the matches a new one
+# overlaps are found with one index seek instead of reading all of a
+# player's signups. Kept by EventSignup.join and Schedule.save, and deleted
+# with the signup.
+class PlayerInterval(models.Model):
+    class Meta:
+        indexes = [
+            models.Index(fields=['player', 'date', 'start'], name="pickup_interval_player_day")]
+
+    signup = models.OneToOneField(EventSignup, related_name="interval", on_delete=models.CASCADE)
+    player = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE)
+    event = models.ForeignKey(Schedule, related_name="+", on_delete=models.CASCADE)
+    date = models.DateField()
+    start = models.PositiveSmallIntegerField()
+    end = models.PositiveSmallIntegerField()
+
     objects = models.Manager()
 
+    # the intervals of a player's other matches that overlap a match, which
+    # may not be saved yet. No match is longer than MAX_DURATION, so only
+    # intervals starting in the slots just before it are read.
+    @classmethod
+    def overlapping(cls, player, match):
+        return cls.objects.filter(player=player, date=match.date,
+                                  start__gt=match.time - Schedule.MAX_DURATION,
+                                  start__lt=match.end_slot, end__gt=match.time) \
+            .exclude(event_id=match.id).select_related("event__park")
+
+
 class FavoriteParks(models.Model):
     class Meta:
         # Prevent the same park from being entered twice
@@ -134,4 +634,98 @@ class FavoriteParks(models.Model):
     player = models.ForeignKey(User, default="", on_delete=models.CASCADE)
     park = models.ForeignKey(Parks, default="", on_delete=models.CASCADE)
 
-    objects = models.Manager()
\ No newline at end of file
+    objects = models.Manager()
+
+# matches moved out of Schedule by the archive_matches command once they are
+# long past, so the live tables only hold upcoming and recent matches. The id
+# is the match's id in Schedule.
+class ArchivedMatch(models.Model):
+    class Meta:
+        # A park's history is looked up by date
+        indexes = [
+            models.Index(fields=['park', 'date'], name="pickup_archive_park_date")]
+
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=400)
+    creator = models.ForeignKey(User, null=True, related_name="+", on_delete=models.SET_NULL)
+    park = models.ForeignKey(Parks, null=True, related_name="archived_matches", on_delete=models.SET_NULL)
+    date = models.DateField(null=True)
+    time = models.IntegerField(choices=Schedule.times)
+    duration = models.PositiveSmallIntegerField(default=Schedule.DEFAULT_DURATION)
+    capacity = models.PositiveIntegerField()
+    signup_count = models.PositiveIntegerField()
+    archived = models.DateTimeField(auto_now_add=True)
+
+    objects = models.Manager()
+
+    # move a batch of matches and their signups into the archive in one
+    # transaction and add them to the parks' monthly stats; returns the
+    # number of matches and signups moved. The matches are removed with a
+    # bulk delete, so the caller prunes the availability of their days.
+    @classmethod
+    def archive(cls, match_ids):
+        with transaction.atomic():
+            matches = list(Schedule.objects.filter(id__in=match_ids))
+            signups = list(EventSignup.objects.filter(event_id__in=match_ids))
+            cls.objects.bulk_create([
+                cls(id=match.id, name=match.name, creator_id=match.creator_id, park_id=match.park_id,
+                    date=match.date, time=match.time, duration=match.duration,
+                    capacity=match.capacity, signup_count=match.signup_count)
+                for match in matches])
+            ArchivedSignup.objects.bulk_create([
+                ArchivedSignup(match_id=signup.event_id, player_id=signup.player_id,
+                               status=signup.status, joined=signup.joined)
+                for signup in signups])
+
+            # count the batch's matches and signups by park and month
+            keys = {match.id: (match.park_id, ParkMonthStats.month_of(match.date)) for match in matches}
+            totals = {key: [0, 0] for key in keys.values()}
+            for key in keys.values():
+                totals[key][0] += 1
+            for signup in signups:
+                totals[keys[signup.event_id]][1] += 1
+            for (park_id, month), (match_count, signup_count) in totals.items():
+                ParkMonthStats.add(park_id, month, match_count, signup_count)
+
+            PlayerInterval.objects.filter(event_id__in=match_ids).delete()
+            EventSignup.objects.filter(event_id__in=match_ids).delete()
+            Schedule.objects.filter(id__in=match_ids).delete()
+        return len(matches), len(signups)
+
+
+class ArchivedSignup(models.Model):
+    match = models.ForeignKey(ArchivedMatch, related_name="signups", on_delete=models.CASCADE)
+    player = models.ForeignKey(User, null=True, related_name="+", on_delete=models.SET_NULL)
+    status = models.IntegerField(choices=EventSignup.statuses)
+    joined = models.DateTimeField()
+
+    objects = models.Manager()
+
+
+# number of matches played and signups at each park by month, kept as
+# matches are archived
+class ParkMonthStats(models.Model):
+    class Meta:
+        # Each park has a single row for each month
+        constraints = [
+            models.UniqueConstraint(fields=['park', 'month'], name="%(app_label)s_%(class)s_unique")]
+
+    park = models.ForeignKey(Parks, related_name="month_stats", on_delete=models.CASCADE)
+    # first day of the month
+    month = models.DateField()
+    matches = models.PositiveIntegerField(default=0)
+    signups = models.PositiveIntegerField(default=0)
+
+    objects = models.Manager()
+
+    @staticmethod
+    def month_of(date):
+        return date.replace(day=1)
+
+    # add to a park's counts for a month
+    @classmethod
+    def add(cls, park_id, month, matches, signups):
+        updated = cls.objects.filter(park_id=park_id, month=month) \
+            .update(matches=F("matches") + matches, signups=F("signups") + signups)
+        if not updated:
+            cls.objects.create(park_id=park_id, month=month, matches=matches, signups=signups)
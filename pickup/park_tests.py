@@ -1,8 +1,10 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.db.utils import IntegrityError
 from django.contrib.auth.models import User
-from pickup.models import Parks, Player
+from pickup.models import Parks, Player, Courts
+from pickup.geocoding import StubGeocoder
+from unittest.mock import patch
 import os
 
 # tests for the Park model, independent of any view
@@ -108,12 +110,9 @@ class ParkViewTests(TestCase):
         self.assertNotContains(response, "Park has been added!")
 
     # checking a believable but fake address
+    @override_settings(PICKUP_GEOCODER="pickup.geocoding.StubGeocoder",
+                       PICKUP_GEOCODE_WORKERS=0)
     def test_add_park_not_real(self):
-        try:
-            os.environ['apiKey']
-        except KeyError:
-            return
-            
         player = Player.objects.create_user("root", "root@root.com",
                                             "root")
         player.save()
@@ -122,10 +121,17 @@ class ParkViewTests(TestCase):
 
         fields = {'name':'Good Park', 'street':'Parkstreet', 'city':'Parkville',
                              'state':'MD', 'zipcode':'12345'}
-        response = self.client.post(reverse('Add Park'), fields)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('Add Park'), fields)
 
+        # the park is added right away and flagged once it has been checked
         self.assertEqual(response.status_code, 200)
-        self.assertNotContains(response, "Park has been added!")
+        self.assertContains(response, "Park has been added!")
+
+        park = Parks.objects.get(name="Good Park")
+        self.assertEqual(park.geocode_status, Parks.FAILED)
+        response = self.client.get(reverse('event_signup', kwargs={'parkid': park.id}))
+        self.assertContains(response, "Google Maps could not find this park's address.")
 
 
     # checking a real address
@@ -152,27 +158,39 @@ class ParkViewTests(TestCase):
         self.assertEqual(park.name, 'Good Park')
 
     # checking a flawed real address
+    @override_settings(PICKUP_GEOCODER="pickup.geocoding.StubGeocoder",
+                       PICKUP_GEOCODE_WORKERS=0)
     def test_add_park_real_malformed_address(self):
-        try:
-            os.environ['apiKey']
-        except KeyError:
-            return
-    
-    
         player = Player.objects.create_user("root", "root@root.com",
                                             "root")
         player.save()
         fields = {"username": "root", "password": "root"}
         self.client.post(reverse("login"), fields)
 
+        hudson_yards = {"formatted_address": "20 Hudson Yards, New York, NY 10001, USA",
+                        "latitude": 40.7536, "longitude": -74.0010}
         fields = {'name':'Good Park', 'street':'20 Huson Yards', 'city':'New York',
                              'state':'NY', 'zipcode':'10001'}
-        response = self.client.post(reverse('Add Park'), fields)
+        with patch.dict(StubGeocoder.results, {"20 huson yards, new york, ny 10001": hudson_yards}):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('Add Park'), fields)
 
         self.assertEqual(response.status_code, 200)
-        self.assertNotContains(response, "Park has been added!")
+        self.assertContains(response, "Park has been added!")
+
+        # the suggested address is shown on the park's page
+        park = Parks.objects.get(name="Good Park")
+        self.assertEqual(park.geocode_status, Parks.MISMATCH)
+        self.assertEqual(Courts.objects.get(park=park).latitude, 40.7536)
+        response = self.client.get(reverse('event_signup', kwargs={'parkid': park.id}))
         self.assertContains(response, "20 Hudson Yards, New York, NY 10001")
 
+        # accepting the suggestion corrects the park's address
+        self.client.post(reverse('accept_park_address', kwargs={'parkid': park.id}))
+        park = Parks.objects.get(name="Good Park")
+        self.assertEqual(park.street, "20 Hudson Yards")
+        self.assertEqual(park.geocode_status, Parks.VERIFIED)
+
         
     # checking a real address
     def test_add_park_absent_apikey(self):
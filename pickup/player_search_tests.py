@@ -0,0 +1,102 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from pickup.models import Player, PlayerSearchKey
+from pickup.prefixes import normalize_key, prefix_range
+from pickup.search import complete_players, cached_completions
+
+
+# tests for completing player usernames and names from the prefix index
+class PlayerSearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.player = self.add_player("root", "Root", "User", True)
+        self.client.post(reverse("login"), {"username": "root", "password": "pass"})
+
+    def add_player(self, username, first_name, last_name, is_public=False):
+        player = Player.objects.create_user(username, username + "@test.com", "pass",
+                                            first_name=first_name, last_name=last_name)
+        if is_public:
+            player.is_public = True
+            player.save()
+        return player
+
+    def usernames(self, players):
+        return [player.username for player in players]
+
+    def test_normalize(self):
+        self.assertEqual(normalize_key("  José   ÁLVAREZ "), "jose alvarez")
+        self.assertEqual(normalize_key(None), "")
+        self.assertEqual(prefix_range("jor"), ("jor", "jos"))
+        self.assertEqual(prefix_range("a z"), ("a z", "a {"))
+        self.assertEqual(prefix_range(""), ("", None))
+
+    # test that the keys follow changes to players
+    def test_keys_kept(self):
+        keys = set(PlayerSearchKey.objects.filter(player=self.player).values_list("key", flat=True))
+        self.assertEqual(keys, {"root", "root user", "user"})
+
+        self.player.last_name = "Admin"
+        self.player.is_public = False
+        self.player.save()
+        keys = PlayerSearchKey.objects.filter(player=self.player)
+        self.assertEqual({key.key for key in keys}, {"root", "root admin", "admin"})
+        self.assertFalse(any(key.is_public for key in keys))
+
+    # test completing by username, full name and last name, in key order,
+    # with each player listed once
+    def test_complete(self):
+        self.add_player("mjordan", "Michael", "Jordan", True)
+        self.add_player("mjohnson", "Magic", "Johnson", True)
+        self.add_player("jordan23", "Private", "Player")
+        self.add_player("other", "Jordan", "Other", True)
+
+        with self.assertNumQueries(1):
+            players = complete_players("JOR")
+        self.assertEqual(self.usernames(players), ["mjordan", "other"])
+        self.assertEqual(self.usernames(complete_players("jor", public_only=False)),
+                         ["mjordan", "other", "jordan23"])
+        self.assertEqual(self.usernames(complete_players("michael j")), ["mjordan"])
+        self.assertEqual(self.usernames(complete_players("m", limit=1)), ["mjohnson"])
+        self.assertEqual(self.usernames(complete_players("r", exclude=self.player.id)), [])
+        self.assertEqual(complete_players("nobody"), [])
+        # wildcards of LIKE are matched literally
+        self.assertEqual(complete_players("%"), [])
+        self.assertEqual(complete_players("m_o"), [])
+
+    # test that private players are only found by username, so their names
+    # stay hidden
+    def test_private_names_hidden(self):
+        self.add_player("rbg", "Ruth", "Ginsburg")
+        self.assertEqual(self.usernames(complete_players("rb", public_only=False)), ["rbg"])
+        self.assertEqual(complete_players("ginsburg", public_only=False), [])
+        self.assertEqual(complete_players("ruth g", public_only=False), [])
+        self.assertEqual(complete_players("rb"), [])
+
+        response = self.client.get(reverse("search_players"), {"search_text": "ginsburg"})
+        self.assertNotContains(response, "rbg")
+        response = self.client.get(reverse("new_message"), {"search_text": "ruth g"})
+        self.assertNotContains(response, "rbg")
+        response = self.client.get(reverse("search_players"), {"search_text": "rbg"})
+        self.assertContains(response, "rbg")
+
+    # test that completions are cached for a short time
+    def test_cached(self):
+        self.add_player("mjordan", "Michael", "Jordan", True)
+        self.assertEqual(cached_completions("mjo"), [{"username": "mjordan", "name": "Michael Jordan"}])
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_completions("MJO"), [{"username": "mjordan", "name": "Michael Jordan"}])
+
+        response = self.client.get(reverse("complete_player"), {"q": "Michael"})
+        self.assertEqual(response.json(), {"players": [{"username": "mjordan", "name": "Michael Jordan"}]})
+
+    # test the search pages, which list private players too, by username
+    def test_search_pages(self):
+        self.add_player("mjordan", "Michael", "Jordan")
+        response = self.client.get(reverse("search_players"), {"search_text": "mjor"})
+        self.assertContains(response, "mjordan")
+        response = self.client.get(reverse("new_message"), {"search_text": "r"})
+        self.assertNotContains(response, reverse("messages_conversation", args=["root"]))
+        response = self.client.get(reverse("new_message"), {"search_text": "mjo"})
+        self.assertContains(response, reverse("messages_conversation", args=["mjordan"]))
@@ -0,0 +1,38 @@
+# File: prefixes.py
+#
+# Keys of the player autocomplete index. Usernames and names are stored
+# lowercased with accents and extra whitespace removed, so a prefix typed in
+# any case, normalized the same way, finds them with a range scan of the
+# index: every key starting with a prefix sorts from the prefix up to the
+# prefix with its last character incremented. Unlike a bound made of the
+# highest character, this does not depend on where the collation puts
+# unusual characters.
+import unicodedata
+
+# longest key stored, and longest prefix looked up
+MAX_KEY_LENGTH = 150
+
+
+# lowercase a piece of text, drop accents and collapse whitespace
+def normalize_key(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.casefold().split())[:MAX_KEY_LENGTH]
+
+
+# the keys a player can be found by: their username, full name and last name
+def player_keys(username, first_name, last_name):
+    keys = {normalize_key(username),
+            normalize_key("{} {}".format(first_name, last_name)),
+            normalize_key(last_name)}
+    keys.discard("")
+    return keys
+
+
+# the range of keys starting with a prefix, as (lowest, highest) with the
+# highest excluded, or None for an empty prefix, which every key starts with;
+# the prefix must already be normalized
+def prefix_range(prefix):
+    if not prefix:
+        return prefix, None
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
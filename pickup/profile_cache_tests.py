@@ -0,0 +1,82 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from pickup.models import Player
+from pickup.profiles import get_profile, age_on
+from unittest.mock import patch
+import datetime
+
+
+# tests for the cache of player profile details
+class ProfileCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.player = Player.objects.create_user("root", "root@root.com", "root",
+                                                 first_name="Root", last_name="User")
+        self.player.date_of_birth = datetime.date(2000, 6, 15)
+        self.player.height = 70
+        self.player.save()
+        self.client.post(reverse("login"), {"username": "root", "password": "root"})
+        self.url = reverse("view_player", kwargs={"username": "root"})
+
+    def load(self, username):
+        return Player.objects.get(username=username)
+
+    # test that a cached profile is shown reading only the player's version
+    def test_cached(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, "Root User")
+        self.assertContains(response, "70 in")
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Root User")
+        self.assertEqual(self.client.get(reverse("view_player", kwargs={"username": "nobody"}))
+                         .status_code, 404)
+
+    # test that editing the profile or password shows up right away
+    def test_invalidated(self):
+        self.client.get(self.url)
+        self.client.post(reverse("edit_profile"), {
+            "first_name": "New", "last_name": "Name", "date_of_birth": "2000-06-15",
+            "gender": "", "height": "71", "weight": "", "is_public": "True"})
+        response = self.client.get(self.url)
+        self.assertContains(response, "New Name")
+        self.assertContains(response, "71 in")
+
+        version = Player.objects.get(username="root").profile_version
+        self.client.post(reverse("change_password"), {
+            "old_password": "root", "new_password": "other", "confirm_password": "other"})
+        self.assertGreater(Player.objects.get(username="root").profile_version, version)
+
+    # test that the version is kept on the player's row, so a save is seen
+    # by processes that cached the details before it, without touching the
+    # cache
+    def test_version_shared(self):
+        self.assertContains(self.client.get(self.url), "Private")
+        player = Player.objects.get(username="root")
+        player.is_public = True
+        with patch("pickup.models.forget_player"):
+            player.save(update_fields=["is_public"])
+        self.assertContains(self.client.get(self.url), "Public")
+
+        # concurrent saves each get their own version
+        other = Player.objects.get(username="root")
+        player.save()
+        other.save()
+        self.assertEqual(other.profile_version, player.profile_version + 1)
+
+    # test that the age changes on the birthday without reading the player
+    def test_age_rolls_over(self):
+        with patch("pickup.profiles.datetime") as clock:
+            clock.date.today.return_value = datetime.date(2030, 6, 14)
+            self.assertEqual(get_profile("root", 1, self.load)["age"], 29)
+            clock.date.today.return_value = datetime.date(2030, 6, 15)
+            with self.assertNumQueries(0):
+                self.assertEqual(get_profile("root", 1, self.load)["age"], 30)
+
+        # a birthday on a leap day moves to February 28 in other years, the
+        # same as Player.get_age
+        self.assertEqual(age_on(datetime.date(2000, 2, 29), datetime.date(2001, 2, 27)),
+                         (0, datetime.date(2001, 2, 28)))
+        self.assertEqual(age_on(datetime.date(2000, 2, 29), datetime.date(2001, 2, 28))[0], 1)
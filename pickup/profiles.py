@@ -0,0 +1,76 @@
+# File: profiles.py
+#
+# Cache of the details shown on player profile pages. Each player's details
+# are stored under the version number kept on the player's row; saving a
+# player bumps it, so no process shows details older than the last save,
+# whatever cache backend is configured, and stale entries simply expire. The
+# age is cached with the date it next changes, so it rolls over on the
+# player's birthday without a read.
+import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.core.cache import cache
+
+# how long the details of a player are kept
+PROFILE_TIMEOUT = 60 * 60
+
+NOT_PROVIDED = "Not provided"
+
+
+# key of the logged in player cached by PlayerBackend
+def player_key(user_id):
+    return "pickup:player:{}".format(user_id)
+
+
+# drop the cached copy of a logged in player
+def forget_player(user_id):
+    cache.delete(player_key(user_id))
+
+
+def profile_key(username):
+    return "pickup:profile:" + username
+
+
+# an age on a day and the day it next changes
+def age_on(date_of_birth, today):
+    age = relativedelta(today, date_of_birth).years
+    return age, date_of_birth + relativedelta(years=age + 1)
+
+
+# the details shown on a player's profile, as display strings
+def player_details(player, today):
+    if player.first_name != "" and player.last_name != "":
+        full_name = player.first_name + " " + player.last_name
+    elif player.first_name != "" or player.last_name != "":
+        full_name = player.first_name + player.last_name
+    else:
+        full_name = NOT_PROVIDED
+
+    age, age_until = NOT_PROVIDED, None
+    if player.date_of_birth is not None:
+        age, age_until = age_on(player.date_of_birth, today)
+
+    return {"username": player.username,
+            "full_name": full_name,
+            "date_of_birth": player.date_of_birth,
+            "age": age,
+            "age_until": age_until,
+            "gender": player.genders[player.gender][1] if player.gender is not None else NOT_PROVIDED,
+            "height": str(player.height) + " in" if player.height is not None else NOT_PROVIDED,
+            "weight": str(player.weight) + " lbs" if player.weight is not None else NOT_PROVIDED,
+            "is_public": player.is_public}
+
+
+# the profile details of the player with a username at a version, read from
+# the player's row, loaded with the given function only when they are not
+# cached
+def get_profile(username, version, load):
+    today = datetime.date.today()
+    details = cache.get(profile_key(username), version=version)
+    if details is None:
+        details = player_details(load(username), today)
+        cache.set(profile_key(username), details, PROFILE_TIMEOUT, version=version)
+    elif details["age_until"] is not None and today >= details["age_until"]:
+        details["age"], details["age_until"] = age_on(details["date_of_birth"], today)
+        cache.set(profile_key(username), details, PROFILE_TIMEOUT, version=version)
+    return details
@@ -0,0 +1,189 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from pickup import urls
+from pickup.models import Player, Parks, Schedule, EventSignup, FavoriteParks, \
+    Messages, Courts, MatchSeries
+from pickup.middleware import QueryStats
+from pickup.views import calendar_token
+from unittest.mock import patch
+import datetime
+
+# the most queries each page of pickup/urls.py may run, counted by
+# QueryStatsMiddleware. The fixture below has several rows of everything a
+# page lists, so a query run once per row goes over the budget. Raise a
+# budget only together with the change that needs it.
+QUERY_BUDGETS = {
+    "index": 3,
+    "register": 0,
+    "login": 0,
+    "logout": 4,
+    "view_profile": 4,
+    "view_player": 4,
+    "search_players": 3,
+    "complete_player": 3,
+    "change_password": 2,
+    "Add Park": 2,
+    "edit_profile": 2,
+    "parks": 3,
+    "nearby_parks": 6,
+    "parks_map": 2,
+    "park_markers": 6,
+    "park_free_slots": 4,
+    "upcoming_matches": 5,
+    "my_week": 3,
+    "event_signup": 7,
+    "create_series": 3,
+    "join_occurrence": 24,
+    "park_calendar": 2,
+    "player_calendar": 1,
+    "accept_park_address": 10,
+    "favorite_park": 5,
+    "join_event": 11,
+    "messages": 3,
+    "messages_conversation": 6,
+    "messages_history": 5,
+    "new_message": 3,
+}
+
+# rows of each kind in the fixture
+ROWS = 5
+
+
+# tests that each page stays within its query budget
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create_user("Chief", "roberts@supremecourt.gov",
+                                                 "Justice4Life")
+        self.other = Player.objects.create_user("Notorious", "rbg@supremecourt.gov", "Dissent")
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+
+        self.parks = []
+        for i in range(ROWS):
+            park = Parks(player=self.player, name='Court %d' % i, street='%d First St NE' % i,
+                         city='Washington', state='DC', zipcode='20543')
+            park.save()
+            FavoriteParks(player=self.player, park=park).save()
+            Courts(name='Court %d' % i, latitude=38.89 + i / 100, longitude=-77.0, park=park).save()
+            self.parks.append(park)
+        self.park = self.parks[0]
+        self.mismatch = self.parks[1]
+        Parks.objects.filter(id=self.mismatch.id).update(
+            geocode_status=Parks.MISMATCH,
+            suggested_address="9 Second St NE, Washington, DC 20543, USA")
+
+        self.matches = []
+        for i in range(ROWS):
+            match = Schedule(name="Game %d" % i, creator=self.player, park=self.park,
+                             time=40 + 4 * i, date=tomorrow)
+            match.save()
+            EventSignup.join(self.player, match)
+            EventSignup.join(self.other, match)
+            self.matches.append(match)
+        self.series = MatchSeries(name="Weekly", creator=self.player, park=self.park, time=80,
+                                  start=tomorrow, until=tomorrow + datetime.timedelta(days=27),
+                                  weekdays=1 << tomorrow.weekday())
+        self.series.save()
+        self.tomorrow = tomorrow
+
+        partners = [self.other] + [Player.objects.create_user("Partner%d" % i, "p@test.test", "test")
+                                   for i in range(ROWS)]
+        for partner in partners:
+            for text in ("Tennis?", "Sure"):
+                Messages.objects.create(sender=self.player, receiver=partner, message=text)
+                Messages.objects.create(sender=partner, receiver=self.player, message=text)
+
+        self.client.post(reverse("login"), {"username": "Chief", "password": "Justice4Life"})
+
+    # the statistics of one request
+    def measure(self, name, method="get", kwargs=None, data=None):
+        response = getattr(self.client, method)(reverse(name, kwargs=kwargs), data)
+        self.assertLess(response.status_code, 400, name)
+        return response.wsgi_request.query_stats
+
+    def assertWithinBudget(self, name, method="get", kwargs=None, data=None):
+        stats = self.measure(name, method, kwargs, data)
+        self.assertLessEqual(stats.count, QUERY_BUDGETS[name],
+                             "{} ran {} queries, slowest: {}".format(name, stats.count,
+                                                                     stats.slowest_sql))
+
+    # test that every page has a budget
+    def test_all_pages_budgeted(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_account_pages(self):
+        self.assertWithinBudget("index")
+        self.assertWithinBudget("view_profile")
+        self.assertWithinBudget("view_player", kwargs={"username": "Notorious"})
+        self.assertWithinBudget("edit_profile")
+        self.assertWithinBudget("change_password")
+        self.assertWithinBudget("search_players", data={"search_text": "Part"})
+        self.assertWithinBudget("complete_player", data={"q": "Part"})
+        self.assertWithinBudget("logout")
+        self.assertWithinBudget("login")
+        self.assertWithinBudget("register")
+
+    def test_park_pages(self):
+        self.assertWithinBudget("Add Park")
+        self.assertWithinBudget("parks", data={"search_text": "Court"})
+        with patch("pickup.views.NEARBY_PARKS", ROWS):
+            self.assertWithinBudget("nearby_parks", data={"zipcode": "20543"})
+        self.assertWithinBudget("parks_map")
+        self.assertWithinBudget("park_markers", data={
+            "south": 38.8, "west": -77.1, "north": 39, "east": -76.9, "zoom": 10})
+        self.assertWithinBudget("park_free_slots", data={
+            "parks": [park.id for park in self.parks], "days": 7})
+        self.assertWithinBudget("favorite_park", "post", kwargs={"add": 0, "parkid": self.park.id})
+        self.assertWithinBudget("accept_park_address", "post", kwargs={"parkid": self.mismatch.id})
+
+    def test_match_pages(self):
+        self.assertWithinBudget("upcoming_matches")
+        self.assertWithinBudget("my_week")
+        self.assertWithinBudget("event_signup", kwargs={"parkid": self.park.id})
+        self.assertWithinBudget("create_series", kwargs={"parkid": self.park.id})
+        self.assertWithinBudget("join_occurrence", "post", kwargs={
+            "seriesid": self.series.id, "date": self.tomorrow.isoformat()})
+        self.assertWithinBudget("join_event", "post", kwargs={
+            "parkid": self.park.id, "add": 0, "eventid": self.matches[0].id})
+        self.assertWithinBudget("park_calendar", kwargs={"parkid": self.park.id})
+        self.assertWithinBudget("player_calendar", kwargs={"token": calendar_token(self.player.id)})
+
+    def test_message_pages(self):
+        self.assertWithinBudget("messages")
+        self.assertWithinBudget("messages_conversation", kwargs={"username": "Notorious"})
+        self.assertWithinBudget("messages_history", kwargs={"username": "Notorious"},
+                                data={"before": "2100-01-01T00:00:00_1"})
+        self.assertWithinBudget("new_message", data={"search_text": "Part"})
+
+    # test that the budget check notices a query run once per row
+    def test_detects_extra_queries(self):
+        def count_signups(*args, **kwargs):
+            for match in Schedule.objects.all():
+                match.eventsignup_set.count()
+            return []
+
+        with patch("pickup.views.complete_players", count_signups):
+            stats = self.measure("search_players", data={"search_text": "Part"})
+        self.assertGreater(stats.count, QUERY_BUDGETS["search_players"])
+
+    # test the header and log record written for each request
+    def test_reported(self):
+        with self.assertLogs("pickup.middleware", "INFO") as logs:
+            response = self.client.get(reverse("messages"))
+        timing = response["Server-Timing"]
+        self.assertTrue(timing.startswith("db;dur="))
+        self.assertIn('desc="{} queries"'.format(response.wsgi_request.query_stats.count), timing)
+        self.assertIn("db-slowest;dur=", timing)
+
+        record = logs.records[0]
+        self.assertEqual((record.url_name, record.status), ("messages", 200))
+        self.assertEqual(record.queries, response.wsgi_request.query_stats.count)
+        self.assertTrue(record.slowest_sql.startswith("SELECT"))
+
+        with override_settings(PICKUP_QUERY_TIMING=False):
+            self.assertNotIn("Server-Timing", self.client.get(reverse("messages")))
+
+    def test_stats(self):
+        stats = QueryStats()
+        self.assertEqual(stats.server_timing(), 'db;dur=0.00;desc="0 queries", db-slowest;dur=0.00')
@@ -0,0 +1,160 @@
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from pickup.models import Player, PlayerSearchKey, Parks, Schedule, EventSignup, FavoriteParks, \
+    Messages, Courts
+from pickup.views import get_user_messages
+from unittest.mock import patch
+import datetime
+import re
+
+# a step of a query plan that reads a whole table, directly or by walking
+# one of its indexes from end to end
+FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+
+# tables that a page is known to scan, such as substring searches that no
+# index can serve; keep this list as short as possible
+KNOWN_SCANS = {}
+
+
+# tests that run EXPLAIN QUERY PLAN over the queries each page issues and fail
+# if any of them falls back to a full table scan
+class QueryPlanTests(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create_user("Chief", "roberts@supremecourt.gov",
+                                                 "Justice4Life")
+        self.other = Player.objects.create_user("Notorious", "rbg@supremecourt.gov",
+                                                "Dissent")
+
+        self.park = Parks(player=self.player, name='Supreme Court',
+                          street='1 First St NE', city='Washington',
+                          state='DC', zipcode='20543')
+        self.park.save()
+        FavoriteParks(player=self.player, park=self.park).save()
+        Courts(name='Supreme Court', latitude=38.8906, longitude=-77.0044, park=self.park).save()
+
+        self.match = Schedule(name="Justices Only Game", creator=self.player,
+                              park=self.park, time=40,
+                              date=datetime.date.today() + datetime.timedelta(days=1))
+        self.match.save()
+        EventSignup(player=self.player, event=self.match).save()
+
+        Messages.objects.create(sender=self.player, receiver=self.other, message="Tennis?")
+        Messages.objects.create(sender=self.other, receiver=self.player, message="Sure")
+
+        self.client.post(reverse("login"), {"username": "Chief", "password": "Justice4Life"})
+
+    # return the tables each SELECT run by the request reads with a full scan
+    def get_full_scans(self, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertLess(response.status_code, 400)
+
+        scans = set()
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                if not query["sql"].startswith("SELECT"):
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+                for row in cursor.fetchall():
+                    match = FULL_SCAN.match(row[-1])
+                    if match:
+                        scans.add(match.group(1))
+        return scans
+
+    def assertNoFullScans(self, name, url, data=None):
+        scans = self.get_full_scans(url, data) - KNOWN_SCANS.get(name, set())
+        self.assertEqual(scans, set(), "{} scans {}".format(name, scans))
+
+    def test_index_plan(self):
+        self.assertNoFullScans("index", reverse("index"))
+
+    def test_profile_plan(self):
+        self.assertNoFullScans("view_player", reverse("view_player", kwargs={"username": "Notorious"}))
+
+    def test_search_players_plan(self):
+        self.assertNoFullScans("search_players", reverse("search_players"), {"search_text": "Not"})
+
+    def test_edit_profile_plan(self):
+        self.assertNoFullScans("edit_profile", reverse("edit_profile"))
+
+    def test_parks_plan(self):
+        self.assertNoFullScans("parks", reverse("parks"), {"search_text": "Court"})
+
+    def test_nearby_parks_plan(self):
+        # with fewer parks in the database than requested the search ranks
+        # every court, so only ask for as many parks as there are
+        with patch("pickup.views.NEARBY_PARKS", 1):
+            self.assertNoFullScans("nearby_parks", reverse("nearby_parks"), {"zipcode": "20543"})
+
+    def test_park_markers_plan(self):
+        self.assertNoFullScans("park_markers", reverse("park_markers"), {
+            "south": 38.8, "west": -77.1, "north": 39, "east": -76.9, "zoom": 10})
+
+    def test_free_slots_plan(self):
+        self.assertNoFullScans("park_free_slots", reverse("park_free_slots"),
+                               {"parks": self.park.id, "days": 7})
+
+    def test_upcoming_matches_plan(self):
+        self.assertNoFullScans("upcoming_matches", reverse("upcoming_matches"))
+        self.assertNoFullScans("upcoming_matches", reverse("upcoming_matches"),
+                               {"scope": "favorites", "after": "2000-01-01_0_1"})
+
+    def test_event_signup_plan(self):
+        self.assertNoFullScans("event_signup", reverse("event_signup", kwargs={"parkid": self.park.id}))
+
+    def test_join_event_plan(self):
+        self.assertNoFullScans("join_event", reverse("join_event", kwargs={
+            "parkid": self.park.id, "add": 0, "eventid": self.match.id}))
+
+    def test_messages_plan(self):
+        self.assertNoFullScans("messages", reverse("messages"))
+
+    def test_conversation_plan(self):
+        self.assertNoFullScans("messages_conversation",
+                               reverse("messages_conversation", kwargs={"username": "Notorious"}))
+
+    def test_history_plan(self):
+        self.assertNoFullScans("messages_history",
+                               reverse("messages_history", kwargs={"username": "Notorious"}),
+                               {"before": "2100-01-01T00:00:00_1"})
+
+    # test that a page of history is read in index order, stopping after the
+    # page, rather than sorting the whole conversation
+    def test_history_not_sorted(self):
+        with CaptureQueriesContext(connection) as queries:
+            get_user_messages(self.player, self.other, (datetime.datetime(2100, 1, 1), 1))
+        self.assertEqual(len(queries), 2)
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+                steps = [row[-1] for row in cursor.fetchall()]
+                self.assertEqual(len(steps), 1, steps)
+                self.assertIn("USING INDEX pickup_msg_pair_time", steps[0])
+
+    def test_new_message_plan(self):
+        self.assertNoFullScans("new_message", reverse("new_message"), {"search_text": "Not"})
+
+    # make sure the check itself notices a scan, here the substring search
+    # the player search used to run
+    def test_detects_full_scan(self):
+        def substring_search(text, *args, **kwargs):
+            return list(Player.objects.filter(username__contains=text))
+
+        with patch("pickup.views.complete_players", substring_search):
+            scans = self.get_full_scans(reverse("search_players"), {"search_text": "Not"})
+        self.assertIn("auth_user", scans)
+
+    # test that walking a whole index counts as a scan too, here the LIKE
+    # prefix match the completions briefly used
+    def test_detects_index_walk(self):
+        def like_search(text, *args, **kwargs):
+            keys = PlayerSearchKey.objects.filter(key__startswith=text.lower())
+            return [key.player for key in keys.select_related("player").order_by("key")]
+
+        with patch("pickup.views.complete_players", like_search):
+            scans = self.get_full_scans(reverse("search_players"), {"search_text": "Not"})
+        self.assertIn("pickup_playersearchkey", scans)
+        self.assertIsNotNone(FULL_SCAN.match("SCAN pickup_parks USING INDEX pickup_parks_player_id"))
@@ -0,0 +1,97 @@
+# File: realtime.py
+#
+# ASGI WebSocket endpoint that streams a player's new messages as they are
+# sent, so an open conversation does not have to be reloaded to see replies.
+import asyncio
+import json
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.http.cookie import parse_cookie
+
+from .broker import get_broker, player_channel
+
+MESSAGES_SOCKET_PATH = "/ws/messages/"
+
+
+# get the header values of an ASGI scope as a dict of strings
+def get_headers(scope):
+    return {name.decode("latin1"): value.decode("latin1")
+            for name, value in scope.get("headers", [])}
+
+
+# find the logged in user from the session cookie, None if not logged in
+@sync_to_async
+def get_session_user_id(headers):
+    cookies = parse_cookie(headers.get("cookie", ""))
+    session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+    if session_key is None:
+        return None
+
+    engine = import_module(settings.SESSION_ENGINE)
+    user = get_user(SimpleNamespace(session=engine.SessionStore(session_key)))
+    if not user.is_authenticated:
+        return None
+    return user.id
+
+
+# only accept sockets opened by pages served from this host
+def is_same_origin(headers):
+    origin = headers.get("origin")
+    if origin is None:
+        return True
+    return urlsplit(origin).netloc == headers.get("host")
+
+
+async def close(send, code):
+    await send({"type": "websocket.close", "code": code})
+
+
+# ASGI application for the messages WebSocket
+async def messages_socket(scope, receive, send):
+    event = await receive()
+    if event["type"] != "websocket.connect":
+        return
+
+    headers = get_headers(scope)
+    if scope["path"] != MESSAGES_SOCKET_PATH:
+        await close(send, 4404)
+        return
+    if not is_same_origin(headers):
+        await close(send, 4403)
+        return
+
+    user_id = await get_session_user_id(headers)
+    if user_id is None:
+        await close(send, 4401)
+        return
+
+    subscription = get_broker().subscribe(player_channel(user_id))
+    await send({"type": "websocket.accept"})
+
+    # forward published messages until the client goes away
+    receive_task = asyncio.ensure_future(receive())
+    get_task = asyncio.ensure_future(subscription.get())
+    try:
+        while True:
+            done, pending = await asyncio.wait(
+                {receive_task, get_task}, return_when=asyncio.FIRST_COMPLETED)
+
+            if get_task in done:
+                await send({"type": "websocket.send",
+                            "text": json.dumps(get_task.result())})
+                get_task = asyncio.ensure_future(subscription.get())
+
+            if receive_task in done:
+                if receive_task.result()["type"] == "websocket.disconnect":
+                    break
+                # anything the client sends is ignored
+                receive_task = asyncio.ensure_future(receive())
+    finally:
+        receive_task.cancel()
+        get_task.cancel()
+        subscription.close()
@@ -0,0 +1,112 @@
+from django.test import TestCase
+from django.conf import settings
+from django.urls import reverse
+from pickup.models import Player, Messages
+from pickup.broker import LocalBroker, player_channel, get_broker
+from pickup.realtime import messages_socket
+from asgiref.sync import async_to_sync, sync_to_async
+import asyncio
+import json
+
+
+# tests for the in-process publish/subscribe broker
+class LocalBrokerTests(TestCase):
+
+    # test that a subscriber gets messages published on its channel only
+    def test_publish_subscribe(self):
+        broker = LocalBroker()
+
+        async def run():
+            subscription = broker.subscribe("player.1")
+            broker.publish("player.2", {"message": "not for you"})
+            broker.publish("player.1", {"message": "hello"})
+            message = await asyncio.wait_for(subscription.get(), 1)
+            subscription.close()
+            return message
+
+        self.assertEqual(async_to_sync(run)(), {"message": "hello"})
+
+    # test that closed subscriptions are removed from the broker
+    def test_unsubscribe(self):
+        broker = LocalBroker()
+
+        async def run():
+            subscription = broker.subscribe("player.1")
+            subscription.close()
+
+        async_to_sync(run)()
+        self.assertEqual(dict(broker._subscribers), {})
+
+
+# tests for the messages WebSocket served by the ASGI application
+class MessagesSocketTests(TestCase):
+
+    # drive the socket with the given cookie, sending a message once connected
+    def open_socket(self, cookie, on_accept=None):
+        events = []
+
+        async def run():
+            incoming = asyncio.Queue()
+            await incoming.put({"type": "websocket.connect"})
+            scope = {"type": "websocket", "path": "/ws/messages/",
+                     "headers": [(b"host", b"testserver"),
+                                 (b"cookie", cookie.encode())]}
+
+            async def send(event):
+                events.append(event)
+                if event["type"] == "websocket.accept" and on_accept:
+                    await sync_to_async(on_accept)()
+                if event["type"] == "websocket.send":
+                    await incoming.put({"type": "websocket.disconnect"})
+
+            await asyncio.wait_for(messages_socket(scope, incoming.get, send), 5)
+
+        async_to_sync(run)()
+        return events
+
+    # test that players who are not logged in are turned away
+    def test_requires_login(self):
+        events = self.open_socket("")
+        self.assertEqual(events, [{"type": "websocket.close", "code": 4401}])
+
+    # test that a new message is pushed to the receiver's socket
+    def test_message_pushed(self):
+        player = Player.objects.create_user("test", "test@test.test", "test")
+        player2 = Player.objects.create_user("test2", "test2@test.test", "test2")
+        self.client.post(reverse("login"), {"username": "test2", "password": "test2"})
+        cookie = "{}={}".format(settings.SESSION_COOKIE_NAME,
+                                self.client.session.session_key)
+
+        def send_message():
+            get_broker().publish(player_channel(player2.id),
+                                 {"sender": "test", "message": "Game at 6?"})
+
+        events = self.open_socket(cookie, send_message)
+        self.assertEqual(events[0], {"type": "websocket.accept"})
+        self.assertEqual(json.loads(events[1]["text"]),
+                         {"sender": "test", "message": "Game at 6?"})
+
+    # test that saving a message publishes it to both participants
+    def test_save_publishes(self):
+        player = Player.objects.create_user("test", "test@test.test", "test")
+        player2 = Player.objects.create_user("test2", "test2@test.test", "test2")
+
+        async def run():
+            broker = get_broker()
+            subscriptions = [broker.subscribe(player_channel(player.id)),
+                             broker.subscribe(player_channel(player2.id))]
+
+            def save():
+                with self.captureOnCommitCallbacks(execute=True):
+                    Messages.objects.create(sender=player, receiver=player2, message="Game at 6?")
+
+            await sync_to_async(save)()
+            received = [await asyncio.wait_for(s.get(), 1) for s in subscriptions]
+            for subscription in subscriptions:
+                subscription.close()
+            return received
+
+        received = async_to_sync(run)()
+        self.assertEqual([m["message"] for m in received], ["Game at 6?"] * 2)
+        self.assertEqual(received[0]["receiver"], "test2")
+
@@ -0,0 +1,97 @@
+# File: search.py
+#
+# Ranked park search over the gram index kept in ParkSearchGram. A search is
+# split into grams the same way park fields are, the parks sharing enough of
+# them are found through the index, and those sharing the most rank first, so
+# results come back in relevance order despite typos and the work done
+# depends on how many parks match rather than on how many exist.
+#
+# Player search completes prefixes of usernames and names over the keys kept
+# in PlayerSearchKey, reading no more index rows than the results shown.
+import hashlib
+import math
+
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+
+from .models import Parks, ParkSearchGram, PlayerSearchKey
+from .prefixes import normalize_key, prefix_range
+from .trigrams import query_grams
+
+# share of a search's grams a park must contain to be listed
+MATCH_THRESHOLD = 0.5
+
+
+# parks matching a search by name, city or zipcode, annotated with a "rank"
+# that is higher for better matches: first by shared grams, then by shared
+# word starts, then by grams shared with the name. An empty search matches
+# every park with rank 0. The matches and their ranks are read from the gram
+# index, grouped by park, so the parks table is only looked up by id.
+def search_parks(text):
+    required, starts = query_grams(text)
+    if not required:
+        return Parks.objects.annotate(rank=Value(0, output_field=IntegerField()))
+
+    # weigh each count above the largest possible value of the next one, so
+    # the rank orders parks by the three counts in turn
+    start_weight = len(required | starts) + 1
+    hit_weight = start_weight * (len(starts) + 1)
+
+    def shared(query):
+        return Count("gram", distinct=True, filter=query)
+
+    minimum = max(1, math.ceil(len(required) * MATCH_THRESHOLD))
+    ranks = ParkSearchGram.objects.filter(gram__in=required | starts) \
+        .values("park_id") \
+        .annotate(rank=shared(Q(gram__in=required)) * hit_weight +
+                  shared(Q(gram__in=starts)) * start_weight +
+                  shared(Q(field=ParkSearchGram.NAME)))
+    matches = ranks.filter(rank__gte=minimum * hit_weight).values("park_id")
+    return Parks.objects.filter(id__in=matches) \
+        .annotate(rank=Subquery(ranks.filter(park_id=OuterRef("pk")).values("rank")))
+
+
+# number of players suggested while typing, and for how long the
+# suggestions for a prefix are reused
+COMPLETIONS = 10
+COMPLETION_TIMEOUT = 30
+
+# most keys a player has in the index, see prefixes.player_keys
+KEYS_PER_PLAYER = 3
+
+
+# players whose username, full name or last name starts with a prefix, in
+# key order, at most limit of them, read with one query. Private players are
+# only included by username, and only without public_only. Reading limit keys
+# for each key a player can have is enough to fill the list after dropping
+# players found by more than one key. The keys are read as a range, which
+# unlike LIKE can seek the index.
+def complete_players(prefix, limit=COMPLETIONS, public_only=True, exclude=None):
+    low, high = prefix_range(normalize_key(prefix))
+    keys = PlayerSearchKey.objects.filter(key__gte=low)
+    if high is not None:
+        keys = keys.filter(key__lt=high)
+    if public_only:
+        keys = keys.filter(is_public=True)
+    else:
+        keys = keys.filter(Q(is_public=True) | Q(kind=PlayerSearchKey.USERNAME))
+    if exclude is not None:
+        keys = keys.exclude(player_id=exclude)
+
+    players = {}
+    for key in keys.select_related("player").order_by("key", "player_id")[:limit * KEYS_PER_PLAYER]:
+        players.setdefault(key.player_id, key.player)
+    return list(players.values())[:limit]
+
+
+# the public players completing a prefix as JSON ready dicts, cached briefly
+# so each keystroke of a popular prefix does not reach the database
+def cached_completions(prefix):
+    prefix = normalize_key(prefix)
+    key = "pickup:complete:" + hashlib.sha1(prefix.encode("utf-8")).hexdigest()
+    completions = cache.get(key)
+    if completions is None:
+        completions = [{"username": player.username, "name": player.get_full_name()}
+                       for player in complete_players(prefix)]
+        cache.set(key, completions, COMPLETION_TIMEOUT)
+    return completions
@@ -0,0 +1,141 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+from pickup.models import Player, Parks, ParkSearchGram, FavoriteParks
+from pickup.search import search_parks
+from pickup.views import get_parks_page, decode_park_cursor
+from unittest.mock import patch
+from pickup.trigrams import text_grams, query_grams
+
+
+# tests for the ranked park search
+class ParkSearchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='Testuser')
+
+    def add_park(self, name, city='Baltimore', zipcode='21224'):
+        park = Parks(player=self.user, name=name, street='Street', city=city,
+                     state='MD', zipcode=zipcode)
+        park.save()
+        return park
+
+    def search(self, text, limit=10):
+        return [park.name for park in search_parks(text).order_by("-rank", "id")[:limit]]
+
+    def test_grams(self):
+        self.assertEqual(text_grams("Ox"), {"ox", " ox"})
+        self.assertEqual(text_grams("Park"), {"par", "ark", " pa"})
+        self.assertIn("k", text_grams("Park", short=True))
+        self.assertEqual(query_grams("park!"), ({"par", "ark"}, {" pa"}))
+
+    # test that better matches rank first and a typo still matches
+    def test_ranking(self):
+        self.add_park("Patterson Park")
+        self.add_park("Yellowstone")
+        self.add_park("Yellow Creek")
+
+        self.assertEqual(self.search("yellowstone"), ["Yellowstone"])
+        self.assertEqual(self.search("yelowstone"), ["Yellowstone"])
+        self.assertEqual(set(self.search("yellow")[:2]), {"Yellow Creek", "Yellowstone"})
+        self.assertEqual(self.search("panda"), [])
+
+    # test searching by city and zipcode
+    def test_city_and_zipcode(self):
+        self.add_park("Druid Hill Park", city="Baltimore", zipcode="21217")
+        self.add_park("Central Park", city="New York", zipcode="10024")
+
+        self.assertEqual(self.search("new york"), ["Central Park"])
+        self.assertEqual(self.search("21217"), ["Druid Hill Park"])
+
+    # test that results are limited
+    def test_limit(self):
+        for i in range(5):
+            self.add_park("Park %d" % i)
+        self.assertEqual(len(self.search("park", 3)), 3)
+        self.assertEqual(len(self.search("", 3)), 3)
+
+    # test that the index follows changes to parks
+    def test_index_kept_current(self):
+        park = self.add_park("Patterson Park")
+        park.name = "Clifton Park"
+        park.save()
+        self.assertEqual(self.search("patterson"), [])
+        self.assertEqual(self.search("clifton"), ["Clifton Park"])
+
+        # saving other fields leaves the index alone
+        with self.assertNumQueries(3):
+            park.save(update_fields=["geocode_status"])
+
+        park.delete()
+        self.assertFalse(ParkSearchGram.objects.exists())
+
+    # test that the parks page lists matches in order of relevance
+    def test_parks_page(self):
+        self.add_park("Yellow Creek")
+        self.add_park("Yellowstone")
+        Player.objects.create_user("Chevy", "corvette@c6.org", "fa5test")
+        self.client.post(reverse("login"), {"username": "Chevy", "password": "fa5test"})
+
+        response = self.client.get(reverse("parks"), {"search_text": "Yelowstone"})
+        self.assertContains(response, "Yellowstone")
+        self.assertNotContains(response, "Yellow Creek")
+
+
+# tests for paging through the parks list
+class ParksPageTests(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create_user("Chevy", "corvette@c6.org", "fa5test")
+        self.client.post(reverse("login"), {"username": "Chevy", "password": "fa5test"})
+        self.parks = []
+        for i in range(7):
+            park = Parks(player=self.player, name="Park %d" % i, street='Street',
+                         city='Baltimore', state='MD', zipcode='21224')
+            park.save()
+            self.parks.append(park)
+        FavoriteParks(player=self.player, park=self.parks[5]).save()
+        FavoriteParks(player=self.player, park=self.parks[2]).save()
+
+    # page through every result, returning the parks in order
+    def read_pages(self, search_text, limit):
+        parks, after = [], None
+        while True:
+            page, after = get_parks_page(self.player, search_text, after, limit)
+            parks.extend(page)
+            if after is None:
+                return parks
+            after = decode_park_cursor(after)
+
+    # test that favorites come first and paging neither skips nor repeats parks
+    def test_pages_stable(self):
+        parks = self.read_pages("park", 2)
+        self.assertEqual([park.id for park in parks],
+                         [self.parks[2].id, self.parks[5].id] +
+                         [park.id for i, park in enumerate(self.parks) if i not in (2, 5)])
+        self.assertEqual([park.is_favorite for park in parks], [True] * 2 + [False] * 5)
+
+        # without a search only the favorites are listed
+        self.assertEqual([park.name for park in self.read_pages(None, 1)], ["Park 2", "Park 5"])
+
+    # test that a page of search results is a single query
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            page, after = get_parks_page(self.player, "park", None, 3)
+        self.assertEqual(len(page), 3)
+        self.assertIsNotNone(after)
+
+    # test following the link to the next page
+    @patch("pickup.views.PARKS_PAGE_SIZE", 4)
+    def test_next_page_link(self):
+        response = self.client.get(reverse("parks"), {"search_text": "park"})
+        self.assertContains(response, "More parks")
+        self.assertNotContains(response, "Park 6")
+
+        after = response.context["next"]
+        response = self.client.get(reverse("parks"), {"search_text": "park", "after": after})
+        self.assertContains(response, "Park 6")
+        self.assertNotContains(response, "More parks")
+
+        response = self.client.get(reverse("parks"), {"after": "bad"})
+        self.assertEqual(response.status_code, 400)
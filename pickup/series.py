@@ -0,0 +1,65 @@
+# File: series.py
+#
+# Occurrences of recurring matches. A MatchSeries only stores its weekly
+# pattern; the occurrences inside the dates a page shows are generated as
+# unsaved Schedule objects, in the same (date, time, id) order as stored
+# matches so the two can be listed together. An occurrence is left out when
+# its park already has a match in that slot, whether a one off match or the
+# occurrence itself once someone joined it, so series never break the
+# (park, time, date) constraint on Schedule.
+import datetime
+import heapq
+
+from .models import MatchSeries, ParkAvailability
+from .slots import is_booked, slot_bit
+
+# number of days ahead that occurrences are listed for
+SERIES_WINDOW_DAYS = 28
+
+
+# sort key of a match in listings; occurrences not stored yet stand in with
+# the negative id of their series
+def match_key(match):
+    if match.id is None:
+        return match.date, match.time, -match.series_id
+    return match.date, match.time, match.id
+
+
+# the series that have occurrences between two dates
+def running_series(start, end):
+    return MatchSeries.objects.filter(until__gte=start, start__lte=end).select_related("park")
+
+
+# iterate over the unsaved occurrences of a set of series between two dates,
+# inclusive, in match_key order; the parks' bookings are read with a single
+# query up front, the occurrences themselves are only built as they are used
+def occurrences(series, start, end):
+    series = list(series)
+    if not series or end < start:
+        return iter(())
+
+    booked = ParkAvailability.booked_slots({item.park_id for item in series},
+                                           start, (end - start).days + 1)
+
+    def generate(item):
+        for date in item.dates(start, end):
+            if not is_booked(booked[item.park_id][date], item.time):
+                yield item.occurrence(date)
+
+    return heapq.merge(*[generate(item) for item in series], key=match_key)
+
+
+# add the slots held by series occurrences to bitmaps read with
+# ParkAvailability.booked_slots for the given range of days
+def add_series_slots(booked, start, days):
+    end = start + datetime.timedelta(days=days - 1)
+    for item in MatchSeries.objects.filter(park_id__in=list(booked), until__gte=start, start__lte=end):
+        for date in item.dates(start, end):
+            booked[item.park_id][date] |= slot_bit(item.time)
+    return booked
+
+
+# whether a series holds a park's slot on a date
+def series_holds(park, date, time):
+    return any(item.occurs_on(date) for item in
+               MatchSeries.objects.filter(park=park, time=time, start__lte=date, until__gte=date))
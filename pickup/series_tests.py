@@ -0,0 +1,172 @@
+from django.test import TestCase
+from django.urls import reverse
+from pickup.models import Player, Parks, Schedule, MatchSeries, EventSignup
+from pickup.forms import MatchSeriesForm, ScheduleForm
+from pickup.series import occurrences, running_series
+from unittest.mock import patch
+import datetime
+
+
+# tests for weekly matches and their occurrences
+class SeriesTests(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create_user("root", "root@root.com", "root")
+        self.client.post(reverse("login"), {"username": "root", "password": "root"})
+        self.park = Parks(player=self.player, name='Parky', street='Parkstreet',
+                          city='Parkville', state='AZ', zipcode='12345')
+        self.park.save()
+        self.today = datetime.date.today()
+        # the next Tuesday after today
+        self.tuesday = self.today + datetime.timedelta(days=(1 - self.today.weekday()) % 7 or 7)
+
+    # a series on Tuesdays and Thursdays for the next three weeks
+    def add_series(self, name="Weekly Run", time=72, park=None):
+        series = MatchSeries(name=name, creator=self.player, park=park or self.park, time=time,
+                             start=self.tuesday, until=self.tuesday + datetime.timedelta(days=16),
+                             weekdays=(1 << 1) | (1 << 3))
+        series.save()
+        return series
+
+    def dates(self, start=None, end=None):
+        start = start or self.today
+        end = end or self.today + datetime.timedelta(days=60)
+        return [match.date for match in occurrences(running_series(start, end), start, end)]
+
+    # test that occurrences are generated without saving any match
+    def test_occurrences(self):
+        self.add_series()
+        dates = self.dates()
+        self.assertEqual(len(dates), 6)
+        self.assertEqual(dates[0], self.tuesday)
+        self.assertEqual(dates[1], self.tuesday + datetime.timedelta(days=2))
+        self.assertTrue(all(date.weekday() in (1, 3) for date in dates))
+        self.assertFalse(Schedule.objects.exists())
+
+        # the window is respected
+        end = self.tuesday + datetime.timedelta(days=3)
+        self.assertEqual(self.dates(self.tuesday, end), dates[:2])
+
+    # test that a slot taken by a one off match is skipped
+    def test_booked_slot_skipped(self):
+        self.add_series()
+        Schedule(name="One Off", creator=self.player, park=self.park, time=72,
+                 date=self.tuesday).save()
+        self.assertNotIn(self.tuesday, self.dates())
+        self.assertEqual(len(self.dates()), 5)
+
+    # test that joining saves the occurrence and signs the player up
+    def test_join_materializes(self):
+        series = self.add_series()
+        url = reverse("join_occurrence", kwargs={"seriesid": series.id,
+                                                 "date": self.tuesday.isoformat()})
+        response = self.client.get(url)
+        self.assertContains(response, "Weekly Run")
+        self.assertFalse(Schedule.objects.exists())
+
+        self.client.post(url)
+        match = Schedule.objects.get()
+        self.assertEqual((match.series, match.date, match.time), (series, self.tuesday, 72))
+        self.assertTrue(EventSignup.objects.filter(player=self.player, event=match).exists())
+
+        # the saved occurrence is not generated again
+        self.assertEqual(len(self.dates()), 5)
+
+        response = self.client.post(url)
+        self.assertContains(response, "already joined")
+        self.assertEqual(Schedule.objects.count(), 1)
+
+        response = self.client.get(reverse("join_occurrence", kwargs={
+            "seriesid": series.id, "date": (self.tuesday + datetime.timedelta(days=1)).isoformat()}))
+        self.assertEqual(response.status_code, 404)
+
+    # test that materializing twice, or after another player already did,
+    # gives the same match
+    def test_materialize_once(self):
+        series = self.add_series()
+        first = series.materialize(self.tuesday)
+        self.assertEqual(series.materialize(self.tuesday), first)
+
+        # a copy that misses the saved match runs into the unique constraint
+        # and picks up the existing one
+        with patch("pickup.models.Schedule.objects.filter") as stale:
+            stale.return_value.first.side_effect = [None, first]
+            self.assertEqual(series.materialize(self.tuesday), first)
+        self.assertEqual(Schedule.objects.count(), 1)
+        self.assertIsNone(series.materialize(self.tuesday + datetime.timedelta(days=1)))
+
+    # test that an occurrence whose slot was taken cannot be joined
+    def test_slot_taken(self):
+        series = self.add_series()
+        Schedule(name="One Off", creator=self.player, park=self.park, time=72,
+                 date=self.tuesday).save()
+        self.assertIsNone(series.materialize(self.tuesday))
+
+        url = reverse("join_occurrence", kwargs={"seriesid": series.id,
+                                                 "date": self.tuesday.isoformat()})
+        response = self.client.post(url)
+        self.assertContains(response, "no longer available")
+        self.assertEqual(Schedule.objects.count(), 1)
+
+    # test that one off matches and other series cannot take a series slot
+    def test_forms(self):
+        self.add_series()
+        fields = {'date': self.tuesday.isoformat(), 'time': '72', 'name': 'Another Match'}
+        form = ScheduleForm(fields, park=self.park)
+        self.assertFalse(form.is_valid())
+        self.assertIn("weekly match", form.errors['time'][0])
+
+        fields = {'name': 'Another Run', 'time': '72', 'start': self.tuesday.isoformat(),
+                  'until': (self.tuesday + datetime.timedelta(days=30)).isoformat(), 'days': ['3']}
+        self.assertFalse(MatchSeriesForm(fields, park=self.park).is_valid())
+        fields['days'] = ['0', '4']
+        form = MatchSeriesForm(fields, park=self.park)
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.instance.weekdays, (1 << 0) | (1 << 4))
+
+        fields['until'] = (self.tuesday - datetime.timedelta(days=1)).isoformat()
+        self.assertFalse(MatchSeriesForm(fields, park=self.park).is_valid())
+        fields['until'] = (self.tuesday + datetime.timedelta(days=400)).isoformat()
+        self.assertFalse(MatchSeriesForm(fields, park=self.park).is_valid())
+
+    # test creating a series through its page
+    def test_create_view(self):
+        response = self.client.post(reverse("create_series", kwargs={"parkid": self.park.id}), {
+            'name': 'Tuesday Run', 'time': '72', 'start': self.tuesday.isoformat(),
+            'until': (self.tuesday + datetime.timedelta(days=14)).isoformat(), 'days': ['1']})
+        self.assertRedirects(response, reverse("event_signup", kwargs={"parkid": self.park.id}))
+        series = MatchSeries.objects.get()
+        self.assertEqual((series.creator_id, series.park, series.weekdays), (self.player.id, self.park, 2))
+
+        response = self.client.get(reverse("event_signup", kwargs={"parkid": self.park.id}))
+        self.assertContains(response, "Tuesday Run", count=3)
+
+    # test that occurrences are listed in the feed in order and paged with
+    # the stored matches
+    @patch("pickup.views.MATCHES_PAGE_SIZE", 2)
+    def test_feed(self):
+        self.add_series()
+        other = Parks(player=self.player, name='Other', street='Parkstreet',
+                      city='Parkville', state='AZ', zipcode='12345')
+        other.save()
+        Schedule(name="One Off", creator=self.player, park=other, time=40,
+                 date=self.tuesday + datetime.timedelta(days=2)).save()
+
+        response = self.client.get(reverse("upcoming_matches"), {"scope": "all"})
+        pages = [[(match.name, match.date) for match in response.context["matches"]]]
+        while "next_query" in response.context:
+            response = self.client.get(reverse("upcoming_matches") + "?" +
+                                       response.context["next_query"])
+            pages.append([(match.name, match.date) for match in response.context["matches"]])
+
+        self.assertTrue(all(len(page) == 2 for page in pages[:-1]))
+        listed = [item for page in pages for item in page]
+        self.assertEqual(len(listed), 7)
+        self.assertEqual(listed[:3], [("Weekly Run", self.tuesday),
+                                      ("One Off", self.tuesday + datetime.timedelta(days=2)),
+                                      ("Weekly Run", self.tuesday + datetime.timedelta(days=2))])
+        self.assertEqual([date for name, date in listed], sorted(date for name, date in listed))
+        self.assertFalse(Schedule.objects.filter(series__isnull=False).exists())
+
+        self.assertEqual(len(self.client.get(reverse("upcoming_matches"),
+                                             {"latest": 60}).context["matches"]), 1)
@@ -0,0 +1,123 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.db.utils import IntegrityError
+from pickup.models import Player, Parks, Schedule, EventSignup
+from unittest.mock import Mock, patch
+import datetime
+
+
+# tests for match capacity, signup counts and the waitlist
+class CapacityTests(TestCase):
+
+    def setUp(self):
+        self.players = [Player.objects.create_user("Player%d" % i, "p%d@test.com" % i, "pass",
+                                                   first_name="First%d" % i, last_name="Last")
+                        for i in range(4)]
+        self.park = Parks(player=self.players[0], name='Parky', street='Parkstreet',
+                          city='Parkville', state='AZ', zipcode='12345')
+        self.park.save()
+        self.match = Schedule(name="Small Game", creator=self.players[0], park=self.park,
+                              time=40, capacity=2,
+                              date=datetime.date.today() + datetime.timedelta(days=1))
+        self.match.save()
+
+    def refresh(self):
+        self.match.refresh_from_db()
+        return self.match.signup_count
+
+    def status(self, player):
+        return EventSignup.objects.get(player=player, event=self.match).status
+
+    # test that players past the capacity are waitlisted
+    def test_join_until_full(self):
+        for player in self.players[:3]:
+            EventSignup.join(player, self.match)
+
+        self.assertEqual(self.refresh(), 2)
+        self.assertEqual(self.match.spots_left, 0)
+        self.assertEqual(self.status(self.players[2]), EventSignup.WAITLISTED)
+
+        with self.assertRaises(IntegrityError):
+            EventSignup.join(self.players[0], self.match)
+        self.assertEqual(self.refresh(), 2)
+
+    # test that leaving hands the spot to the first waitlisted player
+    def test_leave_promotes_waitlist(self):
+        for player in self.players:
+            EventSignup.join(player, self.match)
+
+        self.assertTrue(EventSignup.leave(self.players[0], self.match))
+        self.assertEqual(self.refresh(), 2)
+        self.assertEqual(self.status(self.players[2]), EventSignup.JOINED)
+        self.assertEqual(self.status(self.players[3]), EventSignup.WAITLISTED)
+
+        # leaving from the waitlist frees no spot
+        self.assertTrue(EventSignup.leave(self.players[3], self.match))
+        self.assertEqual(self.refresh(), 2)
+
+        self.assertTrue(EventSignup.leave(self.players[1], self.match))
+        self.assertEqual(self.refresh(), 1)
+        self.assertFalse(EventSignup.leave(self.players[1], self.match))
+
+    # test that a spot claimed for a waitlisted player who left while the
+    # waitlist was being promoted is given back
+    def test_promoted_player_left(self):
+        for player in self.players[:3]:
+            EventSignup.join(player, self.match)
+        waitlisted = EventSignup.objects.get(player=self.players[2])
+        read = EventSignup.objects.filter
+
+        def read_then_leave(*args, **kwargs):
+            signups = read(*args, **kwargs)
+            if kwargs.get("status") == EventSignup.WAITLISTED and "id" not in kwargs:
+                signups = list(signups.order_by("id"))
+                read(id=waitlisted.id).delete()
+                return Mock(order_by=lambda *fields: signups)
+            return signups
+
+        with patch.object(EventSignup.objects, "filter", read_then_leave):
+            self.assertTrue(EventSignup.leave(self.players[0], self.match))
+        self.assertEqual(self.refresh(), 1)
+        self.assertFalse(EventSignup.objects.filter(player=self.players[2]).exists())
+
+    # test that the count is taken from the database rather than from a
+    # possibly stale copy of the match
+    def test_stale_copies(self):
+        stale = Schedule.objects.get(id=self.match.id)
+        EventSignup.join(self.players[0], self.match)
+        EventSignup.join(self.players[1], self.match)
+
+        # a full match stays full when joined through an old copy
+        EventSignup.join(self.players[2], stale)
+        self.assertEqual(self.status(self.players[2]), EventSignup.WAITLISTED)
+
+        # saving an old copy keeps the count and a larger capacity fills up
+        stale.capacity = 3
+        stale.save()
+        self.assertEqual(self.refresh(), 3)
+        self.assertEqual(self.status(self.players[2]), EventSignup.JOINED)
+
+    # test the join page, which reads the roster and waitlist with one query
+    def test_join_page(self):
+        for player in self.players[1:]:
+            EventSignup.join(player, self.match)
+        self.client.post(reverse("login"), {"username": "Player0", "password": "pass"})
+
+        url = reverse("join_event", kwargs={"parkid": self.park.id, "add": 1,
+                                            "eventid": self.match.id})
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertContains(response, "Spots left: 0 of 2")
+        self.assertContains(response, "Waitlist")
+        self.assertContains(response, "First3 Last")
+        self.assertContains(response, "Join the waitlist?")
+
+        self.client.post(url)
+        self.assertEqual(self.status(self.players[0]), EventSignup.WAITLISTED)
+
+        url = reverse("join_event", kwargs={"parkid": self.park.id, "add": 0,
+                                            "eventid": self.match.id})
+        self.client.post(url)
+        self.assertFalse(EventSignup.objects.filter(player=self.players[0]).exists())
+        response = self.client.post(url)
+        self.assertContains(response, "leave because you")
@@ -0,0 +1,51 @@
+# File: slots.py
+#
+# The 15 minute time slots of a day that matches are scheduled in, their
+# labels, and bitmaps of them: bit i is set when slot i is booked. A day fits
+# in 96 bits, stored as 12 bytes, so a park's availability over any number of
+# days is a handful of integers and combining parks or days is plain bit
+# arithmetic.
+import datetime
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+BITMAP_BYTES = SLOTS_PER_DAY // 8
+
+# display label of each slot, e.g. "10:00 AM", built once instead of for
+# every match shown
+SLOT_LABELS = tuple(
+    (datetime.datetime(1900, 1, 1) + datetime.timedelta(minutes=SLOT_MINUTES * slot)).strftime("%I:%M %p")
+    for slot in range(SLOTS_PER_DAY))
+
+# every slot of a day
+ALL_SLOTS = (1 << SLOTS_PER_DAY) - 1
+
+
+def slot_bit(slot):
+    return 1 << slot
+
+
+# build a bitmap with the given slots booked
+def bitmap_of(slots):
+    bits = 0
+    for slot in slots:
+        bits |= slot_bit(slot)
+    return bits
+
+
+def bitmap_to_bytes(bits):
+    return bits.to_bytes(BITMAP_BYTES, "little")
+
+
+def bitmap_from_bytes(data):
+    return int.from_bytes(bytes(data), "little")
+
+
+def is_booked(bits, slot):
+    return bool(bits & slot_bit(slot))
+
+
+# the slots not booked in a bitmap, in order
+def free_slots(bits):
+    free = ALL_SLOTS & ~bits
+    return [slot for slot in range(SLOTS_PER_DAY) if free & slot_bit(slot)]
@@ -0,0 +1,92 @@
+from django.test import TestCase
+from django.urls import reverse
+from pickup.models import Player, Parks, Schedule, ParkAvailability
+from pickup.forms import ScheduleForm
+from pickup.slots import bitmap_of, bitmap_to_bytes, bitmap_from_bytes, free_slots, \
+    is_booked, SLOTS_PER_DAY
+import datetime
+
+
+# tests for the per park, per day bitmaps of booked time slots
+class AvailabilityTests(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create_user("root", "root@root.com", "root")
+        self.client.post(reverse("login"), {"username": "root", "password": "root"})
+        self.park = Parks(player=self.player, name='Parky', street='Parkstreet',
+                          city='Parkville', state='AZ', zipcode='12345')
+        self.park.save()
+        self.day = datetime.date.today() + datetime.timedelta(days=1)
+
+    def add_match(self, time, date=None, park=None):
+        match = Schedule(name="Match %d" % time, creator=self.player, park=park or self.park,
+                         time=time, date=date or self.day)
+        match.save()
+        return match
+
+    def bitmap(self, date=None):
+        return ParkAvailability.objects.get(park=self.park, date=date or self.day).bitmap
+
+    def test_bitmaps(self):
+        bits = bitmap_of([0, 40, 95])
+        self.assertEqual(bitmap_from_bytes(bitmap_to_bytes(bits)), bits)
+        self.assertEqual(len(bitmap_to_bytes(bits)), 12)
+        self.assertTrue(is_booked(bits, 95))
+        self.assertFalse(is_booked(bits, 41))
+        self.assertEqual(len(free_slots(bits)), SLOTS_PER_DAY - 3)
+
+    # test that the bitmap follows matches being added, moved and deleted
+    def test_kept_in_sync(self):
+        first = self.add_match(4)
+        second = self.add_match(40)
+        self.assertEqual(self.bitmap(), bitmap_of([4, 40]))
+
+        later = self.day + datetime.timedelta(days=1)
+        second.date = later
+        second.save()
+        self.assertEqual(self.bitmap(), bitmap_of([4]))
+        self.assertEqual(self.bitmap(later), bitmap_of([40]))
+
+        first.delete()
+        self.assertEqual(self.bitmap(), 0)
+
+    # test that the form rejects a time the park already has a match at
+    def test_form_conflict(self):
+        self.add_match(4)
+        fields = {'date': self.day.isoformat(), 'time': '4', 'name': 'Another Match'}
+        form = ScheduleForm(fields, park=self.park)
+        self.assertFalse(form.is_valid())
+        self.assertIn("already a match at this time", form.errors['time'][0])
+
+        fields['time'] = '5'
+        self.assertTrue(ScheduleForm(fields, park=self.park).is_valid())
+
+    # test that many parks and days are read with one query
+    def test_booked_slots_one_query(self):
+        other = Parks(player=self.player, name='Other', street='Parkstreet',
+                      city='Parkville', state='AZ', zipcode='12345')
+        other.save()
+        self.add_match(4)
+        self.add_match(8, park=other, date=self.day + datetime.timedelta(days=2))
+
+        with self.assertNumQueries(1):
+            booked = ParkAvailability.booked_slots([self.park.id, other.id], self.day, 7)
+        self.assertEqual(booked[self.park.id][self.day], bitmap_of([4]))
+        self.assertEqual(booked[other.id][self.day], 0)
+        self.assertEqual(booked[other.id][self.day + datetime.timedelta(days=2)], bitmap_of([8]))
+
+    # test the free slots endpoint
+    def test_free_slots_view(self):
+        self.add_match(4)
+        response = self.client.get(reverse("park_free_slots"), {
+            "parks": str(self.park.id), "start": self.day.isoformat(), "days": 2})
+        self.assertEqual(response.status_code, 200)
+        days = response.json()["parks"][str(self.park.id)]
+        self.assertNotIn(4, days[self.day.isoformat()])
+        self.assertEqual(len(days[(self.day + datetime.timedelta(days=1)).isoformat()]),
+                         SLOTS_PER_DAY)
+
+        response = self.client.get(reverse("park_free_slots"), {"parks": "x"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("park_free_slots"), {"parks": "1", "days": 400})
+        self.assertEqual(response.status_code, 400)
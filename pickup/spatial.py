@@ -0,0 +1,111 @@
+# File: spatial.py
+#
+# Geohash index over court coordinates for finding the parks nearest to a
+# point. Each court's geohash is stored in an indexed column, so nearby courts
+# are found with a few range scans over that index, and only those candidates
+# have their exact distance computed. Also builds the clustered markers for
+# the parks map.
+from django.core.cache import cache
+from django.db.models import Q
+
+from .geohash import neighbourhood, covered_radius, haversine_distances
+from .models import Courts, Parks
+from .tiles import CLUSTER_GRID, INDIVIDUAL_ZOOM, TILE_TIMEOUT, project, \
+    tile_bounds, tile_cache_key
+
+# finest geohash precision searched
+SEARCH_PRECISION = 6
+
+
+# query matching the courts inside any of the given cells, as index range scans
+def courts_in_cells(cells):
+    query = Q()
+    for cell in cells:
+        query |= Q(geohash__gte=cell, geohash__lt=cell + "~")
+    return Courts.objects.filter(query)
+
+
+# return the k parks nearest to a point as (park, distance in km) pairs,
+# closest first
+def nearest_parks(latitude, longitude, k=10):
+    for precision in range(SEARCH_PRECISION, 0, -1):
+        candidates = courts_in_cells(neighbourhood(latitude, longitude, precision))
+        nearest = rank_parks(latitude, longitude, candidates, k)
+
+        # the answer is exact once the k-th park is closer than anything the
+        # searched cells could have missed
+        if len(nearest) == k and nearest[-1][1] <= covered_radius(latitude, precision):
+            break
+    else:
+        nearest = rank_parks(latitude, longitude, Courts.objects.all(), k)
+
+    parks = Parks.objects.in_bulk([park_id for park_id, distance in nearest])
+    return [(parks[park_id], distance) for park_id, distance in nearest]
+
+
+# find the k closest parks among a set of courts as (park id, distance) pairs,
+# using the park's closest court
+def rank_parks(latitude, longitude, courts, k):
+    rows = list(courts.values_list("park_id", "latitude", "longitude"))
+    distances = haversine_distances(latitude, longitude,
+                                    [(lat, lng) for park_id, lat, lng in rows])
+    closest = {}
+    for (park_id, lat, lng), distance in zip(rows, distances):
+        if park_id not in closest or distance < closest[park_id]:
+            closest[park_id] = distance
+    return sorted(closest.items(), key=lambda item: item[1])[:k]
+
+
+# find a point for a zipcode: the middle of the parks already known there, or
+# None if there are none
+def locate_zipcode(zipcode):
+    rows = list(Courts.objects.filter(park__zipcode=zipcode)
+                .values_list("latitude", "longitude"))
+    if not rows:
+        return None
+    return (sum(lat for lat, lng in rows) / len(rows),
+            sum(lng for lat, lng in rows) / len(rows))
+
+
+# markers for one map tile, cached: parks at high zoom levels, otherwise a
+# cluster for each grid cell holding more than one park
+def tile_markers(zoom, x, y):
+    key = tile_cache_key(zoom, x, y)
+    markers = cache.get(key)
+    if markers is not None:
+        return markers
+
+    south, west, north, east = tile_bounds(zoom, x, y)
+    rows = Courts.objects.filter(latitude__gte=south, latitude__lt=north,
+                                 longitude__gte=west, longitude__lt=east) \
+        .values_list("park_id", "park__name", "latitude", "longitude")
+
+    # one position per park, from its first court
+    parks = {}
+    for park_id, name, latitude, longitude in rows:
+        parks.setdefault(park_id, (name, latitude, longitude))
+
+    markers = {"clusters": [], "parks": []}
+    if zoom >= INDIVIDUAL_ZOOM:
+        cells = {park_id: [park_id] for park_id in parks}
+    else:
+        cells = {}
+        for park_id, (name, latitude, longitude) in parks.items():
+            tile_x, tile_y = project(latitude, longitude, zoom)
+            cell = (min(CLUSTER_GRID - 1, int((tile_x - x) * CLUSTER_GRID)),
+                    min(CLUSTER_GRID - 1, int((tile_y - y) * CLUSTER_GRID)))
+            cells.setdefault(cell, []).append(park_id)
+
+    for park_ids in cells.values():
+        if len(park_ids) == 1:
+            name, latitude, longitude = parks[park_ids[0]]
+            markers["parks"].append({"id": park_ids[0], "name": name,
+                                     "latitude": latitude, "longitude": longitude})
+        else:
+            markers["clusters"].append({
+                "count": len(park_ids),
+                "latitude": sum(parks[i][1] for i in park_ids) / len(park_ids),
+                "longitude": sum(parks[i][2] for i in park_ids) / len(park_ids)})
+
+    cache.set(key, markers, TILE_TIMEOUT)
+    return markers
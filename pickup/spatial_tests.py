@@ -0,0 +1,197 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+from pickup.models import Player, Parks, Courts
+from pickup.geohash import encode_geohash, haversine_distances
+from pickup.spatial import nearest_parks
+from pickup.tiles import tile_for, tile_bounds, tiles_covering, count_tiles
+from django.core.cache import cache
+from unittest.mock import patch
+import random
+
+
+# tests for the geohash encoding and distances, independent of the database
+class GeohashTests(TestCase):
+
+    def test_encode_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(encode_geohash(38.8977, -77.0365, 5), "dqcjq")
+
+    def test_haversine(self):
+        # Baltimore to Washington is about 56 km
+        distance = haversine_distances(39.2904, -76.6122, [(38.9072, -77.0369)])[0]
+        self.assertAlmostEqual(distance, 56, delta=1)
+
+
+# tests for finding the parks nearest to a point
+class NearestParksTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='Testuser')
+
+    def add_park(self, name, latitude, longitude, zipcode='12345'):
+        park = Parks(player=self.user, name=name, street='Street', city='City',
+                     state='MD', zipcode=zipcode)
+        park.save()
+        Courts(name=name, latitude=latitude, longitude=longitude, park=park).save()
+        return park
+
+    # test that the geohash is kept in sync when a court is saved
+    def test_geohash_saved(self):
+        park = self.add_park("Inner Harbor", 39.2858, -76.6131)
+        court = Courts.objects.get(park=park)
+        self.assertEqual(court.geohash, encode_geohash(39.2858, -76.6131))
+
+        court.latitude = 38.9
+        court.save(update_fields=["latitude"])
+        self.assertEqual(Courts.objects.get(park=park).geohash,
+                         encode_geohash(38.9, -76.6131))
+
+    # test that results match a brute force search over every park
+    def test_matches_brute_force(self):
+        rng = random.Random(447)
+        points = {}
+        for i in range(300):
+            # mostly clustered around Baltimore, with a few far away
+            if i % 10:
+                point = (39.29 + rng.uniform(-0.3, 0.3), -76.61 + rng.uniform(-0.3, 0.3))
+            else:
+                point = (rng.uniform(25, 48), rng.uniform(-124, -67))
+            points[self.add_park("Park %d" % i, *point).id] = point
+
+        for latitude, longitude in [(39.29, -76.61), (39.5, -76.3), (45.0, -100.0)]:
+            expected = sorted(points, key=lambda park_id: haversine_distances(
+                latitude, longitude, [points[park_id]])[0])[:5]
+            found = nearest_parks(latitude, longitude, 5)
+            self.assertEqual([park.id for park, distance in found], expected)
+
+    # test searching with fewer parks than requested
+    def test_few_parks(self):
+        self.add_park("Inner Harbor", 39.2858, -76.6131)
+        found = nearest_parks(0, 0, 5)
+        self.assertEqual([park.name for park, distance in found], ["Inner Harbor"])
+
+    # test the nearby parks page by zipcode
+    def test_nearby_page(self):
+        self.add_park("Inner Harbor", 39.2858, -76.6131, '21202')
+        self.add_park("Patterson Park", 39.2905, -76.5800, '21224')
+        self.add_park("Central Park", 40.7829, -73.9654, '10024')
+
+        Player.objects.create_user("Chevy", "corvette@c6.org", "fa5test")
+        self.client.post(reverse("login"), {"username": "Chevy", "password": "fa5test"})
+
+        response = self.client.get(reverse("nearby_parks"), {"zipcode": "21202"})
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertLess(content.index("Inner Harbor"), content.index("Patterson Park"))
+        self.assertLess(content.index("Patterson Park"), content.index("Central Park"))
+
+        response = self.client.get(reverse("nearby_parks"), {"latitude": "x", "longitude": "1"})
+        self.assertContains(response, "Invalid location")
+
+
+# tests for the clustered markers of the parks map
+class MapMarkerTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='Testuser')
+        Player.objects.create_user("Chevy", "corvette@c6.org", "fa5test")
+        self.client.post(reverse("login"), {"username": "Chevy", "password": "fa5test"})
+
+    def add_park(self, name, latitude, longitude):
+        park = Parks(player=self.user, name=name, street='Street', city='City',
+                     state='MD', zipcode='12345')
+        park.save()
+        Courts(name=name, latitude=latitude, longitude=longitude, park=park).save()
+        return park
+
+    def get_markers(self, zoom, south=38, west=-78, north=40, east=-76):
+        response = self.client.get(reverse("park_markers"), {
+            "south": south, "west": west, "north": north, "east": east, "zoom": zoom})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_tiles(self):
+        self.assertEqual(tile_for(0, 0, 0), (0, 0))
+        self.assertEqual(tile_for(39.29, -76.61, 1), (0, 0))
+        self.assertEqual(tile_for(-10, 10, 1), (1, 1))
+        south, west, north, east = tile_bounds(1, 0, 0)
+        self.assertAlmostEqual(south, 0)
+        self.assertAlmostEqual(east, 0)
+        self.assertEqual(len(tiles_covering(-10, -10, 10, 10, 1)), 4)
+        self.assertEqual(count_tiles(-10, -10, 10, 10, 1), 4)
+        # a box crossing the antimeridian
+        self.assertEqual(len(tiles_covering(-10, 170, 10, -170, 3)), count_tiles(-10, 170, 10, -170, 3))
+        self.assertEqual(count_tiles(-90, -180, 90, 180, 20), 4 ** 20)
+
+    # test that nearby parks are clustered when zoomed out
+    def test_clusters_when_zoomed_out(self):
+        self.add_park("Inner Harbor", 39.2858, -76.6131)
+        self.add_park("Patterson Park", 39.2905, -76.5800)
+        self.add_park("Rock Creek", 38.9296, -77.0513)
+
+        markers = self.get_markers(5)
+        self.assertEqual(sum(c["count"] for c in markers["clusters"]) +
+                         len(markers["parks"]), 3)
+        self.assertTrue(markers["clusters"])
+
+    # test that parks are listed individually when zoomed in
+    def test_parks_when_zoomed_in(self):
+        self.add_park("Inner Harbor", 39.2858, -76.6131)
+        self.add_park("Patterson Park", 39.2905, -76.5800)
+
+        markers = self.get_markers(15, 39.28, -76.62, 39.30, -76.57)
+        self.assertEqual(markers["clusters"], [])
+        self.assertEqual(sorted(p["name"] for p in markers["parks"]),
+                         ["Inner Harbor", "Patterson Park"])
+
+    # test that cached tiles are dropped when a court is added
+    def test_tile_invalidated(self):
+        self.add_park("Inner Harbor", 39.2858, -76.6131)
+        self.assertEqual(len(self.get_markers(8)["parks"]), 1)
+
+        self.add_park("Rock Creek", 38.9296, -77.0513)
+        markers = self.get_markers(8)
+        self.assertEqual(sum(c["count"] for c in markers["clusters"]) +
+                         len(markers["parks"]), 2)
+
+        # a second request is served from the cache
+        with self.assertNumQueries(2):
+            self.get_markers(8)
+
+    # test that moving a court drops the tiles of its old location, and that
+    # courts deleted with their park drop theirs
+    def test_moved_and_deleted_invalidated(self):
+        park = self.add_park("Inner Harbor", 39.2858, -76.6131)
+        self.assertEqual(len(self.get_markers(14, 39.28, -76.62, 39.29, -76.61)["parks"]), 1)
+
+        court = Courts.objects.get(park=park)
+        court.latitude, court.longitude = 38.9296, -77.0513
+        court.save()
+        self.assertEqual(self.get_markers(14, 39.28, -76.62, 39.29, -76.61)["parks"], [])
+        self.assertEqual(len(self.get_markers(14, 38.92, -77.06, 38.93, -77.05)["parks"]), 1)
+
+        Parks.objects.filter(id=park.id).delete()
+        self.assertEqual(self.get_markers(14, 38.92, -77.06, 38.93, -77.05)["parks"], [])
+
+    # test that bad or oversized viewports are rejected
+    def test_bad_viewport(self):
+        response = self.client.get(reverse("park_markers"), {"zoom": 3})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("park_markers"), {
+            "south": -80, "west": -179, "north": 80, "east": 179, "zoom": 12})
+        self.assertEqual(response.status_code, 400)
+
+        # a whole world viewport at the highest zoom level is counted, never
+        # listed
+        with patch("pickup.views.tiles_covering") as listed:
+            response = self.client.get(reverse("park_markers"), {
+                "south": -85, "west": -180, "north": 85, "east": 180, "zoom": 20})
+        self.assertEqual(response.status_code, 400)
+        listed.assert_not_called()
+
+        for value in ("nan", "inf", "-inf"):
+            response = self.client.get(reverse("park_markers"), {
+                "south": value, "west": -77, "north": 39, "east": -76, "zoom": 10})
+            self.assertEqual(response.status_code, 400)
@@ -1,4 +1,5 @@
 from .models import Profile, Player, Parks, Schedule, EventSignup
+import datetime
 
 from pickup.navbar_tests import *
 
@@ -6,6 +7,25 @@ from pickup.account_tests import *
 from pickup.park_tests import *
 from pickup.messages_tests import *
 from pickup.schedule_test import *
+from pickup.realtime_tests import *
+from pickup.query_plan_tests import *
+from pickup.geocoding_tests import *
+from pickup.geocoding_client_tests import *
+from pickup.spatial_tests import *
+from pickup.import_tests import *
+from pickup.search_tests import *
+from pickup.slots_tests import *
+from pickup.matches_tests import *
+from pickup.signup_tests import *
+from pickup.series_tests import *
+from pickup.calendar_tests import *
+from pickup.week_tests import *
+from pickup.archive_tests import *
+from pickup.player_search_tests import *
+from pickup.profile_cache_tests import *
+from pickup.middleware_tests import *
+from pickup.query_budget_tests import *
+from pickup.benchmark_tests import *
 
 
 # Test cases to make sure that pages exist
@@ -66,7 +86,7 @@ class IndexPageTests(TestCase):
         park.save()
 
         match = Schedule(name="Justices Only Game", creator=player, park=park,
-                         date="2021-12-01", time=40)
+                         date="2099-12-01", time=40)
         match.save()
 
         signup = EventSignup(player=player, event=match)
@@ -79,7 +99,7 @@ class IndexPageTests(TestCase):
 
         # verify that the signup appears
         self.assertContains(response, "Justices Only Game")
-        self.assertContains(response, "Dec. 1, 2021 at 10:00 AM")
+        self.assertContains(response, "Dec. 1, 2099 at 10:00 AM")
         self.assertContains(response, "Supreme Court")
         self.assertContains(response, "1 First St NE")
         self.assertContains(response, "Washington, DC")
@@ -87,6 +107,40 @@ class IndexPageTests(TestCase):
         self.assertNotContains(response,
                             "You haven't signed up for any matches yet!")
 
+    # test that past signups are left off and the rest are paged through with
+    # the same number of queries however many there are
+    def test_upcoming_signups_paged(self):
+        player = Player.objects.create_user("Chief", "roberts@supremecourt.gov",
+                                            "Justice4Life")
+        self.client.post(reverse("login"), {"username": "Chief", "password": "Justice4Life"})
+
+        def add_signups(names, days):
+            for name in names:
+                park = Parks(player=player, name=name, street='1 First St NE',
+                             city='Washington', state='DC', zipcode='20543')
+                park.save()
+                match = Schedule(name=name + " Game", creator=player, park=park, time=40,
+                                 date=datetime.date.today() + datetime.timedelta(days=days))
+                match.save()
+                EventSignup(player=player, event=match).save()
+
+        add_signups(["Old"], -1)
+        add_signups(["First"], 1)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('index'))
+        self.assertNotContains(response, "Old Game")
+        self.assertContains(response, "First Game")
+
+        add_signups(["Park %d" % i for i in range(12)], 2)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('index'))
+        self.assertEqual(len(response.context["signups"]), 10)
+        self.assertContains(response, "More signups")
+
+        response = self.client.get(reverse('index'), {"after": response.context["next"]})
+        self.assertEqual(len(response.context["signups"]), 3)
+        self.assertNotContains(response, "More signups")
+
 
 class DatabaseTests(TestCase):
 
@@ -0,0 +1,88 @@
+# File: tiles.py
+#
+# Web mercator map tiles, as used by Google Maps, for clustering park markers
+# server side. Each tile's markers are cached, and saving or deleting a court
+# drops the cached tiles it falls in.
+import math
+
+from django.core.cache import cache
+
+# zoom levels served, and the first one that shows parks instead of clusters
+MAX_ZOOM = 20
+INDIVIDUAL_ZOOM = 14
+
+# markers are clustered on a CLUSTER_GRID x CLUSTER_GRID grid inside each tile
+CLUSTER_GRID = 4
+
+# latitude limit of the mercator projection
+MAX_LATITUDE = 85.0511287798
+
+TILE_TIMEOUT = 60 * 10
+
+
+# position of a point in tile units at a zoom level, (x, y) as floats
+def project(latitude, longitude, zoom):
+    latitude = min(MAX_LATITUDE, max(-MAX_LATITUDE, latitude))
+    scale = 2 ** zoom
+    x = (longitude + 180.0) / 360.0 * scale
+    sin_lat = math.sin(math.radians(latitude))
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+# the tile a point falls in, (x, y)
+def tile_for(latitude, longitude, zoom):
+    x, y = project(latitude, longitude, zoom)
+    last = 2 ** zoom - 1
+    return min(last, max(0, int(x))), min(last, max(0, int(y)))
+
+
+# latitude/longitude bounds of a tile as (south, west, north, east)
+def tile_bounds(zoom, x, y):
+    scale = 2 ** zoom
+
+    def latitude(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / scale))))
+
+    return (latitude(y + 1), x / scale * 360.0 - 180.0,
+            latitude(y), (x + 1) / scale * 360.0 - 180.0)
+
+
+# the columns and rows of the tiles covering a bounding box, as a list of
+# column ranges and a row range, so they can be counted without listing them
+def tile_ranges(south, west, north, east, zoom):
+    left, top = tile_for(north, west, zoom)
+    right, bottom = tile_for(south, east, zoom)
+
+    # a box crossing the antimeridian wraps around to the first column
+    columns = [range(left, right + 1)]
+    if west > east:
+        columns = [range(left, 2 ** zoom), range(0, right + 1)]
+    return columns, range(top, bottom + 1)
+
+
+# number of tiles covering a bounding box
+def count_tiles(south, west, north, east, zoom):
+    columns, rows = tile_ranges(south, west, north, east, zoom)
+    return sum(len(part) for part in columns) * len(rows)
+
+
+# the tiles covering a bounding box, as a list of (x, y)
+def tiles_covering(south, west, north, east, zoom):
+    columns, rows = tile_ranges(south, west, north, east, zoom)
+    return [(x, y) for part in columns for x in part for y in rows]
+
+
+def tile_cache_key(zoom, x, y):
+    return "map-tile:{}:{}:{}".format(zoom, x, y)
+
+
+# cache keys of every tile containing a point
+def tile_keys(latitude, longitude):
+    return [tile_cache_key(zoom, *tile_for(latitude, longitude, zoom))
+            for zoom in range(MAX_ZOOM + 1)]
+
+
+# drop the cached markers of every tile containing a point
+def invalidate_tiles(latitude, longitude):
+    cache.delete_many(tile_keys(latitude, longitude))
@@ -0,0 +1,54 @@
+# File: trigrams.py
+#
+# Splits park names, cities and zipcodes into the short substrings ("grams")
+# stored in the park search index. Words are cut into overlapping three
+# character grams, so a search still matches with a typo or two, plus a
+# marker for the start of each word so prefixes rank first. Names also keep
+# their one and two character grams for very short searches.
+import re
+
+GRAM_LENGTH = 3
+
+# prefix of the grams marking the start of a word
+WORD_START = " "
+
+
+# lowercase words of a piece of text, ignoring punctuation
+def split_words(text):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+# the grams of a single word: its trigrams, or the word itself if shorter,
+# and the start of word marker
+def word_grams(word):
+    grams = {word[i:i + GRAM_LENGTH] for i in range(max(1, len(word) - GRAM_LENGTH + 1))}
+    grams.add(WORD_START + word[:GRAM_LENGTH - 1])
+    return grams
+
+
+# the one and two character grams of a word, only stored for park names
+def short_grams(word):
+    return {word[i:i + size] for size in (1, 2) for i in range(len(word) - size + 1)}
+
+
+# the grams stored for a piece of text
+def text_grams(text, short=False):
+    grams = set()
+    for word in split_words(text):
+        grams |= word_grams(word)
+        if short:
+            grams |= short_grams(word)
+    return grams
+
+
+# the grams of a search as (grams that must mostly match, start of word
+# grams that only improve the ranking)
+def query_grams(text):
+    required, starts = set(), set()
+    for word in split_words(text):
+        grams = word_grams(word)
+        start = WORD_START + word[:GRAM_LENGTH - 1]
+        grams.discard(start)
+        required |= grams
+        starts.add(start)
+    return required, starts
@@ -10,14 +10,27 @@ urlpatterns = [
     path('profile/', views.view_profile, name='view_profile'),
     path('player/<str:username>/', views.view_player, name='view_player'),
     path('searchplayers/', views.search_players, name='search_players'),
+    path('searchplayers/complete/', views.complete_player, name='complete_player'),
     path('changepassword/', views.change_password, name='change_password'),
     path('add_park/', views.add_park, name='Add Park'),
     path('profile/edit', views.edit_profile, name='edit_profile'),
     path("parks/", views.view_park, name='parks'),
+    path("parks/near/", views.nearby_parks, name='nearby_parks'),
+    path("parks/map/", views.parks_map, name='parks_map'),
+    path("parks/map/markers/", views.park_markers, name='park_markers'),
+    path("parks/slots/", views.park_free_slots, name='park_free_slots'),
+    path("matches/", views.upcoming_matches, name='upcoming_matches'),
+    path("week/", views.my_week, name='my_week'),
     path("parks/<int:parkid>/", views.event_signup, name='event_signup'),
+    path("parks/<int:parkid>/series/", views.create_series, name='create_series'),
+    path("series/<int:seriesid>/<str:date>/join/", views.join_occurrence, name='join_occurrence'),
+    path("parks/<int:parkid>/calendar.ics", views.park_calendar, name='park_calendar'),
+    path("calendar/<str:token>.ics", views.player_calendar, name='player_calendar'),
+    path("parks/<int:parkid>/address/", views.accept_park_address, name='accept_park_address'),
     path("favorite/<int:add>/<int:parkid>/", views.favorite_park, name='favorite_park'),
     path("parks/<int:parkid>/<int:add>/<int:eventid>/", views.join_event, name='join_event'),
     path('messages/', views.message_user, name="messages"),
     path('messages/<str:username>', views.message_conversation, name="messages_conversation"),
+    path('messages/<str:username>/history', views.message_history, name="messages_history"),
     path('newMessage/', views.new_message, name='new_message'),
 ]
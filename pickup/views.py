@@ -1,19 +1,39 @@
 from django.shortcuts import render
 from django.urls import reverse
+from django.core import signing
 from django.core.validators import validate_email
+from django.db import transaction
 from django.db.utils import IntegrityError
-from django.db.models import Q
+from django.db.models import Count, Exists, Max, OuterRef, Q
 from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate
-from django.http import HttpResponse, HttpResponseRedirect, Http404
+from django.http import HttpResponse, HttpResponseRedirect, Http404, \
+    HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+import datetime
+import heapq
+import math
 import os
-import requests
 
 # Import models and forms
 from .forms import ParkForm, RegistrationForm, ProfileForm, ScheduleForm, \
-    ChangePasswordForm, SearchForm, SendMessage
-from .models import Profile, Player, Parks, Schedule, FavoriteParks, EventSignup, Messages
+    ChangePasswordForm, SearchForm, SendMessage, MatchFeedForm, MatchSeriesForm
+from .ical import calendar_lines, feed_etag
+from .geocoding import format_address, get_geocoder, queue_geocode, split_suggestion
+from .profiles import get_profile
+from .search import cached_completions, complete_players, search_parks
+from .series import SERIES_WINDOW_DAYS, add_series_slots, match_key, occurrences, running_series
+from .slots import SLOT_LABELS, SLOTS_PER_DAY, free_slots
+from .spatial import locate_zipcode, nearest_parks, tile_markers
+from .tiles import MAX_ZOOM, count_tiles, tiles_covering
+from .models import Profile, Player, Parks, Schedule, FavoriteParks, EventSignup, Messages, \
+    Conversation, ParkAvailability, MatchSeries, PlayerInterval, OverlapError
+
+
+# number of signups shown on each page of the home page
+HOME_SIGNUPS = 10
 
 
 # view for index page if not logged in, home page if logged in
@@ -22,17 +42,22 @@ def index(request):
     if not request.user.is_authenticated:
         return render(request, "pickup/index.html")
 
-    # logged in: home page - get signups
-    signups = EventSignup.objects.filter(player_id=request.user)
-    event_ids = signups.values('event_id')
-    matches = Schedule.objects.filter(id__in=event_ids).order_by('date')
-
-    times = [match.get_time_str() for match in matches]
-    signups = [(matches[i], times[i]) for i in range(len(matches))]
+    # logged in: home page - get a page of the upcoming matches the player
+    # signed up for, with their parks
+    after = None
+    if "after" in request.GET.keys():
+        after = decode_match_cursor(request.GET["after"])
+        if after is None:
+            return HttpResponseBadRequest("Invalid cursor")
+    matches = Schedule.objects.filter(eventsignup__player=request.user,
+                                      date__gte=datetime.date.today()).select_related("park")
+    matches, next_cursor = get_matches_page(matches, after, HOME_SIGNUPS)
+    signups = [(match, SLOT_LABELS[match.time]) for match in matches]
 
     # display the home page
     context = {"username": request.user.username,
-               "signups": signups, }
+               "signups": signups, "next": next_cursor,
+               "calendar_token": calendar_token(request.user.id)}
     return render(request, "pickup/home.html", context)
 
 
@@ -85,7 +110,7 @@ def register(request):
         return render(request, 'pickup/register.html', context)
 
     # log the user in and send them to the profile page
-    login(request, new_player)
+    login(request, new_player, backend="pickup.backends.PlayerBackend")
     return HttpResponseRedirect(reverse('edit_profile'))
 
 
@@ -134,7 +159,7 @@ def change_password(request):
     # update the user's password
     request.user.set_password(input_data["new_password"])
     request.user.save()
-    login(request, request.user)
+    login(request, request.user, backend="pickup.backends.PlayerBackend")
     return HttpResponseRedirect(reverse('view_profile'))
 
 
@@ -150,52 +175,19 @@ def view_player(request, username):
     # check for viewing own profile
     is_self = request.user.username == username
 
-    # get the user's information
-    try:
-        user = Player.objects.get(username=username)
-    except Player.DoesNotExist:
+    # get the user's details, from the cache unless they changed since
+    version = Player.objects.filter(username=username) \
+        .values_list("profile_version", flat=True).first()
+    if version is None:
         raise Http404
+    context = dict(get_profile(username, version, lambda name: Player.objects.get(username=name)))
 
-    # get the user's actual full name
-    if user.first_name != "" and user.last_name != "":
-        full_name = user.first_name + " " + user.last_name
-    elif user.first_name != "" or user.last_name != "":
-        full_name = user.first_name + user.last_name
-    else:
-        full_name = "Not provided"
+    context["is_self"] = is_self
+    return render(request, 'pickup/profile.html', context)
 
-    # get the user's age
-    age = user.get_age()
-    if age is None:
-        age = "Not provided"
 
-    # get the user's gender
-    if user.gender is not None:
-        gender = Player.genders[user.gender][1]
-    else:
-        gender = "Not provided"
-
-    # get the user's height
-    if user.height is not None:
-        height = str(user.height) + " in"
-    else:
-        height = "Not provided"
-
-    # get the user's weight
-    if user.weight is not None:
-        weight = str(user.weight) + " lbs"
-    else:
-        weight = "Not provided"
-
-    context = {"username": username,
-               "full_name": full_name,
-               "age": age,
-               "gender": gender,
-               "height": height,
-               "weight": weight,
-               "is_self": is_self,
-               "is_public": user.is_public, }
-    return render(request, 'pickup/profile.html', context)
+# number of players listed for a search
+SEARCH_RESULTS = 50
 
 
 # view for page to search for player profiles
@@ -210,15 +202,22 @@ def search_players(request):
     input_form.is_valid()
     search_text = input_form.cleaned_data["search_text"]
 
-    # get the list of players
-    players = Player.objects.filter(username__contains=search_text)
+    # get the players whose username or name starts with the search
+    players = complete_players(search_text, SEARCH_RESULTS, public_only=False)
     context = {"players": players,
                "search_input": search_text,
-               "no_results": list(players) == [],
+               "no_results": not players,
                "user": request.user, }
     return render(request, 'pickup/search_players.html', context)
 
 
+# view returning the public players whose username or name starts with what
+# has been typed so far, as JSON
+@login_required(login_url="login")
+def complete_player(request):
+    return JsonResponse({"players": cached_completions(request.GET.get("q", ""))})
+
+
 def profile_list(request):
     profileList = Profile.objects.all()
     output = 'Name \t Weight \t Height \n'
@@ -233,7 +232,7 @@ def profile_list(request):
 def edit_profile(request):
     # get the user's information to prefill
     username = request.user.username
-    user = Player.objects.get(username=username)
+    user = request.player
 
     # get gender options
     genders = [("", "<Select>")] + Player.genders
@@ -302,72 +301,31 @@ def add_park(request):
         if form.is_valid():
             input_data = form.cleaned_data
             # is valid: add the parks to the parks database
+            formatted_address = format_address(input_data['street'], input_data['city'],
+                                               input_data['state'], input_data['zipcode']) + ", USA"
 
-            # Sets up the API using the env variable apiKey
-            api_key = os.environ.get('apiKey')
-            formatted_address = input_data['street'] + ", " + input_data['city'] + ", " + input_data['state'] + " " + \
-                                input_data['zipcode'] + ", USA"
-
-            # Formats the address to better works with the maps API
-            geocode_url = "https://maps.googleapis.com/maps/api/geocode/json?address={}".format(formatted_address)
-            if api_key is not None:
-                geocode_url = geocode_url + "&key={}".format(api_key)
-            
-                # requests geocoding results from google maps API
-                results = requests.get(geocode_url)
-                # Results will be in JSON format - convert to dict using requests functionality
-                results = results.json()
-    
-                # converts the results into a usable array
-                api_formatted_address = results['results'][0]['formatted_address']
-                new_input_data = api_formatted_address.split(", ")
-                if len(new_input_data) > 4:
-                    new_input_data = new_input_data[1:]
-                    api_formatted_address = ", ".join(new_input_data)
-    
-                # input validation
-                if len(new_input_data) < 3:
-                    context = {
-                        "error": "Error: The fields need to belong to a valid address",
-                        "form": form,
-                        'apiKey': os.environ.get('apiKey'),
-                        'formatted_address': formatted_address
-                    }
-    
-                    return render(request, reverse('Add Park'), context)
-    
-                # if google maps didn't find the exact address user looking for
-                if api_formatted_address != formatted_address:
-                    form = ParkForm({'name': input_data['name'], 'street': new_input_data[0],
-                                    'city': new_input_data[1], 'state': new_input_data[2][0:2],
-                                    'zipcode': new_input_data[2][3:9]})
-    
-                    # shows the page again
-                    context = {
-                        "form": form,
-                        "error": "Google Maps found the following match for an address! Is this the correct address?: \n {}".format(
-                            api_formatted_address),
-                        'apiKey': os.environ.get('apiKey'),
-                        'formatted_address': api_formatted_address
-                    }
-    
-                    return render(request, 'pickup/add_park.html', context)
-
-            # attempts to save the player in the database
+            # attempts to save the park in the database, the address is checked
+            # with google maps in the background once it is saved
             try:
                 current_player = request.user
 
                 new_park = Parks(player=current_player, name=input_data['name'],
                                  street=input_data['street'], city=input_data['city'],
-                                 state=input_data['state'], zipcode=input_data['zipcode'])
+                                 state=input_data['state'], zipcode=input_data['zipcode'],
+                                 geocode_status=Parks.PENDING)
                 new_park.save()
+                transaction.on_commit(lambda: queue_geocode(new_park.id))
 
             except IntegrityError:
-
-                return render(request, reverse('Add Park'))
+                context = {
+                    "error": "Error: This park has already been added!",
+                    "form": form,
+                    'apiKey': os.environ.get('apiKey'),
+                }
+                return render(request, 'pickup/add_park.html', context)
 
             context = {
-                "error": "Park has been added!",
+                "error": "Park has been added! Its address will be checked with Google Maps shortly.",
                 "form": ParkForm(),
                 'apiKey': os.environ.get('apiKey'),
                 'formatted_address' : formatted_address
@@ -381,29 +339,324 @@ def add_park(request):
     return render(request, 'pickup/add_park.html', {'form': form, 'apiKey': os.environ.get('apiKey')})
 
 
+# view for accepting the address google maps found for a park
 @login_required(login_url="login")
-def view_park(request):
-    # check for visiting for first time or submitting
-    favorites = FavoriteParks.objects.filter(player=request.user).values("park_id")
-    favoriteParks = Parks.objects.filter(id__in=favorites)
+def accept_park_address(request, parkid):
+    try:
+        park = Parks.objects.get(id=parkid, player=request.user,
+                                 geocode_status=Parks.MISMATCH)
+    except Parks.DoesNotExist:
+        raise Http404
 
+    if request.method == 'POST':
+        address = split_suggestion(park.suggested_address)
+        park.street = address['street']
+        park.city = address['city']
+        park.state = address['state']
+        park.zipcode = address['zipcode']
+        park.geocode_status = Parks.VERIFIED
+        park.suggested_address = ""
+        try:
+            with transaction.atomic():
+                park.save()
+        except IntegrityError:
+            return render(request, 'pickup/schedule_time.html', {
+                'form': ScheduleForm(), 'park': Parks.objects.get(id=parkid),
+                'error': "Error: A park already exists at this address."})
+
+    return HttpResponseRedirect(reverse('event_signup', kwargs={'parkid': parkid}))
+
+
+# number of parks shown on each page of the parks list
+PARKS_PAGE_SIZE = 25
+
+
+# encode the position of a park in the parks list as a cursor for the next page
+def encode_park_cursor(park):
+    return "{}_{}_{}".format(int(park.is_favorite), park.rank, park.id)
+
+
+# decode a cursor into an (is_favorite, rank, id) tuple, None if it is malformed
+def decode_park_cursor(cursor):
+    try:
+        is_favorite, rank, park_id = cursor.split("_")
+        return bool(int(is_favorite)), int(rank), int(park_id)
+    except ValueError:
+        return None
+
+
+# get one page of parks, each annotated with whether the player has favorited
+# it: the player's favorites, or the parks matching a search with favorites
+# first and then by relevance. Starts just after the given (is_favorite, rank,
+# id) position, and also returns the cursor of the next page, None if it is
+# the last one.
+def get_parks_page(player, search_text=None, after=None, limit=None):
+    if limit is None:
+        limit = PARKS_PAGE_SIZE
+
+    favorites = FavoriteParks.objects.filter(player=player)
+    if search_text is None:
+        parks = search_parks("").filter(id__in=favorites.values("park_id"))
+    else:
+        parks = search_parks(search_text)
+    parks = parks.annotate(is_favorite=Exists(favorites.filter(park=OuterRef("pk"))))
+
+    if after is not None:
+        is_favorite, rank, park_id = after
+        parks = parks.filter(Q(is_favorite__lt=is_favorite) |
+                             Q(is_favorite=is_favorite, rank__lt=rank) |
+                             Q(is_favorite=is_favorite, rank=rank, id__gt=park_id))
+
+    # fetch one extra row to find out whether another page exists
+    page = list(parks.order_by('-is_favorite', '-rank', 'id')[:limit + 1])
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_park_cursor(page[-1])
+    return page, next_cursor
+
+
+@login_required(login_url="login")
+def view_park(request):
     # check for visiting for first time or searching
-    if "search_text" not in request.GET.keys():
-        return render(request, 'pickup/parks_list.html', {'favparks': favoriteParks})
+    search_text = None
+    if "search_text" in request.GET.keys():
+        input_form = SearchForm(request.GET)
+        input_form.is_valid()
+        search_text = input_form.cleaned_data["search_text"]
 
-    # get validated data
-    input_form = SearchForm(request.GET)
-    input_form.is_valid()
-    search_text = input_form.cleaned_data["search_text"]
+    after = None
+    if "after" in request.GET.keys():
+        after = decode_park_cursor(request.GET["after"])
+        if after is None:
+            return HttpResponseBadRequest("Invalid cursor")
 
-    # get the list of players
-    favparks = Parks.objects.filter(name__contains=search_text, id__in=favorites)
-    nofavparks = Parks.objects.filter(name__contains=search_text).exclude(id__in=favorites)
-    context = {"favsearchparks": favparks, "nofavsearchparks": nofavparks,
-               "search_input": search_text, 'favparks': favoriteParks}
+    parks, next_cursor = get_parks_page(request.user, search_text, after)
+    context = {"parks": parks, "next": next_cursor,
+               "searched": search_text is not None, "search_input": search_text or ""}
     return render(request, 'pickup/parks_list.html', context)
 
 
+# number of parks shown by the nearby parks search
+NEARBY_PARKS = 10
+
+
+# find the point a request asks to search around, from its latitude and
+# longitude or its zipcode; returns (point, error), both None if neither was
+# given
+def locate_request(params):
+    if "latitude" in params.keys() and "longitude" in params.keys():
+        try:
+            return (float(params["latitude"]), float(params["longitude"])), None
+        except ValueError:
+            return None, "Error: Invalid location."
+
+    zipcode = params.get("zipcode", "")
+    if zipcode == "":
+        return None, None
+    point = locate_zipcode(zipcode)
+    if point is None:
+        result = None
+        geocoder = get_geocoder()
+        if geocoder.available:
+            result = geocoder.geocode(zipcode + ", USA")
+        if result and result.get("latitude") is not None:
+            point = (result["latitude"], result["longitude"])
+        else:
+            return None, "Error: Could not find that zipcode."
+    return point, None
+
+
+# view for page to find the parks nearest to a location or zipcode
+@login_required(login_url="login")
+def nearby_parks(request):
+    context = {"zipcode": request.GET.get("zipcode", "")}
+
+    # find the point to search around
+    point, context["error"] = locate_request(request.GET)
+    if point is not None:
+        context["results"] = nearest_parks(point[0], point[1], NEARBY_PARKS)
+        context["searched"] = True
+
+    return render(request, 'pickup/nearby_parks.html', context)
+
+
+# largest number of tiles a single markers request may cover
+MAX_MARKER_TILES = 64
+
+
+# view for the map of all parks
+@login_required(login_url="login")
+def parks_map(request):
+    return render(request, 'pickup/parks_map.html', {'apiKey': os.environ.get('apiKey')})
+
+
+# view returning the clustered park markers inside a map viewport as JSON
+@login_required(login_url="login")
+def park_markers(request):
+    try:
+        south = float(request.GET["south"])
+        west = float(request.GET["west"])
+        north = float(request.GET["north"])
+        east = float(request.GET["east"])
+        zoom = min(MAX_ZOOM, max(0, int(request.GET["zoom"])))
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest("Expected south, west, north, east and zoom")
+    if not all(math.isfinite(value) for value in (south, west, north, east)):
+        return HttpResponseBadRequest("Expected south, west, north, east and zoom")
+
+    # count the tiles before listing them, a large viewport at a high zoom
+    # level covers billions
+    if count_tiles(south, west, north, east, zoom) > MAX_MARKER_TILES:
+        return HttpResponseBadRequest("Viewport too large for this zoom level")
+    tiles = tiles_covering(south, west, north, east, zoom)
+
+    markers = {"zoom": zoom, "clusters": [], "parks": []}
+    for x, y in tiles:
+        tile = tile_markers(zoom, x, y)
+        markers["clusters"] += tile["clusters"]
+        markers["parks"] += tile["parks"]
+    return JsonResponse(markers)
+
+
+# most parks and days a single free slots request may cover
+MAX_SLOT_PARKS = 50
+MAX_SLOT_DAYS = 31
+
+
+# view returning the free time slots of one or more parks over a range of
+# days as JSON, read from the parks' availability bitmaps in one query and
+# leaving out the slots of weekly matches
+@login_required(login_url="login")
+def park_free_slots(request):
+    try:
+        park_ids = [int(park_id) for park_id in request.GET["parks"].split(",")]
+        start = datetime.date.fromisoformat(request.GET.get("start", datetime.date.today().isoformat()))
+        days = int(request.GET.get("days", 7))
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest("Expected parks, and optionally start and days")
+    if not 0 < len(park_ids) <= MAX_SLOT_PARKS or not 0 < days <= MAX_SLOT_DAYS:
+        return HttpResponseBadRequest("Too many parks or days")
+
+    booked = add_series_slots(ParkAvailability.booked_slots(park_ids, start, days), start, days)
+    return JsonResponse({
+        "start": start.isoformat(), "days": days,
+        "parks": {park_id: {date.isoformat(): free_slots(bits) for date, bits in dates.items()}
+                  for park_id, dates in booked.items()}})
+
+
+# number of matches shown on each page of the upcoming matches feed
+MATCHES_PAGE_SIZE = 25
+
+
+# encode the position of a match in the feed as a cursor for the next page
+def encode_match_cursor(match):
+    date, time, match_id = match_key(match)
+    return "{}_{}_{}".format(date.isoformat(), time, match_id)
+
+
+# decode a cursor into a (date, time, id) tuple, None if it is malformed
+def decode_match_cursor(cursor):
+    try:
+        date, time, match_id = cursor.split("_")
+        return datetime.date.fromisoformat(date), int(time), int(match_id)
+    except ValueError:
+        return None
+
+
+# get one page of matches in (date, time, id) order, starting just after the
+# given position; also returns the cursor of the next page, None if it is the
+# last one. Unsaved series occurrences, iterated in match_key order, are
+# merged in, reading only as many of them as the page can show.
+def get_matches_page(matches, after=None, limit=None, occurrences=()):
+    if limit is None:
+        limit = MATCHES_PAGE_SIZE
+
+    if after is not None:
+        date, time, match_id = after
+        matches = matches.filter(Q(date__gt=date) | Q(date=date, time__gt=time) |
+                                 Q(date=date, time=time, id__gt=match_id))
+
+    # fetch one extra row to find out whether another page exists
+    page = list(matches.order_by('date', 'time', 'id')[:limit + 1])
+    last = match_key(page[-1]) if len(page) > limit else None
+    merged = []
+    for occurrence in occurrences:
+        key = match_key(occurrence)
+        if after is not None and key <= after:
+            continue
+        # past the last stored match, an occurrence could only show up on a
+        # later page
+        if last is not None and key > last or len(merged) > limit:
+            break
+        merged.append(occurrence)
+    if merged:
+        page = sorted(page + merged, key=match_key)[:limit + 1]
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_match_cursor(page[-1])
+    return page, next_cursor
+
+
+# view for the feed of upcoming matches across all parks, the player's
+# favorite parks or the parks near a zipcode
+@login_required(login_url="login")
+def upcoming_matches(request):
+    form = MatchFeedForm(request.GET)
+    context = {"form": form}
+    if not form.is_valid():
+        return render(request, 'pickup/upcoming_matches.html', context)
+    data = form.cleaned_data
+
+    # only matches from today on; weekly matches are listed for the next few
+    # weeks, later occurrences show up as the weeks go by
+    today = datetime.date.today()
+    start = max(data["start"] or today, today)
+    end = today + datetime.timedelta(days=SERIES_WINDOW_DAYS)
+    if data["end"] is not None:
+        end = min(end, data["end"])
+    matches = Schedule.objects.filter(date__gte=start).select_related("park")
+    series = running_series(start, end)
+    if data["end"] is not None:
+        matches = matches.filter(date__lte=data["end"])
+    if data["earliest"] is not None:
+        matches = matches.filter(time__gte=data["earliest"])
+        series = series.filter(time__gte=data["earliest"])
+    if data["latest"] is not None:
+        matches = matches.filter(time__lte=data["latest"])
+        series = series.filter(time__lte=data["latest"])
+
+    if data["scope"] == MatchFeedForm.FAVORITES:
+        favorites = FavoriteParks.objects.filter(player=request.user).values("park_id")
+        matches = matches.filter(park_id__in=favorites)
+        series = series.filter(park_id__in=favorites)
+    elif data["scope"] == MatchFeedForm.NEARBY:
+        point, context["error"] = locate_request(request.GET)
+        if point is None:
+            context["error"] = context["error"] or "Error: Enter a zipcode to find nearby matches."
+            return render(request, 'pickup/upcoming_matches.html', context)
+        nearby = [park.id for park, distance in nearest_parks(point[0], point[1], NEARBY_PARKS)]
+        matches = matches.filter(park_id__in=nearby)
+        series = series.filter(park_id__in=nearby)
+
+    after = None
+    if "after" in request.GET.keys():
+        after = decode_match_cursor(request.GET["after"])
+        if after is None:
+            return HttpResponseBadRequest("Invalid cursor")
+        start = max(start, after[0])
+
+    context["matches"], next_cursor = get_matches_page(matches, after,
+                                                       occurrences=occurrences(series, start, end))
+    if next_cursor is not None:
+        params = request.GET.copy()
+        params["after"] = next_cursor
+        context["next_query"] = params.urlencode()
+    return render(request, 'pickup/upcoming_matches.html', context)
+
+
 @login_required(login_url="login")
 def event_signup(request, parkid):
     current_player = request.user
@@ -413,23 +666,31 @@ def event_signup(request, parkid):
 
     # matches = Schedule.objects.filter(park=parkid).order_by('date')
 
+    # only matches from today on, past ones are of no use for signing up
+    today = datetime.date.today()
     myevents = EventSignup.objects.filter(player_id=current_player).values('event_id')
-    mymatches = Schedule.objects.filter(park=parkid, id__in=myevents).order_by('date')
-    othermatches = Schedule.objects.filter(park=parkid).exclude(id__in=myevents).order_by('date')
+    upcoming = Schedule.objects.filter(park=parkid, date__gte=today)
+    mymatches = upcoming.filter(id__in=myevents).order_by('date', 'time')
+    othermatches = upcoming.exclude(id__in=myevents).order_by('date', 'time')
+    # the coming occurrences of the park's weekly matches
+    window_end = today + datetime.timedelta(days=SERIES_WINDOW_DAYS)
+    weekly = occurrences(running_series(today, window_end).filter(park=parkid), today, window_end)
     if park:
         if request.method != 'POST':
             form = ScheduleForm()
 
             return render(request, 'pickup/schedule_time.html', {'form': form, 'park': park,
-                                                                 'mymatches': mymatches, 'othermatches': othermatches})
+                                                                 'mymatches': mymatches, 'othermatches': othermatches,
+                                                                 'weekly': list(weekly)})
 
-        form = ScheduleForm(request.POST)
+        form = ScheduleForm(request.POST, park=park)
 
         if not form.is_valid():
             context = {'form': form,
                        'park': park,
                        'error': form.errors,
-                       'mymatches': mymatches, 'othermatches': othermatches}
+                       'mymatches': mymatches, 'othermatches': othermatches,
+                       'weekly': list(weekly)}
             return render(request, 'pickup/schedule_time.html', context)
 
         input_data = form.cleaned_data
@@ -437,7 +698,8 @@ def event_signup(request, parkid):
         # Save the new schedule
 
         new_match = Schedule(creator=current_player, name=input_data['name'], park=park, time=input_data['time'],
-                             date=input_data['date'])
+                             date=input_data['date'], capacity=input_data['capacity'],
+                             duration=input_data['duration'])
         try:
             new_match.save()
         except IntegrityError:
@@ -447,6 +709,7 @@ def event_signup(request, parkid):
         context = {'form': form,
                    'park': park,
                    'mymatches': mymatches, 'othermatches': othermatches,
+                   'weekly': list(weekly),
                    'error': error}
         return render(request, 'pickup/schedule_time.html', context)
 
@@ -454,6 +717,29 @@ def event_signup(request, parkid):
         raise Http404
 
 
+# view for creating a match held every week at a park
+@login_required(login_url="login")
+def create_series(request, parkid):
+    try:
+        park = Parks.objects.get(id=parkid)
+    except Parks.DoesNotExist:
+        raise Http404
+
+    if request.method != 'POST':
+        return render(request, 'pickup/series_form.html', {'form': MatchSeriesForm(), 'park': park})
+
+    form = MatchSeriesForm(request.POST, park=park)
+    if not form.is_valid():
+        return render(request, 'pickup/series_form.html', {'form': form, 'park': park,
+                                                           'error': form.errors})
+
+    series = form.save(commit=False)
+    series.creator = request.user
+    series.park = park
+    series.save()
+    return HttpResponseRedirect(reverse('event_signup', kwargs={'parkid': parkid}))
+
+
 @login_required(login_url="login")
 def favorite_park(request, add, parkid):
     park = Parks.objects.get(id=parkid)
@@ -488,80 +774,218 @@ def favorite_park(request, add, parkid):
         raise Http404
 
 
+# Function for the error shown when a player tries to join a match that
+# overlaps another one they signed up for, from that match's interval
+def get_overlap_error(other):
+    return "Error: This match overlaps {} at {} on {} at {}, which you already joined!".format(
+        other.event.name, other.event.park.name, other.date, SLOT_LABELS[other.start])
+
+
+# Function for getting the players signed up for a match with a single query,
+# as (players with a spot, waitlisted players) in order of signing up
+def get_roster(event):
+    players, waitlist = [], []
+    for signup in EventSignup.objects.filter(event=event).select_related("player").order_by("id"):
+        if signup.status == EventSignup.JOINED:
+            players.append(signup.player)
+        else:
+            waitlist.append(signup.player)
+    return players, waitlist
+
+
 @login_required(login_url="login")
 def join_event(request, parkid, add, eventid):
-    event = Schedule.objects.get(id=eventid)
-    park = Parks.objects.get(id=parkid)
+    try:
+        event = Schedule.objects.get(id=eventid)
+        park = Parks.objects.get(id=parkid)
+    except (Schedule.DoesNotExist, Parks.DoesNotExist):
+        raise Http404
 
-    # Get the list of all people attending the event
-    event_player = EventSignup.objects.filter(event=eventid).values("player_id")
-    players = Player.objects.filter(id__in=event_player)
+    context = {'event': event, 'add': add, 'park': park}
 
-    if event:
-        if request.method != 'POST':
-            return render(request, 'pickup/join_event.html',
-                          {'event': event, 'add': add, 'park': park, 'players': players})
+    if request.method != 'POST':
+        context['players'], context['waitlist'] = get_roster(event)
+        return render(request, 'pickup/join_event.html', context)
 
-        # Check if you are adding or deleting and respond
-        current_player = request.user
+    # Check if you are adding or deleting and respond
+    current_player = request.user
 
-        if add:
-            try:
-                join = EventSignup(player=current_player, event=event)
-                join.save()
-            except IntegrityError:
-                error = "Error: You have already joined this match!"
-                return render(request, 'pickup/join_event.html', {'event': event, 'add': add, 'error': error,
-                                                                  'park': park, 'players': players})
+    if add:
+        try:
+            EventSignup.join(current_player, event, check_overlap=True)
+        except OverlapError as error:
+            context['error'] = get_overlap_error(error.other)
+        except IntegrityError:
+            context['error'] = "Error: You have already joined this match!"
+    elif not EventSignup.leave(current_player, event):
+        context['error'] = "Error: You can't leave because you haven't joined!"
 
-        if not add:
-            try:
-                EventSignup.objects.get(event=event).delete()
-            except IntegrityError:
-                error = "Error: You can't leave because you haven't joined!"
-                return render(request, 'pickup/join_event.html', {'event': event, 'add': add, 'error': error,
-                                                                  'park': park, 'players': players})
+    if context.get('error'):
+        context['players'], context['waitlist'] = get_roster(event)
+        return render(request, 'pickup/join_event.html', context)
 
-        return HttpResponseRedirect(reverse('event_signup', kwargs={'parkid': parkid}))
-    else:
+    return HttpResponseRedirect(reverse('event_signup', kwargs={'parkid': parkid}))
+
+
+# view for joining one occurrence of a weekly match; the occurrence is only
+# saved as a match when the first player joins it
+@login_required(login_url="login")
+def join_occurrence(request, seriesid, date):
+    try:
+        series = MatchSeries.objects.select_related("park").get(id=seriesid)
+        date = datetime.date.fromisoformat(date)
+    except (MatchSeries.DoesNotExist, ValueError):
+        raise Http404
+    if not series.occurs_on(date):
         raise Http404
 
+    event = Schedule.objects.filter(series=series, date=date).first() or series.occurrence(date)
+    context = {'event': event, 'add': 1, 'park': series.park,
+               'action_url': reverse('join_occurrence', kwargs={'seriesid': seriesid,
+                                                                'date': date.isoformat()})}
 
-# Function for getting the
-def get_user_conversations(player):
+    if request.method != 'POST':
+        if event.id is not None:
+            context['players'], context['waitlist'] = get_roster(event)
+        return render(request, 'pickup/join_event.html', context)
+
+    # the occurrence is saved as a match in the same transaction as the
+    # signup, so it is not kept when the player can not join it
     try:
-        sent = list(Messages.objects.filter(sender=player).values('receiver').distinct())
-        received = list(Messages.objects.filter(receiver=player).values('sender').distinct())
-        conversations = []
+        with transaction.atomic():
+            if event.id is None:
+                event = series.materialize(date)
+            if event is None:
+                context['error'] = "Error: This match is no longer available!"
+                return render(request, 'pickup/join_event.html', context)
+            EventSignup.join(request.user, event, check_overlap=True)
+    except OverlapError as error:
+        context['error'] = get_overlap_error(error.other)
+        return render(request, 'pickup/join_event.html', context)
+    except IntegrityError:
+        context['error'] = "Error: You have already joined this match!"
+        context['event'] = event
+        context['players'], context['waitlist'] = get_roster(event)
+        return render(request, 'pickup/join_event.html', context)
 
-        for people in sent:
-            person = Player.objects.get(id=people['receiver'])
-            conversations.append(person)
+    return HttpResponseRedirect(reverse('event_signup', kwargs={'parkid': series.park_id}))
 
-        for people in received:
-            person = Player.objects.get(id=people['sender'])
-            if person not in conversations:
-                conversations.append(person)
-    except Messages.DoesNotExist:
-        conversations = None
 
-    return conversations
+# number of days shown on the "my week" page
+WEEK_DAYS = 7
 
 
+# view for the matches a player signed up for over a week, read from their
+# intervals in one query; the week starts today unless another start is given
 @login_required(login_url="login")
-def message_user(request):
-    # Find which user and get all messages sent or received by the user
-    user = request.user
-    player = Player.objects.get(username=user.username)
-    conversations = get_user_conversations(player)
+def my_week(request):
+    try:
+        start = datetime.date.fromisoformat(request.GET.get("start", datetime.date.today().isoformat()))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid start date")
+    end = start + datetime.timedelta(days=WEEK_DAYS)
 
-    if conversations is not None:
-        # From to send a new message
+    days = {start + datetime.timedelta(days=offset): [] for offset in range(WEEK_DAYS)}
+    intervals = PlayerInterval.objects.filter(player=request.user, date__gte=start, date__lt=end) \
+        .select_related("event__park").order_by("date", "start", "end")
+    for interval in intervals:
+        days[interval.date].append((interval.event, SLOT_LABELS[interval.start],
+                                    SLOT_LABELS[interval.end % SLOTS_PER_DAY]))
 
-        # Display all conversations
-            return render(request, 'pickup/messages.html', {'conversations': conversations})
-    else:
-        return render(request, 'pickup/messages.html', {})
+    context = {"days": list(days.items()),
+               "previous": (start - datetime.timedelta(days=WEEK_DAYS)).isoformat(),
+               "next": end.isoformat()}
+    return render(request, 'pickup/my_week.html', context)
+
+
+# number of days of past matches kept in calendar feeds
+CALENDAR_PAST_DAYS = 30
+
+CALENDAR_SALT = "pickup.calendar"
+
+
+# token in the address of a player's calendar feed, which calendar apps read
+# without logging in
+def calendar_token(player_id):
+    return signing.Signer(salt=CALENDAR_SALT).sign(str(player_id))
+
+
+# decode a calendar token into a player id, None if it was tampered with
+def read_calendar_token(token):
+    try:
+        return int(signing.Signer(salt=CALENDAR_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+# respond with a calendar feed, or with 304 Not Modified if the client's copy
+# has the same state; the events are only read when the feed is sent, a
+# line at a time. There is no Last-Modified header: the latest change time
+# does not move when a signup or match is removed, so only the ETag, made
+# from counts as well, tells whether the feed changed. The stamp is the
+# DTSTAMP of the events, the latest change time when there is one.
+def calendar_response(request, name, events, state, stamp):
+    etag = quote_etag(feed_etag(*state))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        lines = calendar_lines(events, name, stamp or datetime.datetime.now())
+        response = StreamingHttpResponse(lines, content_type="text/calendar; charset=utf-8")
+    response.headers["ETag"] = etag
+    return response
+
+
+# calendar feed of the matches a player signed up for; the feed's state is
+# summarized with one aggregate query, so an unchanged feed costs nothing more
+def player_calendar(request, token):
+    player_id = read_calendar_token(token)
+    if player_id is None:
+        raise Http404
+
+    since = datetime.date.today() - datetime.timedelta(days=CALENDAR_PAST_DAYS)
+    signups = EventSignup.objects.filter(player_id=player_id, event__date__gte=since)
+    state = signups.aggregate(count=Count("id"), last=Max("id"), joined=Max("joined"),
+                              updated=Max("event__updated"),
+                              waitlisted=Count("id", filter=Q(status=EventSignup.WAITLISTED)))
+    changes = [time for time in (state["joined"], state["updated"]) if time is not None]
+
+    events = ((signup.event, "TENTATIVE" if signup.status == EventSignup.WAITLISTED else "CONFIRMED")
+              for signup in signups.select_related("event__park")
+              .order_by("event__date", "event__time", "event_id").iterator())
+    return calendar_response(request, "My Pickup Games", events,
+                             (since, sorted(state.items())), max(changes, default=None))
+
+
+# calendar feed of a park's matches
+def park_calendar(request, parkid):
+    try:
+        park = Parks.objects.get(id=parkid)
+    except Parks.DoesNotExist:
+        raise Http404
+
+    since = datetime.date.today() - datetime.timedelta(days=CALENDAR_PAST_DAYS)
+    matches = Schedule.objects.filter(park=park, date__gte=since)
+    state = matches.aggregate(count=Count("id"), last=Max("id"), updated=Max("updated"))
+
+    events = ((match, "CONFIRMED")
+              for match in matches.select_related("park").order_by("date", "time", "id").iterator())
+    return calendar_response(request, park.name, events,
+                             (since, park.name, format_address(park.street, park.city, park.state, park.zipcode),
+                              sorted(state.items())), state["updated"])
+
+
+# Function for getting the conversations a player is part of, most recent first
+def get_user_conversations(player):
+    return Conversation.objects.filter(player=player) \
+        .select_related('partner').order_by('-last_sent')
+
+
+@login_required(login_url="login")
+def message_user(request):
+    # Find which user and get all of their conversations
+    conversations = get_user_conversations(request.player)
+
+    # Display all conversations
+    return render(request, 'pickup/messages.html', {'conversations': conversations})
 
 
 @login_required(login_url="login")
@@ -574,13 +998,12 @@ def new_message(request):
         input_form.is_valid()
         search_text = input_form.cleaned_data["search_text"]
 
-        # get the list of players
-        players = list(Player.objects.filter(Q(username__contains=search_text) &
-                                             ~Q(username=user.username)))
+        # get the players whose username or name starts with the search
+        players = complete_players(search_text, SEARCH_RESULTS, public_only=False, exclude=user.id)
 
         context = {"players": players,
                    "search_input": search_text,
-                   "no_results": list(players) == [],
+                   "no_results": not players,
                    "user": request.user, }
         return render(request, 'pickup/newMessage.html', context)
 
@@ -588,44 +1011,101 @@ def new_message(request):
         return render(request, 'pickup/newMessage.html')
 
 
-def get_user_messages(player, person):
-    sent = Messages.objects.filter(Q(sender=player) & Q(receiver=person))
-    received = Messages.objects.filter(Q(sender=person) & Q(receiver=player))
-    messages = sent.union(received)
-    messages.order_by('time_sent')
-    return messages
+# number of messages shown per page of a conversation's history
+MESSAGE_PAGE_SIZE = 50
+
+
+# encode the position of a message as a cursor for paging through history
+def encode_message_cursor(message):
+    return "{}_{}".format(message.time_sent.isoformat(), message.id)
+
+
+# decode a cursor into a (time_sent, id) pair, None if it is malformed
+def decode_message_cursor(cursor):
+    try:
+        time_sent, message_id = cursor.rsplit("_", 1)
+        return datetime.datetime.fromisoformat(time_sent), int(message_id)
+    except ValueError:
+        return None
+
+
+# get one page of the messages between two players, oldest first, ending just
+# before the given (time_sent, id) position or at the latest message; also
+# returns the cursor for the next older page, None if there is no older page.
+# Each direction of the conversation is read on its own, newest first from
+# the (sender, receiver, time_sent, id) index and stopping after a page, and
+# the two are merged here, so a page costs the same however long the
+# conversation is.
+def get_user_messages(player, person, before=None, limit=None):
+    if limit is None:
+        limit = MESSAGE_PAGE_SIZE
+
+    directions = []
+    for sender, receiver in ((player, person), (person, player)):
+        messages = Messages.objects.filter(sender=sender, receiver=receiver)
+        if before is not None:
+            time_sent, message_id = before
+            messages = messages.filter(time_sent__lte=time_sent) \
+                .exclude(time_sent=time_sent, id__gte=message_id)
+        # fetch one extra row to find out whether an older page exists
+        directions.append(messages.order_by('-time_sent', '-id')[:limit + 1])
+
+    page = list(heapq.merge(*directions, key=lambda message: (message.time_sent, message.id),
+                            reverse=True))[:limit + 1]
+    older = None
+    if len(page) > limit:
+        page = page[:limit]
+        older = encode_message_cursor(page[-1])
+
+    page.reverse()
+    return page, older
 
 
 @login_required(login_url="login")
 def message_conversation(request, username):
     # Find which user and get the player object for the user to get messages
-    user = request.user
-    player = Player.objects.get(username=user.username)
+    player = request.player
+    person = Player.objects.get(username=username)
+
+    # Form to send a new message
+    before = None
+    if request.method == 'POST':
+        form = SendMessage(request.POST)
+        if form.is_valid():
+            msg = form.data['userMessage']
+            Messages.objects.create(sender=player, receiver=person, message=msg)
+
+    # viewing an older page of the history
+    elif "before" in request.GET.keys():
+        before = decode_message_cursor(request.GET["before"])
+        if before is None:
+            return HttpResponseBadRequest("Invalid cursor")
+
     conversations = get_user_conversations(player)
+    messages, older = get_user_messages(player, person, before)
+    return render(request, 'pickup/messages.html', {'conversations': conversations, 'messages': messages,
+                                                    'person': person, 'older': older})
+
 
-    if conversations is not None:
+# view returning a page of older messages in a conversation as JSON
+@login_required(login_url="login")
+def message_history(request, username):
+    player = request.player
+    try:
         person = Player.objects.get(username=username)
-        # Form to send a new message
-        if request.method == 'POST':
-            form = SendMessage(request.POST)
-            if form.is_valid():
-                msg = form.data['userMessage']
-                message = Messages.objects.create(sender=player, receiver=person, message=msg)
-                message.save()
-                conversations = get_user_conversations(player)
-                messages = get_user_messages(player, person)
-                return render(request, 'pickup/messages.html', {'conversations': conversations, 'messages': messages,
-                                                                'person': person})
-            else:
-                messages = get_user_messages(player, person)
-                return render(request, 'pickup/messages.html', {'conversations': conversations, 'messages': messages,
-                                                                'person': person})
-
-        # Display all conversations
-        else:
-            messages = get_user_messages(player, person)
-            return render(request, 'pickup/messages.html', {'conversations': conversations, 'messages': messages,
-                                                            'person': person})
-    else:
-        print('else')
-        return render(request, 'pickup/messages.html', {})
+    except Player.DoesNotExist:
+        raise Http404
+
+    before = None
+    if "before" in request.GET.keys():
+        before = decode_message_cursor(request.GET["before"])
+        if before is None:
+            return HttpResponseBadRequest("Invalid cursor")
+
+    messages, older = get_user_messages(player, person, before)
+    data = [{"id": message.id,
+             "sent": message.sender_id == player.id,
+             "message": message.message,
+             "time_sent": message.time_sent.isoformat()}
+            for message in messages]
+    return JsonResponse({"messages": data, "older": older})
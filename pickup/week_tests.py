@@ -0,0 +1,139 @@
+from django.test import TestCase
+from django.urls import reverse
+from pickup.models import Player, Parks, Schedule, EventSignup, PlayerInterval, MatchSeries, \
+    OverlapError
+from pickup.forms import ScheduleForm
+import datetime
+
+
+# tests for match durations, players' intervals and overlapping signups
+class IntervalTests(TestCase):
+
+    def setUp(self):
+        self.player = Player.objects.create_user("root", "root@root.com", "root")
+        self.client.post(reverse("login"), {"username": "root", "password": "root"})
+        self.home = self.add_park("Home Court")
+        self.away = self.add_park("Away Court")
+        self.day = datetime.date.today() + datetime.timedelta(days=1)
+
+    def add_park(self, name):
+        park = Parks(player=self.player, name=name, street='Street', city='City',
+                     state='MD', zipcode='21202')
+        park.save()
+        return park
+
+    def add_match(self, name, park, time, duration=4, days=1):
+        match = Schedule(name=name, creator=self.player, park=park, time=time, duration=duration,
+                         date=self.day + datetime.timedelta(days=days - 1))
+        match.save()
+        return match
+
+    def join(self, match):
+        return self.client.post(reverse("join_event", kwargs={"parkid": match.park_id, "add": 1,
+                                                              "eventid": match.id}))
+
+    # test that intervals follow signups and changes to their matches
+    def test_intervals_kept(self):
+        match = self.add_match("Game", self.home, 40, duration=6)
+        EventSignup.join(self.player, match)
+        interval = PlayerInterval.objects.get()
+        self.assertEqual((interval.date, interval.start, interval.end), (self.day, 40, 46))
+
+        match.time, match.duration = 50, 2
+        match.save()
+        interval.refresh_from_db()
+        self.assertEqual((interval.start, interval.end), (50, 52))
+
+        EventSignup.leave(self.player, match)
+        self.assertFalse(PlayerInterval.objects.exists())
+
+        # matches end by midnight
+        late = self.add_match("Late", self.away, 94)
+        self.assertEqual(late.end_slot, 96)
+
+    # test that a match without a date has no intervals until it gets one
+    def test_undated_match(self):
+        match = Schedule(name="Someday", creator=self.player, park=self.home, time=40, date=None)
+        match.save()
+        EventSignup.join(self.player, match, check_overlap=True)
+        self.assertFalse(PlayerInterval.objects.exists())
+
+        match.date = self.day
+        match.save()
+        interval = PlayerInterval.objects.get()
+        self.assertEqual((interval.player_id, interval.date, interval.start), (self.player.id, self.day, 40))
+        match.date = None
+        match.save()
+        self.assertFalse(PlayerInterval.objects.exists())
+
+    # test that the overlap is checked inside the join, which then leaves
+    # the match untouched
+    def test_join_checks_overlap(self):
+        first = self.add_match("First", self.home, 40)
+        overlapping = self.add_match("Overlapping", self.away, 42)
+        EventSignup.join(self.player, first, check_overlap=True)
+        with self.assertRaises(OverlapError) as raised:
+            EventSignup.join(self.player, overlapping, check_overlap=True)
+        self.assertEqual(raised.exception.other.event_id, first.id)
+        overlapping.refresh_from_db()
+        self.assertEqual(overlapping.signup_count, 0)
+        self.assertFalse(EventSignup.objects.filter(event=overlapping).exists())
+
+    # test that a match overlapping one the player joined is rejected
+    def test_overlaps_rejected(self):
+        first = self.add_match("First", self.home, 40, duration=8)
+        overlapping = self.add_match("Overlapping", self.away, 46)
+        after = self.add_match("After", self.away, 48)
+        long_before = self.add_match("Long Before", self.away, 30, duration=12)
+        self.join(first)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(PlayerInterval.overlapping(self.player, overlapping).count(), 1)
+
+        response = self.join(overlapping)
+        self.assertContains(response, "overlaps First at Home Court")
+        response = self.join(long_before)
+        self.assertContains(response, "overlaps First at Home Court")
+        self.assertRedirects(self.join(after), reverse("event_signup", kwargs={"parkid": self.away.id}))
+        self.assertEqual(set(EventSignup.objects.values_list("event__name", flat=True)),
+                         {"First", "After"})
+
+        # joining the same match again is not an overlap with itself
+        self.assertContains(self.join(first), "already joined")
+
+    # test that an occurrence of a weekly match is checked before it is saved
+    def test_occurrence_overlap(self):
+        self.join(self.add_match("First", self.home, 40))
+        series = MatchSeries(name="Weekly", creator=self.player, park=self.away, time=42,
+                             start=self.day, until=self.day, weekdays=1 << self.day.weekday())
+        series.save()
+        response = self.client.post(reverse("join_occurrence", kwargs={
+            "seriesid": series.id, "date": self.day.isoformat()}))
+        self.assertContains(response, "overlaps First")
+        self.assertFalse(Schedule.objects.filter(series=series).exists())
+
+    def test_form_duration(self):
+        fields = {'date': self.day.isoformat(), 'time': '90', 'name': 'Late Match'}
+        form = ScheduleForm(fields, park=self.home)
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['duration'], Schedule.DEFAULT_DURATION)
+        fields['duration'] = '8'
+        self.assertFalse(ScheduleForm(fields, park=self.home).is_valid())
+
+    # test the week page, read with one query for the matches
+    def test_my_week(self):
+        self.join(self.add_match("Tomorrow", self.home, 40))
+        self.join(self.add_match("Later", self.away, 70, days=3))
+        self.join(self.add_match("Next Week", self.away, 70, days=10))
+
+        url = reverse("my_week")
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {"start": self.day.isoformat()})
+        days = dict(response.context["days"])
+        self.assertEqual(len(days), 7)
+        self.assertEqual([match.name for match, starts, ends in days[self.day]], ["Tomorrow"])
+        self.assertEqual(days[self.day][0][1:], ("10:00 AM", "11:00 AM"))
+        self.assertContains(response, "Later")
+        self.assertNotContains(response, "Next Week")
+
+        self.assertEqual(self.client.get(url, {"start": "x"}).status_code, 400)